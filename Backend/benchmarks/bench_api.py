@@ -0,0 +1,330 @@
+"""
+End-to-end API benchmark against a seeded SQLite stand-in database.
+
+For every ``--ships`` scale: seeds a SQLite file (benchmarks/sqlite_db.py),
+starts the real app in a child process on it (one uvicorn worker), then
+drives each route with ``--concurrency`` keep-alive clients for
+``--duration`` seconds and records throughput, p50/p95/p99 latency and the
+worker's resident memory. Routes that are too heavy to loop (full export,
+hazard recompute, stream snapshot) are timed ``--repeat`` times one after
+another. Results are printed and, with ``--json``, written for comparison
+between commits (``--baseline`` prints the change against an earlier file).
+
+    python benchmarks/bench_api.py --ships 1000,100000 --json results.json
+    python benchmarks/bench_api.py --ships 1000 --baseline results.json
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import summarize  # noqa: E402
+
+SCALES = {"1k": 1000, "100k": 100000, "1m": 1000000}
+
+# (name, method, path, JSON body) driven in a closed loop
+ROUTES = [
+    ("ports", "GET", "/api/ports", None),
+    ("port", "GET", "/api/ports/1", None),
+    ("port_nearby_ships", "GET", "/api/ports/1/nearby-ships?radius_km=500", None),
+    ("eta", "GET", "/api/eta", None),
+    ("eta_page", "GET", "/api/eta?limit=100", None),
+    ("eta_filtered_page", "GET", "/api/eta?status=warning&limit=100", None),
+    ("eta_projection", "GET", "/api/eta?fields=ship_name,eta_expected,delay_hours", None),
+    ("eta_ship", "GET", "/api/eta/Ship%200000001", None),
+    ("eta_predict", "POST", "/api/eta/predict",
+     {"latitude": 10.5, "longitude": 110.2, "port_to": "Port 0001", "port_from": "Port 0002"}),
+    ("eta_batch", "POST", "/api/eta/batch", {"ship_names": [f"Ship {i:07d}" for i in range(100)]}),
+    ("ships", "GET", "/api/ships", None),
+    ("ships_page", "GET", "/api/ships?limit=100", None),
+    ("ships_filtered", "GET", "/api/ships?status=warning", None),
+    ("storms", "GET", "/api/storms", None),
+    ("storm_alerts", "GET", "/api/storm-alerts", None),
+    ("storm_ships_at_risk", "GET", "/api/storms/1/ships-at-risk", None),
+    ("stats", "GET", "/api/stats", None),
+    ("metrics", "GET", "/metrics", None),
+]
+
+# Heavy or stateful routes, timed one request at a time
+ONE_SHOT = [
+    ("eta_export_ndjson", "GET", "/api/eta/export?format=ndjson", None),
+    ("hazards_recompute_dry_run", "POST", "/api/admin/hazards/recompute?dry_run=true", None),
+    ("stream_snapshot", "STREAM", "/api/stream?channels=eta,storms", None),
+]
+
+
+def serve(db, port):
+    """Child process: run the app on the SQLite database."""
+    from sqlite_db import install
+    install(db)
+    import uvicorn
+    import main
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+class MemorySampler(threading.Thread):
+    """Polls a process's resident set size (Linux /proc) in the background."""
+
+    def __init__(self, pid, interval=0.1):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def rss(self):
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return None
+
+    def reset(self):
+        self.peak = self.rss() or 0
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            rss = self.rss()
+            if rss:
+                self.peak = max(self.peak, rss)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def _request(conn, method, path, body, headers):
+    if method == "STREAM":
+        # Time to the first complete event (the snapshot), then hang up
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        while response.fp.readline() not in (b"\n", b"\r\n", b""):
+            pass
+        conn.close()
+        return response.status
+    payload = json.dumps(body).encode("utf-8") if body is not None else None
+    request_headers = dict(headers, **({"Content-Type": "application/json"} if payload else {}))
+    conn.request(method, path, body=payload, headers=request_headers)
+    response = conn.getresponse()
+    response.read()
+    return response.status
+
+
+def _client(port, route, deadline, latencies, errors, lock, headers):
+    name, method, path, body = route
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    local_latencies, local_errors = [], 0
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            status = _request(conn, method, path, body, headers)
+        except (OSError, http.client.HTTPException):
+            status = None
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+        if status is None or status >= 400:
+            local_errors += 1
+        else:
+            local_latencies.append(time.perf_counter() - started)
+    conn.close()
+    with lock:
+        latencies[name].extend(local_latencies)
+        errors[name] += local_errors
+
+
+def load(port, route, concurrency, duration, headers):
+    latencies, errors, lock = defaultdict(list), defaultdict(int), threading.Lock()
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=_client, args=(port, route, deadline, latencies, errors, lock, headers),
+                                daemon=True) for _ in range(concurrency)]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(latencies, errors, time.monotonic() - started)[route[0]]
+
+
+def one_shot(port, route, repeat, headers):
+    name, method, path, body = route
+    latencies, errors = defaultdict(list), defaultdict(int)
+    started = time.monotonic()
+    for _ in range(repeat):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+        begun = time.perf_counter()
+        try:
+            status = _request(conn, method, path, body, headers)
+        except (OSError, http.client.HTTPException):
+            status = None
+        conn.close()
+        if status is None or status >= 400:
+            errors[name] += 1
+        else:
+            latencies[name].append(time.perf_counter() - begun)
+    return summarize(latencies, errors, time.monotonic() - started)[name]
+
+
+def wait_ready(port, process, timeout=900):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def run_scale(ships, args):
+    db = os.path.join(args.db_dir, f"bench_{ships}.db")
+    from sqlite_db import seed
+    started = time.perf_counter()
+    if not (args.reuse_db and os.path.exists(db)):
+        seed(db, ships=ships, ports=args.ports, storms=args.storms, seed=args.seed)
+    seed_s = time.perf_counter() - started
+
+    # The admin routes are only served with a token
+    admin_token = os.environ.get("ADMIN_TOKEN") or "bench"
+    env = dict(os.environ, LOG_LEVEL="WARNING", ACCESS_LOG_SAMPLE="0", ADMIN_TOKEN=admin_token)
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", db, "--port", str(args.port)],
+                               env=env, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    sampler = MemorySampler(process.pid)
+    headers = {"Accept-Encoding": args.accept_encoding} if args.accept_encoding else {}
+    headers["X-Admin-Token"] = admin_token
+    try:
+        started = time.perf_counter()
+        wait_ready(args.port, process)
+        startup_s = time.perf_counter() - started
+        sampler.start()
+        idle_rss = sampler.rss()
+
+        selected = [r for r in ROUTES + ONE_SHOT if not args.routes or r[0] in args.routes]
+        results = {}
+        for route in selected:
+            cold = one_shot(args.port, route, 1, headers)
+            sampler.reset()
+            if route in ONE_SHOT:
+                result = one_shot(args.port, route, args.repeat, headers)
+            else:
+                result = load(args.port, route, args.concurrency, args.duration, headers)
+            result["cold_ms"] = cold["p50_ms"]
+            result["peak_rss_mb"] = round(sampler.peak / 1e6, 1)
+            results[route[0]] = result
+            print(f"  {route[0]:<28} {result['rps']:>9} rps  p50 {result['p50_ms']} ms  "
+                  f"p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  "
+                  f"rss {result['peak_rss_mb']} MB  errors {result['errors']}", flush=True)
+        final_rss = sampler.rss()
+    finally:
+        sampler.stop()
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    return {
+        "ships": ships,
+        "seed_s": round(seed_s, 2),
+        "startup_s": round(startup_s, 2),
+        "memory": {
+            "idle_rss_mb": round((idle_rss or 0) / 1e6, 1),
+            "final_rss_mb": round((final_rss or 0) / 1e6, 1),
+            "peak_rss_mb": max((r["peak_rss_mb"] for r in results.values()), default=None),
+        },
+        "routes": results,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(report, baseline_path):
+    """Print p50/p95 and throughput changes against an earlier results file."""
+    with open(baseline_path) as f:
+        baseline = {scale["ships"]: scale for scale in json.load(f)["scales"]}
+    print(f"\nchange against {baseline_path}:")
+    for scale in report["scales"]:
+        before = baseline.get(scale["ships"])
+        if before is None:
+            continue
+        print(f"  {scale['ships']} ships")
+        for name, now in scale["routes"].items():
+            old = before["routes"].get(name)
+            if not old:
+                continue
+            cells = []
+            for key in ("rps", "p50_ms", "p95_ms"):
+                if old.get(key) and now.get(key) is not None:
+                    cells.append(f"{key} {(now[key] - old[key]) / old[key] * 100:+.0f}%")
+            print(f"    {name:<28} " + "  ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ships", default="1000", help="comma-separated scales: counts or 1k/100k/1m")
+    parser.add_argument("--ports", type=int, default=500)
+    parser.add_argument("--storms", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds of load per route")
+    parser.add_argument("--repeat", type=int, default=3, help="requests per one-shot route")
+    parser.add_argument("--routes", nargs="*", help="only these route names")
+    parser.add_argument("--accept-encoding", default=None, help="e.g. gzip, to include compression")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db-dir", default=tempfile.gettempdir())
+    parser.add_argument("--reuse-db", action="store_true", help="keep an existing seeded file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--serve", metavar="DB", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    report = {
+        "commit": _commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"concurrency": args.concurrency, "duration_s": args.duration, "repeat": args.repeat,
+                     "ports": args.ports, "storms": args.storms, "accept_encoding": args.accept_encoding},
+        "scales": [],
+    }
+    for scale in args.ships.split(","):
+        ships = SCALES.get(scale.strip().lower()) or int(scale)
+        print(f"{ships} ships", flush=True)
+        report["scales"].append(run_scale(ships, args))
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        compare(report, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Encode time of each list endpoint's response body: FastAPI's default path
+(response-model validation where the route declares one, jsonable_encoder,
+JSONResponse) against FastJSONResponse with the standard library and with
+orjson (when installed). Payloads are synthetic rows shaped like the
+routes' output, so no database is needed.
+
+    python benchmarks/bench_encode.py --rows 10000 --repeat 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from routes.storm import StormAlert, StormInfo  # noqa: E402
+from services import serialization  # noqa: E402
+
+PORTS = ["Hai Phong", "Singapore", "Shanghai", "Busan", "Cái Mép", "Đà Nẵng"]
+
+
+def eta_rows(rng, count):
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        port_from, port_to = rng.sample(PORTS, 2)
+        rows.append({
+            "imo": 9000000 + i, "ship_name": f"Ship {i:06d}", "port_from": port_from, "port_to": port_to,
+            "eta_expected": (start + timedelta(minutes=rng.randint(0, 100000))).isoformat(),
+            "delay_hours": rng.choice([0.0, 1.5, 6.0]), "status": rng.choice(["active", "warning"]),
+            "reason": None, "distance_to_hazard": round(rng.uniform(0, 2000), 2),
+            "latitude": rng.uniform(-30, 40), "longitude": rng.uniform(95, 145),
+            "from_lat": 20.86, "from_lng": 106.68, "to_lat": 1.26, "to_lng": 103.84,
+        })
+    return rows
+
+
+def ship_rows(rng, count):
+    return [{
+        "id": f"Ship {i:06d}", "name": f"Ship {i:06d}", "route": " → ".join(rng.sample(PORTS, 2)),
+        "eta": datetime(2024, 1, 1) + timedelta(minutes=rng.randint(0, 100000)),
+        "delay_hours": rng.choice([0.0, 1.5, 6.0]), "status": "active", "reason": None,
+        "lat": 1.26, "lng": 103.84,
+    } for i in range(count)]
+
+
+def storm_rows(rng, count):
+    # As returned by mysql-connector: DECIMAL columns arrive as Decimal
+    return [{
+        "id": i, "name": f"Storm {i}", "latitude": Decimal(f"{rng.uniform(0, 30):.4f}"),
+        "longitude": Decimal(f"{rng.uniform(100, 150):.4f}"), "wind_kmh": Decimal(rng.randint(60, 250)),
+        "level": "Category 3", "radius_km": Decimal("150.00"), "warning_radius_km": Decimal("400.00"),
+    } for i in range(count)]
+
+
+def alert_rows(rng, count):
+    return [{
+        "alert_id": row["id"], "message": row["name"], "severity": "medium", "status": "Bão",
+        "latitude": row["latitude"], "longitude": row["longitude"], "radius_km": row["radius_km"],
+        "warning_radius_km": row["warning_radius_km"], "wind_kmh": row["wind_kmh"],
+    } for row in storm_rows(rng, count)]
+
+
+def port_rows(rng, count):
+    return {"ports": [{
+        "id": i, "name": f"Port {i}", "region": "Asia", "country": "Việt Nam",
+        "location": {"latitude": round(rng.uniform(-40, 50), 6), "longitude": round(rng.uniform(90, 150), 6)},
+        "status": "ổn định", "dockedShips": 0, "capacity": 100, "availableSlots": 100, "avgWaitingTime": "N/A",
+    } for i in range(count)]}
+
+
+def default_path(model):
+    """What FastAPI does for a returned value: validate (response_model), encode, render."""
+    adapter = TypeAdapter(List[model]) if model else None
+
+    def encode(content):
+        if adapter is not None:
+            content = adapter.dump_python(adapter.validate_python(content), mode="json")
+        return JSONResponse(content=jsonable_encoder(content)).body
+    return encode
+
+
+def median_ms(fn, content, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(content)
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="rows for the ETA and ship lists")
+    parser.add_argument("--storms", type=int, default=500)
+    parser.add_argument("--ports", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    endpoints = [
+        ("/api/eta", eta_rows(rng, args.rows), None),
+        ("/api/ships", ship_rows(rng, args.rows), None),
+        ("/api/storms", storm_rows(rng, args.storms), StormInfo),
+        ("/api/storm-alerts", alert_rows(rng, args.storms), StormAlert),
+        ("/api/ports", port_rows(rng, args.ports), None),
+    ]
+    encoders = [("default", None), ("stdlib", serialization.json_dumps)]
+    if serialization.orjson is not None:
+        orjson, options = serialization.orjson, serialization.orjson.OPT_NON_STR_KEYS
+        encoders.append(("orjson", lambda c: orjson.dumps(c, default=serialization._default, option=options)))
+
+    print(f"{'endpoint':<20}{'KB':>8}" + "".join(f"{name + ' ms':>13}" for name, _ in encoders))
+    for path, content, model in endpoints:
+        size = len(serialization.json_dumps(content)) / 1024
+        cells = []
+        for name, fn in encoders:
+            fn = fn or default_path(model)
+            cells.append(median_ms(fn, content, args.repeat))
+        print(f"{path:<20}{size:>8.0f}" + "".join(f"{ms:>13.2f}" for ms in cells))
+
+
+if __name__ == "__main__":
+    main()
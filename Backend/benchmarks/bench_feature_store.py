@@ -0,0 +1,73 @@
+"""
+Time feature derivation with the FeatureStore cold, warm, and after a storm
+update (only storm distances recomputed), against deriving everything
+without a store (distances plus a full ships x storms nearest-storm pass).
+
+    python benchmarks/bench_feature_store.py --ships 100000 --storms 300
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.eta_model import build_features  # noqa: E402
+from services.feature_store import FeatureStore  # noqa: E402
+from services.hazard import assess  # noqa: E402
+from services.port_index import port_index  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ships", type=int, default=100000)
+    parser.add_argument("--ports", type=int, default=200)
+    parser.add_argument("--storms", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ports = [{"id": i, "name": f"Port {i}", "latitude": rng.uniform(-40, 50), "longitude": rng.uniform(90, 150)}
+             for i in range(args.ports)]
+    # Fill the shared index directly so no database is needed
+    port_index.ports = ports
+    port_index._coordinates = {p["name"].casefold(): (p["latitude"], p["longitude"]) for p in ports}
+    port_index.version += 1
+
+    rows = [{
+        "imo": 9000000 + i, "ship_name": f"Ship {i}",
+        "port_from": rng.choice(ports)["name"], "port_to": rng.choice(ports)["name"],
+        "latitude": rng.uniform(-30, 40), "longitude": rng.uniform(95, 145),
+    } for i in range(args.ships)]
+
+    def storms():
+        return [{"id": i, "latitude": rng.uniform(0, 30), "longitude": rng.uniform(100, 140),
+                 "radius_km": rng.uniform(50, 200), "warning_radius_km": rng.uniform(200, 500)}
+                for i in range(args.storms)]
+
+    def timed(label, store, storm_rows=None):
+        started = time.perf_counter()
+        features, _ = build_features(rows, port_index.coordinates, store)
+        if storm_rows is not None:
+            assess(features["latitude"], features["longitude"],
+                   *[[s[k] for s in storm_rows] for k in ("latitude", "longitude", "radius_km", "warning_radius_km")])
+        print(f"{label:<28} {(time.perf_counter() - started) * 1000:8.1f} ms")
+
+    current = storms()
+    timed("no store", None, current)
+    store = FeatureStore(max_entries=args.ships * 2)
+    store.set_storms(current)
+    timed("store, cold", store)
+    timed("store, warm", store)
+    store.set_storms(storms())
+    timed("store, storms changed", store)
+    timed("store, warm again", store)
+
+    stats = store.stats()
+    print(f"entries {stats['entries']}, remaining hit ratio {stats['remaining_hit_ratio']}, "
+          f"storm hit ratio {stats['storm_hit_ratio']}, memory {stats['memory_bytes'] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
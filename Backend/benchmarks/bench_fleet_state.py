@@ -0,0 +1,100 @@
+"""
+Time a fleet state sync (merge plus re-encoding the JSON rows) for a full
+reload against incremental syncs that fetch only recently changed rows.
+An in-memory table stands in for eta_results, so the numbers exclude the
+database and network; rows fetched per sync are printed alongside.
+
+    python benchmarks/bench_fleet_state.py --ships 100000 --changes 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.fleet_state import FleetState  # noqa: E402
+from services.fleet_store import RowEncoder, datetime_field, float_field, string_field  # noqa: E402
+
+
+class TableRepo:
+    """
+    Answers the fleet state queries from row dicts bucketed by updated_at,
+    standing in for an index on that column.
+    """
+
+    def __init__(self, rows):
+        self.now = datetime(2024, 1, 1)
+        self.count = len(rows)
+        self.buckets = {}
+        for row in rows:
+            self.buckets.setdefault(row["updated_at"], {})[id(row)] = row
+
+    def touch(self, row, **values):
+        del self.buckets[row["updated_at"]][id(row)]
+        row.update(values, updated_at=self.now)
+        self.buckets.setdefault(self.now, {})[id(row)] = row
+
+    async def fetch_one(self, query, params=None):
+        last = max(stamp for stamp, bucket in self.buckets.items() if bucket)
+        return {"row_count": self.count, "last_updated": last, "db_now": self.now}
+
+    async def fetch_all(self, query, params=None):
+        since = params[0] if params else datetime.min
+        return [dict(row) for stamp, bucket in self.buckets.items() if stamp >= since
+                for row in bucket.values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ships", type=int, default=100000)
+    parser.add_argument("--changes", type=int, default=100, help="rows updated between syncs")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = datetime(2024, 1, 1)
+    rows = [{
+        "imo": 9000000 + i, "ship_name": f"Ship {i}", "port_from": "A", "port_to": "B",
+        "eta_expected": start + timedelta(minutes=rng.randint(0, 100000)),
+        "delay_hours": 0.0, "status": "active", "reason": None, "distance_to_hazard": None,
+        "latitude": rng.uniform(-30, 40), "longitude": rng.uniform(95, 145), "updated_at": start,
+    } for i in range(args.ships)]
+    repo = TableRepo(rows)
+
+    state = FleetState(min_interval=0, overlap=1, resync_interval=float("inf"))
+    encoder = RowEncoder(state, (
+        ("ship_name", string_field("ship_name")),
+        ("eta_expected", datetime_field("eta_expected")),
+        ("delay_hours", float_field("delay_hours")),
+        ("latitude", float_field("latitude")),
+        ("longitude", float_field("longitude")),
+    ))
+
+    async def timed(label, **kwargs):
+        fetched = state.stats()["rows_fetched"]
+        started = time.perf_counter()
+        await state.sync(repo, **kwargs)
+        encoder.encode(state.columns.live_slots())
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"{label:<24} {elapsed:8.1f} ms  {state.stats()['rows_fetched'] - fetched:>8} rows fetched")
+
+    async def run():
+        await timed("initial load")
+        for i in range(args.rounds):
+            repo.now += timedelta(seconds=10)
+            for row in rng.sample(rows, args.changes):
+                repo.touch(row, delay_hours=round(rng.uniform(0, 12), 2))
+            await timed(f"delta ({args.changes} changed)")
+        await timed("no change")
+        await timed("full reload", force_full=True)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Compare memory and serialization of the /api/eta and /api/ships lists held
+as one dict per row (formatted rows, serialized with json.dumps) against the
+columnar fleet store (NumPy columns, interned strings and per-row JSON
+fragments encoded from them).
+
+    python benchmarks/bench_fleet_store.py --ships 100000 --changes 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routes.eta import eta_encoder, eta_order, format_eta_rows  # noqa: E402
+from routes.ships import format_ship, ships_encoder  # noqa: E402
+from services.fleet_state import fleet_state  # noqa: E402
+from services.port_index import port_index  # noqa: E402
+
+
+class ListRepo:
+    """Serves the fleet state queries from a list of rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def fetch_one(self, query, params=None):
+        last = max(row["updated_at"] for row in self.rows)
+        return {"row_count": len(self.rows), "last_updated": last, "db_now": last + timedelta(minutes=1)}
+
+    async def fetch_all(self, query, params=None):
+        since = params[0] if params else datetime.min
+        return [dict(row) for row in self.rows if row["updated_at"] >= since]
+
+
+def render(rows):
+    return json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"{label:<38} {(time.perf_counter() - started) * 1000:8.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ships", type=int, default=100000)
+    parser.add_argument("--ports", type=int, default=200)
+    parser.add_argument("--changes", type=int, default=100, help="rows updated before the warm re-encode")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ports = [{"id": i, "name": f"Port {i}", "latitude": rng.uniform(-40, 50), "longitude": rng.uniform(90, 150)}
+             for i in range(args.ports)]
+    # Fill the shared index directly so no database is needed
+    port_index.ports = ports
+    port_index._coordinates = {p["name"].casefold(): (p["latitude"], p["longitude"]) for p in ports}
+    port_index.version += 1
+
+    start = datetime(2024, 1, 1)
+    rows = [{
+        "imo": 9000000 + i, "ship_name": f"Ship {i:06d}",
+        "port_from": rng.choice(ports)["name"], "port_to": rng.choice(ports)["name"],
+        "eta_expected": start + timedelta(minutes=rng.randint(0, 100000)),
+        "delay_hours": rng.choice([0.0, 1.5, 6.0]), "status": rng.choice(["active", "warning", "inactive"]),
+        "reason": None, "distance_to_hazard": round(rng.uniform(0, 2000), 2),
+        "latitude": rng.uniform(-30, 40), "longitude": rng.uniform(95, 145),
+        "updated_at": start - timedelta(seconds=rng.randint(0, 86400)),
+    } for i in range(args.ships)]
+    per_100k = 100000 / args.ships
+
+    # Dict per row: formatted lists kept for reuse, serialized whole
+    def dict_lists():
+        return format_eta_rows(rows), [format_ship(row) for row in rows]
+    eta_rows, ship_rows = timed("dicts: format", dict_lists)
+    timed("dicts: serialize", lambda: (render(eta_rows), render(ship_rows)))
+    del eta_rows, ship_rows
+    tracemalloc.start()
+    lists = dict_lists()
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del lists
+
+    # Columnar: fleet state columns plus cached per-row fragments
+    repo = ListRepo(rows)
+    timed("columns: load", lambda: asyncio.run(fleet_state.sync(repo, force_full=True)))
+    slots = fleet_state.columns.live_slots()
+    encode = lambda: (eta_encoder.encode(eta_order()), ships_encoder.encode(slots))  # noqa: E731
+    timed("columns: first encode", encode)
+    timed("columns: cached encode", encode)
+
+    changed = start + timedelta(minutes=10)
+    for row in rng.sample(rows, args.changes):
+        row["delay_hours"], row["updated_at"] = 9.5, changed
+    timed(f"columns: delta sync ({args.changes} rows)", lambda: asyncio.run(fleet_state.sync(repo)))
+    timed("columns: encode after delta", encode)
+
+    columns = fleet_state.columns.nbytes()
+    fragments = eta_encoder.nbytes() + ships_encoder.nbytes()
+    print(f"memory per 100k ships: dicts {dict_bytes * per_100k / 1e6:.1f} MB; "
+          f"columns {columns * per_100k / 1e6:.1f} MB + encoded rows {fragments * per_100k / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark the storm-hazard proximity engine on synthetic data.
+
+    python benchmarks/bench_hazard.py --ships 50000 --storms 300
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.hazard import assess, derive_status  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ships", type=int, default=50000)
+    parser.add_argument("--storms", type=int, default=300)
+    parser.add_argument("--batch-size", type=int, default=8192)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    ship_lat = rng.uniform(-60, 60, args.ships)
+    ship_lng = rng.uniform(-180, 180, args.ships)
+    storm_lat = rng.uniform(-40, 40, args.storms)
+    storm_lng = rng.uniform(-180, 180, args.storms)
+    radius = rng.uniform(50, 300, args.storms)
+    warning_radius = radius * rng.uniform(1.5, 3.0, args.storms)
+    delay = rng.choice([0.0, 2.0, 6.0], args.ships)
+
+    samples = []
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        assessment = assess(ship_lat, ship_lng, storm_lat, storm_lng, radius, warning_radius,
+                            batch_size=args.batch_size)
+        derive_status(assessment, delay)
+        samples.append(time.perf_counter() - started)
+
+    pairs = args.ships * args.storms
+    best = min(samples)
+    print(f"{args.ships} ships x {args.storms} storms ({pairs / 1e6:.1f}M pairs), batch {args.batch_size}")
+    print(f"median {statistics.median(samples) * 1000:.1f} ms  best {best * 1000:.1f} ms  "
+          f"{pairs / best / 1e6:.1f}M pairs/s")
+    print(f"inside core: {int(assessment.inside_core.sum())}  "
+          f"inside warning: {int(assessment.inside_warning.sum())}")
+
+
+if __name__ == "__main__":
+    main()
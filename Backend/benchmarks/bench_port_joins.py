@@ -0,0 +1,109 @@
+"""
+Compare the ETA list query with and without the sea_ports joins.
+
+"join" runs the previous query, which LEFT JOINs sea_ports twice by port
+name. "index" runs the eta_results-only query and attaches coordinates from
+an in-memory PortIndex, as /api/eta does now. Both are timed end to end
+(query + fetch + coordinate attach) against the database configured in .env.
+
+    python benchmarks/bench_port_joins.py --iterations 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.database import open_connection  # noqa: E402
+from services.port_index import PortIndex  # noqa: E402
+
+JOIN_QUERY = """
+    SELECT e.IMO as imo, e.ship_name, e.port_from, e.port_to, e.eta_expected,
+           e.delay_hours, e.status, e.reason, e.distance_to_hazard,
+           e.latitude, e.longitude,
+           p1.latitude as from_lat, p1.longitude as from_lng,
+           p2.latitude as to_lat, p2.longitude as to_lng
+    FROM eta_results e
+    LEFT JOIN sea_ports p1 ON e.port_from = p1.port_name
+    LEFT JOIN sea_ports p2 ON e.port_to = p2.port_name
+    ORDER BY e.ship_name ASC
+"""
+
+INDEX_QUERY = """
+    SELECT e.IMO as imo, e.ship_name, e.port_from, e.port_to, e.eta_expected,
+           e.delay_hours, e.status, e.reason, e.distance_to_hazard,
+           e.latitude, e.longitude
+    FROM eta_results e
+    ORDER BY e.ship_name ASC
+"""
+
+
+class _SyncRepo:
+    """Minimal stand-in for Repository so PortIndex can load synchronously."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def fetch_all(self, query, params=None):
+        cursor = self.conn.cursor(dictionary=True)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
+
+def _time(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    conn = open_connection()
+    index = PortIndex()
+    asyncio.run(index.refresh(_SyncRepo(conn)))
+
+    def run_join():
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(JOIN_QUERY)
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
+    def run_index():
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(INDEX_QUERY)
+        rows = cursor.fetchall()
+        cursor.close()
+        coordinates = index.coordinates
+        for row in rows:
+            row["from_lat"], row["from_lng"] = coordinates(row["port_from"])
+            row["to_lat"], row["to_lng"] = coordinates(row["port_to"])
+        return rows
+
+    # Warm up server caches before timing
+    run_join()
+    run_index()
+
+    rows = len(run_index())
+    print(f"eta_results rows: {rows}, ports in index: {len(index.ports)}")
+    for name, fn in (("join", run_join), ("index", run_index)):
+        samples = _time(fn, args.iterations)
+        print(f"{name:<6} mean {statistics.mean(samples) * 1000:8.2f} ms  "
+              f"p50 {statistics.median(samples) * 1000:8.2f} ms  "
+              f"min {min(samples) * 1000:8.2f} ms")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Time building the /api/ports body per request (format every row, then
+encode) against serving the bytes pre-built by the port catalog.
+
+    python benchmarks/bench_ports.py --ports 500 --requests 1000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.port_catalog import PortCatalog, convert_coordinate  # noqa: E402
+from services.serialization import dumps, loads  # noqa: E402
+
+
+def per_request(ports):
+    """The list route as it was: a formatter closure per row, then encode."""
+    formatted = []
+    for port in ports:
+        def convert(coord, is_longitude=False):
+            return convert_coordinate(coord, is_longitude)
+
+        formatted.append({
+            "id": port["id"],
+            "name": port["name"],
+            "region": port["region"],
+            "country": port["country"],
+            "location": {
+                "latitude": convert(port["latitude"], False),
+                "longitude": convert(port["longitude"], True)
+            },
+            "status": port["status"] or "ổn định",
+            "dockedShips": 0,
+            "capacity": 100,
+            "availableSlots": 100,
+            "avgWaitingTime": "N/A"
+        })
+    return dumps({"ports": formatted})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ports", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ports = [{
+        "id": i + 1,
+        "name": f"Port {i}",
+        "region": rng.choice(("Đông Nam Á", "Đông Á", "Nam Á")),
+        "country": rng.choice(("Việt Nam", "Singapore", "Nhật Bản")),
+        "latitude": Decimal(f"{rng.uniform(-40, 50):.6f}"),
+        "longitude": Decimal(f"{rng.uniform(90, 150):.6f}"),
+        "status": rng.choice((None, "ổn định", "đông đúc")),
+        "created_at": datetime(2025, 1, 1),
+    } for i in range(args.ports)]
+    catalog = PortCatalog(SimpleNamespace(ports=ports, version=1))
+
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        body = per_request(ports)
+    elapsed = time.perf_counter() - started
+    print(f"{'format per request':<24} {args.requests:>6} requests {elapsed * 1000:9.1f} ms "
+          f"({elapsed / args.requests * 1e6:.0f} us each)")
+
+    started = time.perf_counter()
+    catalog.list_body()
+    print(f"{'catalog build':<24} {args.ports:>6} ports    {(time.perf_counter() - started) * 1000:9.1f} ms")
+
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        cached = catalog.list_body()
+    elapsed = time.perf_counter() - started
+    print(f"{'catalog bytes':<24} {args.requests:>6} requests {elapsed * 1000:9.1f} ms "
+          f"({elapsed / args.requests * 1e6:.2f} us each)")
+    print(f"bodies match: {loads(body) == loads(cached)} ({len(cached)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Latency/throughput of micro-batched ETA inference at different batch windows.
+
+Runs InferenceServer in-process for every --windows value, either with N
+concurrent closed-loop callers (each sends its next request as soon as the
+previous one returns) or, with --rate, open-loop Poisson arrivals at a fixed
+request rate. Uses the stub model with a fixed per-call cost by default,
+so it needs no database, GPU or network; --model baseline runs the real
+baseline on synthetic positions.
+
+    python benchmarks/bench_predict.py --concurrency 64 --windows 0,1,2,5,10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.eta_model import StubModel, load_model  # noqa: E402
+from services.inference import InferenceServer  # noqa: E402
+
+PORTS = {"Hai Phong": (20.86, 106.68), "Singapore": (1.26, 103.84), "Shanghai": (31.23, 121.47)}
+
+
+def _coordinates(name):
+    return PORTS.get(name, (None, None))
+
+
+async def _bench(model, window_ms, max_batch_size, concurrency, duration, rate=None):
+    server = InferenceServer(max_batch_size=max_batch_size, max_wait_ms=window_ms, coordinates=_coordinates)
+    await server.start(model)
+    latencies = []
+    deadline = time.perf_counter() + duration
+    rng = random.Random(0)
+
+    async def request():
+        row = {
+            "latitude": rng.uniform(0, 30), "longitude": rng.uniform(100, 130),
+            "port_from": "Singapore", "port_to": rng.choice(list(PORTS)),
+            "wind_kmh": rng.uniform(0, 90),
+        }
+        started = time.perf_counter()
+        await server.predict(row)
+        latencies.append(time.perf_counter() - started)
+
+    async def client():
+        while time.perf_counter() < deadline:
+            await request()
+
+    async def arrivals():
+        # Sleep granularity is ~1 ms, so release every arrival that is due
+        tasks, due = [], time.perf_counter()
+        while due < deadline:
+            now = time.perf_counter()
+            while due <= now:
+                tasks.append(asyncio.ensure_future(request()))
+                due += rng.expovariate(rate)
+            await asyncio.sleep(max(due - time.perf_counter(), 0))
+        await asyncio.gather(*tasks)
+
+    started = time.perf_counter()
+    if rate:
+        await arrivals()
+    else:
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stats = server.stats()
+    await server.stop()
+
+    latencies.sort()
+    return {
+        "window_ms": window_ms,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p99_ms": round(latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000, 3),
+        "mean_batch_size": stats["mean_batch_size"],
+        "batches": stats["batches"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="stub", help="'stub' (default) or any load_model spec")
+    parser.add_argument("--stub-latency-ms", type=float, default=2.0, help="fixed cost per stub model call")
+    parser.add_argument("--concurrency", type=int, default=64, help="closed-loop callers")
+    parser.add_argument("--rate", type=float, default=None, help="open-loop arrivals per second instead")
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--windows", default="0,1,2,5,10", help="comma-separated max_wait_ms values")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per window")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    if args.model == "stub":
+        model = StubModel(latency_ms=args.stub_latency_ms)
+    else:
+        model = load_model(args.model)
+
+    results = []
+    for window in [float(w) for w in args.windows.split(",") if w.strip()]:
+        results.append(asyncio.run(_bench(
+            model, window, args.max_batch_size, args.concurrency, args.duration, args.rate
+        )))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    load = f"rate={args.rate}/s" if args.rate else f"concurrency={args.concurrency}"
+    print(f"model={args.model} {load} max_batch_size={args.max_batch_size}")
+    print(f"{'window':>8} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'batch':>7}")
+    for r in results:
+        print(f"{r['window_ms']:>8} {r['throughput_rps']:>10} {r['p50_ms']:>9} {r['p99_ms']:>9} "
+              f"{r['mean_batch_size']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark radius queries on the ship spatial index against a full scan.
+
+Builds a GridIndex over synthetic positions (uniform over shipping
+latitudes, or clustered in Asian waters with --region asia), then times
+random radius queries on the index (the array lookup alone, and including
+materializing result rows) and on a NumPy full-table scan, and checks that
+both return the same ships.
+
+    python benchmarks/bench_spatial_index.py --ships 100000 --radius-km 400
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.hazard import great_circle_km, to_unit_vectors  # noqa: E402
+from services.spatial_index import GridIndex  # noqa: E402
+
+REGIONS = {
+    "world": ((-60.0, 60.0), (-180.0, 180.0)),
+    "asia": ((-10.0, 40.0), (95.0, 145.0)),
+}
+
+
+def _ms(samples):
+    return (f"p50 {statistics.median(samples) * 1000:7.3f} ms  "
+            f"p99 {sorted(samples)[int(len(samples) * 0.99) - 1] * 1000:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ships", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--radius-km", type=float, default=400.0)
+    parser.add_argument("--cell-deg", type=float, default=1.0)
+    parser.add_argument("--region", choices=sorted(REGIONS), default="world")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    (lat_lo, lat_hi), (lng_lo, lng_hi) = REGIONS[args.region]
+    lats = [rng.uniform(lat_lo, lat_hi) for _ in range(args.ships)]
+    lngs = [rng.uniform(lng_lo, lng_hi) for _ in range(args.ships)]
+
+    grid = GridIndex(args.cell_deg)
+    started = time.perf_counter()
+    for i in range(args.ships):
+        grid.put(i, lats[i], lngs[i], i)
+    build = time.perf_counter() - started
+
+    moves = args.ships // 10
+    started = time.perf_counter()
+    for i in range(moves):
+        grid.put(i, lats[i] + 0.05, lngs[i] + 0.05, i)
+    move = time.perf_counter() - started
+    for i in range(moves):
+        grid.put(i, lats[i], lngs[i], i)
+
+    vectors = to_unit_vectors(lats, lngs)
+    centres = [(rng.uniform(lat_lo, lat_hi), rng.uniform(lng_lo, lng_hi)) for _ in range(args.queries)]
+
+    index_times, rows_times, scan_times, found = [], [], [], 0
+    for lat, lng in centres:
+        t0 = time.perf_counter()
+        grid.query(lat, lng, args.radius_km)
+        t1 = time.perf_counter()
+        hits = grid.within(lat, lng, args.radius_km)
+        t2 = time.perf_counter()
+        distances = great_circle_km(vectors, to_unit_vectors([lat], [lng]))[:, 0]
+        expected = np.flatnonzero(distances <= args.radius_km)
+        t3 = time.perf_counter()
+        index_times.append(t1 - t0)
+        rows_times.append(t2 - t1)
+        scan_times.append(t3 - t2)
+        found += len(hits)
+        # Points sitting exactly on the boundary may differ by float rounding
+        got = {key for _, key, _ in hits}
+        missing = set(expected.tolist()) ^ got
+        if any(abs(distances[key] - args.radius_km) > 1e-6 for key in missing):
+            raise SystemExit(f"mismatch at ({lat:.3f}, {lng:.3f}): {len(missing)} ships differ")
+
+    print(f"{args.ships} ships ({args.region}), cell {args.cell_deg} deg, radius {args.radius_km} km")
+    print(f"build {build * 1000:.1f} ms, move {moves} ships {move * 1000:.1f} ms, "
+          f"{grid.cells} cells, {found / len(centres):.1f} ships per query")
+    print(f"index lookup       {_ms(index_times)}")
+    print(f"index + row tuples {_ms(rows_times)}")
+    print(f"full scan          {_ms(scan_times)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Time route progress for a whole fleet with the vectorized RouteTable,
+against a per-ship loop that walks a waypoint polyline of the ship's route.
+
+    python benchmarks/bench_voyage.py --ships 100000 --ports 500
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.hazard import EARTH_RADIUS_KM  # noqa: E402
+from services.port_index import normalize_port_name  # noqa: E402
+from services.voyage import RouteTable  # noqa: E402
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+def per_ship(table, ships):
+    """Nearest waypoint of the cached polyline, then the distance still to sail."""
+    paths = {}
+    results = []
+    for origin, destination, lat, lng in ships:
+        path = paths.get((origin, destination))
+        if path is None:
+            path = paths[(origin, destination)] = json.loads(table.path(origin, destination))["waypoints"]
+        nearest = min(range(len(path)), key=lambda i: haversine_km(lat, lng, *path[i]))
+        remaining = sum(haversine_km(*path[i], *path[i + 1]) for i in range(nearest, len(path) - 1))
+        results.append((nearest / (len(path) - 1), remaining))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ships", type=int, default=100000)
+    parser.add_argument("--ports", type=int, default=500)
+    parser.add_argument("--loop-ships", type=int, default=5000, help="ships timed in the per-ship loop")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ports = {f"Port {i}": (rng.uniform(-40, 50), rng.uniform(90, 150)) for i in range(args.ports)}
+    names = list(ports)
+    ships = []
+    for _ in range(args.ships):
+        origin, destination = rng.sample(names, 2)
+        t = rng.random()
+        (lat1, lng1), (lat2, lng2) = ports[origin], ports[destination]
+        ships.append((origin, destination, lat1 + (lat2 - lat1) * t + rng.gauss(0, 0.2),
+                      lng1 + (lng2 - lng1) * t + rng.gauss(0, 0.2)))
+    hours = np.array([rng.uniform(1, 400) for _ in ships])
+    keyed = {normalize_port_name(name): position for name, position in ports.items()}
+    table = RouteTable(coordinates=lambda name: keyed.get(normalize_port_name(name), (None, None)),
+                       version=lambda: 0)
+
+    def vectorized():
+        ids = table.route_ids([s[0] for s in ships], [s[1] for s in ships])
+        voyages = table.voyages(ids, [s[2] for s in ships], [s[3] for s in ships], hours)
+        return voyages, table.encode(voyages)
+
+    for label in ("vectorized, routes cold", "vectorized, routes cached"):
+        started = time.perf_counter()
+        voyages, _ = vectorized()
+        print(f"{label:<28} {args.ships:>7} ships {(time.perf_counter() - started) * 1000:9.1f} ms")
+    print(f"routes {table.stats()['routes']}")
+
+    sample = ships[:args.loop_ships]
+    started = time.perf_counter()
+    looped = per_ship(table, sample)
+    elapsed = time.perf_counter() - started
+    print(f"{'per-ship polyline loop':<28} {len(sample):>7} ships {elapsed * 1000:9.1f} ms "
+          f"(~{elapsed * args.ships / len(sample):.1f} s for {args.ships})")
+    gap = np.abs(np.array([r[1] for r in looped]) - voyages["remaining_km"][:len(sample)])
+    print(f"remaining_km vs polyline: median gap {np.median(gap):.1f} km")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Time ingesting a synthetic weather CSV (a lat/lng grid of hourly
+observations, like weather_data_asia.csv), then opening the memory-mapped
+dataset and looking up weather for many ships, against parsing the whole
+CSV into memory (and pandas.read_csv when pandas is installed).
+
+    python benchmarks/bench_weather.py --grid-deg 0.5 --hours 72 --queries 100000
+"""
+import argparse
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.weather import WeatherDataset, ingest, to_epoch_seconds  # noqa: E402
+
+
+def write_csv(path, grid_deg, hours, start):
+    lats = np.arange(0.0, 40.0, grid_deg)
+    lngs = np.arange(95.0, 150.0, grid_deg)
+    rng = np.random.default_rng(0)
+    rows = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["time", "latitude", "longitude", "wind_speed_10m", "wave_height", "precipitation"])
+        for hour in range(hours):
+            stamp = (start + timedelta(hours=hour)).strftime("%Y-%m-%d %H:%M:%S")
+            for lat in lats:
+                wind = rng.uniform(0, 90, len(lngs)).round(1)
+                wave = rng.uniform(0, 6, len(lngs)).round(2)
+                rain = rng.uniform(0, 20, len(lngs)).round(1)
+                writer.writerows(zip([stamp] * len(lngs), [round(lat, 4)] * len(lngs), lngs.round(4), wind, wave, rain))
+                rows += len(lngs)
+    return rows
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"{label:<34} {(time.perf_counter() - started) * 1000:9.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grid-deg", type=float, default=0.5)
+    parser.add_argument("--hours", type=int, default=72)
+    parser.add_argument("--queries", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench_weather_")
+    try:
+        start = datetime(2024, 9, 1)
+        path = os.path.join(directory, "weather_data_asia.csv")
+        rows = write_csv(path, args.grid_deg, args.hours, start)
+        print(f"{rows} rows, {os.path.getsize(path) / 1e6:.1f} MB of CSV")
+
+        def load_csv():
+            with open(path, newline="") as f:
+                return list(csv.DictReader(f))
+
+        timed("full load (csv.DictReader)", load_csv)
+        try:
+            import pandas
+            timed("full load (pandas.read_csv)", lambda: pandas.read_csv(path, parse_dates=["time"]))
+        except ImportError:
+            pass
+
+        store = os.path.join(directory, "store")
+        meta = timed("ingest", lambda: ingest(path, store))
+        size = sum(os.path.getsize(os.path.join(store, meta["name"], n))
+                   for n in os.listdir(os.path.join(store, meta["name"])))
+        print(f"{meta['points']} points, {size / 1e6:.1f} MB on disk")
+        timed("ingest again (unchanged)", lambda: ingest(path, store))
+        dataset = timed("open (memory-mapped)", lambda: WeatherDataset(os.path.join(store, meta["name"])))
+
+        rng = random.Random(args.seed)
+        lats = np.array([rng.uniform(-5, 45) for _ in range(args.queries)])
+        lngs = np.array([rng.uniform(90, 155) for _ in range(args.queries)])
+        times = to_epoch_seconds([start + timedelta(minutes=rng.randint(0, args.hours * 60))
+                                  for _ in range(args.queries)])
+        result = timed(f"lookup {args.queries} positions", lambda: dataset.lookup(lats, lngs, times))
+        timed(f"lookup {args.queries} positions (warm)", lambda: dataset.lookup(lats, lngs, times))
+        found = ~np.isnan(result["wind_kmh"])
+        print(f"{found.mean():.1%} of positions within range of an observation")
+
+        # Exact grid points and hours must return the value written for them
+        with open(path, newline="") as f:
+            sample = [row for _, row in zip(range(1000), csv.DictReader(f))]
+        exact = dataset.lookup([float(r["latitude"]) for r in sample], [float(r["longitude"]) for r in sample],
+                               to_epoch_seconds([datetime.fromisoformat(r["time"]) for r in sample]))
+        expected = np.array([float(r["wave_height"]) for r in sample], dtype=np.float32)
+        print("exact lookups match:", bool(np.array_equal(exact["wave_height_m"].astype(np.float32), expected)))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Concurrent load test for the read API.
+
+Drives a running server with a fixed number of keep-alive clients that
+alternate between the configured endpoints, then reports throughput and
+p50/p95/p99 latency per endpoint.
+
+    python benchmarks/load_test.py --url http://localhost:8000 \\
+        --paths /api/eta /api/storm-alerts --concurrency 32 --duration 20
+
+Run it once against a build before a change and once after, with the same
+arguments, and compare the printed (or ``--json``) results.
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    report = {}
+    for path in sorted(set(latencies) | set(errors)):
+        values = sorted(latencies.get(path, []))
+        report[path] = {
+            "requests": len(values),
+            "errors": errors.get(path, 0),
+            "rps": round(len(values) / elapsed, 2) if elapsed else 0,
+            "p50_ms": _ms(percentile(values, 50)),
+            "p95_ms": _ms(percentile(values, 95)),
+            "p99_ms": _ms(percentile(values, 99)),
+            "max_ms": _ms(values[-1] if values else None),
+        }
+    return report
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def _client(base, paths, deadline, latencies, errors, lock, headers):
+    conn_cls = http.client.HTTPSConnection if base.scheme == "https" else http.client.HTTPConnection
+    conn = conn_cls(base.hostname, base.port, timeout=60)
+    local_lat = defaultdict(list)
+    local_err = defaultdict(int)
+    i = 0
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            conn.request("GET", base.path.rstrip("/") + path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                local_err[path] += 1
+                continue
+            local_lat[path].append(time.perf_counter() - started)
+        except (OSError, http.client.HTTPException):
+            local_err[path] += 1
+            conn.close()
+            conn = conn_cls(base.hostname, base.port, timeout=60)
+    conn.close()
+    with lock:
+        for path, values in local_lat.items():
+            latencies[path].extend(values)
+        for path, count in local_err.items():
+            errors[path] += count
+
+
+def run(url, paths, concurrency, duration, headers=None):
+    base = urlparse(url)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(
+            target=_client,
+            # Stagger starting endpoints so the mix is even from the first request
+            args=(base, paths[i % len(paths):] + paths[:i % len(paths)], deadline,
+                  latencies, errors, lock, headers or {}),
+            daemon=True,
+        )
+        for i in range(concurrency)
+    ]
+    started = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(latencies, errors, time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--paths", nargs="+", default=["/api/eta", "/api/storm-alerts"])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--json", dest="json_path", help="write results to this file")
+    args = parser.parse_args()
+
+    report = run(args.url, args.paths, args.concurrency, args.duration)
+    for path, stats in report.items():
+        print(f"{path:<24} {stats['requests']:>7} req  {stats['rps']:>8} rps  "
+              f"p50 {stats['p50_ms']} ms  p95 {stats['p95_ms']} ms  p99 {stats['p99_ms']} ms  "
+              f"errors {stats['errors']}")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"url": args.url, "concurrency": args.concurrency,
+                       "duration_s": args.duration, "results": report}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
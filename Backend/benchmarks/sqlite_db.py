@@ -0,0 +1,298 @@
+"""
+SQLite stand-in for the MySQL database, for benchmarks that need the real
+app and queries without a MySQL server.
+
+``install(path)`` replaces ``mysql.connector.connect`` with connections to a
+SQLite file that speak the subset of the mysql-connector API the backend
+uses (dictionary and unbuffered cursors, ``fetchmany``, ``executemany``,
+``ping``, ``in_transaction``). Queries are translated on the way in:
+``%s`` placeholders, MySQL functions (NOW, DATE_FORMAT, UNIX_TIMESTAMP,
+GREATEST/LEAST), ``INSERT IGNORE``, ``ON DUPLICATE KEY UPDATE`` and
+``UPDATE ... JOIN`` over a derived table (``BulkUpdate``).
+``seed(path, ships=...)`` creates the tables and fills them with
+synthetic ports, ships and storms.
+
+    python benchmarks/sqlite_db.py /tmp/bench.db --ships 100000
+"""
+import argparse
+import random
+import re
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sea_ports (
+    id INTEGER PRIMARY KEY, port_name TEXT, region TEXT, country TEXT,
+    latitude REAL, longitude REAL, status TEXT, created_at DATETIME
+);
+CREATE TABLE IF NOT EXISTS eta_results (
+    id INTEGER PRIMARY KEY, IMO INTEGER, ship_name TEXT, port_from TEXT, port_to TEXT,
+    eta_expected DATETIME, delay_hours REAL, status TEXT, reason TEXT, distance_to_hazard REAL,
+    latitude REAL, longitude REAL, updated_at DATETIME
+);
+CREATE INDEX IF NOT EXISTS idx_eta_results_ship_name ON eta_results (ship_name);
+CREATE INDEX IF NOT EXISTS idx_eta_results_imo ON eta_results (IMO);
+CREATE INDEX IF NOT EXISTS idx_eta_results_updated_at ON eta_results (updated_at);
+CREATE INDEX IF NOT EXISTS idx_eta_results_eta ON eta_results (eta_expected, ship_name);
+CREATE TABLE IF NOT EXISTS storm_info (
+    id INTEGER PRIMARY KEY, name TEXT, latitude REAL, longitude REAL, wind_kmh REAL,
+    level TEXT, radius_km REAL, warning_radius_km REAL, updated_at DATETIME
+);
+CREATE TABLE IF NOT EXISTS eta_history (
+    ship_name TEXT NOT NULL, imo INTEGER NOT NULL DEFAULT 0, updated_at DATETIME NOT NULL,
+    eta_expected DATETIME, delay_hours REAL, status TEXT, latitude REAL, longitude REAL,
+    distance_to_hazard REAL, PRIMARY KEY (ship_name, imo, updated_at)
+);
+CREATE INDEX IF NOT EXISTS idx_eta_history_updated_at ON eta_history (updated_at);
+CREATE TABLE IF NOT EXISTS eta_history_hourly (
+    ship_name TEXT NOT NULL, imo INTEGER NOT NULL DEFAULT 0, bucket DATETIME NOT NULL,
+    eta_expected DATETIME, delay_hours REAL, delay_min REAL, delay_max REAL, status TEXT,
+    latitude REAL, longitude REAL, revisions INTEGER, PRIMARY KEY (ship_name, imo, bucket)
+);
+CREATE TABLE IF NOT EXISTS weather_observations (
+    id INTEGER PRIMARY KEY, source TEXT, observed_at DATETIME, latitude REAL, longitude REAL,
+    wind_kmh REAL, wave_height_m REAL, rain_mm REAL, temperature_c REAL
+);
+CREATE TABLE IF NOT EXISTS storm_track (
+    storm_id INTEGER NOT NULL, observed_at DATETIME NOT NULL, latitude REAL NOT NULL, longitude REAL NOT NULL,
+    wind_kmh REAL, radius_km REAL, warning_radius_km REAL, PRIMARY KEY (storm_id, observed_at)
+);
+CREATE TABLE IF NOT EXISTS storm_encounters (
+    ship_name TEXT NOT NULL, imo INTEGER NOT NULL DEFAULT 0, storm_id INTEGER NOT NULL, zone TEXT NOT NULL,
+    encounter_at DATETIME NOT NULL, storm_delay_hours REAL NOT NULL, delay_hours REAL,
+    computed_at DATETIME NOT NULL, PRIMARY KEY (ship_name, imo)
+);
+CREATE INDEX IF NOT EXISTS idx_storm_encounters_storm ON storm_encounters (storm_id, encounter_at);
+CREATE INDEX IF NOT EXISTS idx_weather_observations_source ON weather_observations (source, observed_at);
+"""
+
+STORM_LEVELS = ("Tropical Storm", "Category 1", "Category 2", "Category 3", "Category 4",
+                "Category 5", "Super Typhoon")
+STATUSES = ("active", "active", "active", "warning", "inactive")
+
+_DATE_FORMAT = {"%i": "%M", "%s": "%S", "%T": "%H:%M:%S", "%e": "%d", "%c": "%m"}
+_DUPLICATE_KEY = re.compile(r"ON\s+DUPLICATE\s+KEY\s+UPDATE", re.IGNORECASE)
+_VALUES_REF = re.compile(r"\bVALUES\s*\(\s*(\w+)\s*\)", re.IGNORECASE)
+_INSERT_IGNORE = re.compile(r"\bINSERT\s+IGNORE\b", re.IGNORECASE)
+_GREATEST = re.compile(r"\bGREATEST\s*\(", re.IGNORECASE)
+_LEAST = re.compile(r"\bLEAST\s*\(", re.IGNORECASE)
+_UPDATE_JOIN = re.compile(r"^\s*UPDATE\s+(\w+)\s+AS\s+(\w+)\s+JOIN\s+\(SELECT\s+(.*)\)\s+AS\s+(\w+)"
+                          r"\s+ON\s+(.*?)\s+SET\s+(.*)$", re.IGNORECASE | re.DOTALL)
+_UNION_ALL = re.compile(r"\s+UNION\s+ALL\s+SELECT\s+", re.IGNORECASE)
+_ALIAS = re.compile(r"\s+AS\s+(\w+)", re.IGNORECASE)
+
+
+def _text(value):
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _date_format(value, fmt):
+    if value is None:
+        return None
+    value = datetime.fromisoformat(str(value))
+    return value.strftime(re.sub(r"%[isTec]", lambda m: _DATE_FORMAT[m.group()], fmt))
+
+
+def _unix_timestamp(value=None):
+    value = datetime.now() if value is None else datetime.fromisoformat(str(value))
+    return int(value.timestamp())
+
+
+sqlite3.register_adapter(datetime, _text)
+sqlite3.register_adapter(np.int64, int)
+sqlite3.register_adapter(np.int32, int)
+
+
+def _update_join(match):
+    # UPDATE t JOIN (SELECT .. UNION ALL SELECT ..) v ON .. SET .. becomes
+    # UPDATE t SET .. FROM (VALUES ..) v WHERE ..; VALUES has no compound-select limit
+    table, alias, derived, name, on, assignments = match.groups()
+    selects = _UNION_ALL.split(derived)
+    columns = ", ".join(f"column{i + 1} AS {column}" for i, column in enumerate(_ALIAS.findall(selects[0])))
+    rows = ", ".join(f"({select})" for select in [_ALIAS.sub("", selects[0])] + selects[1:])
+    return f"UPDATE {table} AS {alias} SET {assignments} FROM (SELECT {columns} FROM (VALUES {rows})) AS {name} WHERE {on}"
+
+
+def translate(query):
+    """Rewrite MySQL-only syntax used by the backend into SQLite."""
+    query = _UPDATE_JOIN.sub(_update_join, query)
+    query = query.replace("%s", "?")
+    if _DUPLICATE_KEY.search(query):
+        head, tail = _DUPLICATE_KEY.split(query, 1)
+        query = head + "ON CONFLICT DO UPDATE SET" + _VALUES_REF.sub(r"excluded.\1", tail)
+    query = _INSERT_IGNORE.sub("INSERT OR IGNORE", query)
+    query = _GREATEST.sub("MAX(", query)
+    return _LEAST.sub("MIN(", query)
+
+
+def _value(value):
+    # DATETIME columns come back as text; mysql-connector returns datetime
+    if type(value) is str and len(value) == 19 and value[4] == "-" and value[10] == " ":
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    return value
+
+
+class Cursor:
+    def __init__(self, conn, dictionary=False, buffered=True):
+        self._conn = conn
+        self._cursor = conn.cursor()
+        self._dictionary = dictionary
+        self._columns = None
+        self.rowcount = -1
+
+    def execute(self, query, params=None):
+        self._cursor.execute(translate(query), tuple(params or ()))
+        self._columns = [d[0] for d in self._cursor.description] if self._cursor.description else None
+        self.rowcount = self._cursor.rowcount
+
+    def executemany(self, query, rows):
+        # One transaction per batch, as a MySQL multi-row statement would be
+        own = not self._conn.in_transaction
+        if own:
+            self._conn.execute("BEGIN")
+        try:
+            self._cursor.executemany(translate(query), [tuple(row) for row in rows])
+            if own:
+                self._conn.execute("COMMIT")
+        except Exception:
+            if own:
+                self._conn.execute("ROLLBACK")
+            raise
+        self.rowcount = self._cursor.rowcount
+
+    def _row(self, row):
+        if row is None:
+            return None
+        values = [_value(v) for v in row]
+        return dict(zip(self._columns, values)) if self._dictionary else tuple(values)
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class Connection:
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.create_function("NOW", 0, lambda: _text(datetime.now()))
+        self._conn.create_function("UTC_TIMESTAMP", 0, lambda: _text(datetime.utcnow()))
+        self._conn.create_function("DATE_FORMAT", 2, _date_format)
+        self._conn.create_function("UNIX_TIMESTAMP", -1, _unix_timestamp)
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def cursor(self, dictionary=False, buffered=True):
+        return Cursor(self._conn, dictionary, buffered)
+
+    def is_connected(self):
+        return True
+
+    def ping(self, reconnect=False):
+        self._conn.execute("SELECT 1")
+
+    def start_transaction(self):
+        self._conn.execute("BEGIN")
+
+    def commit(self):
+        if self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+
+    def rollback(self):
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
+
+    def close(self):
+        self._conn.close()
+
+
+def install(path):
+    """Point mysql.connector.connect (and so the backend's pool) at the SQLite file."""
+    import mysql.connector
+    mysql.connector.connect = lambda *args, **kwargs: Connection(path)
+
+
+def seed(path, ships=1000, ports=500, storms=20, seed=0, batch=50000):
+    """Create the schema in ``path`` and fill it with synthetic rows."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.executescript("DROP TABLE IF EXISTS sea_ports; DROP TABLE IF EXISTS eta_results; "
+                       "DROP TABLE IF EXISTS storm_info; DROP TABLE IF EXISTS eta_history; "
+                       "DROP TABLE IF EXISTS eta_history_hourly; DROP TABLE IF EXISTS storm_track; "
+                       "DROP TABLE IF EXISTS storm_encounters;" + SCHEMA)
+    now = datetime.now().replace(microsecond=0)
+
+    port_rows = [(i, f"Port {i:04d}", rng.choice(("Asia", "Europe", "Americas")), f"Country {i % 60}",
+                  round(rng.uniform(-40, 55), 6), round(rng.uniform(90, 150), 6),
+                  rng.choice((None, "ổn định", "đông đúc")), _text(now - timedelta(days=30)))
+                 for i in range(1, ports + 1)]
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO sea_ports VALUES (?, ?, ?, ?, ?, ?, ?, ?)", port_rows)
+    storm_rows = [
+        (i, f"Storm {i}", round(rng.uniform(5, 30), 4), round(rng.uniform(105, 140), 4), rng.randint(60, 250),
+         rng.choice(STORM_LEVELS), rng.choice((80, 150, 250)), rng.choice((200, 400, 600)), _text(now))
+        for i in range(1, storms + 1)
+    ]
+    conn.executemany("INSERT INTO storm_info VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", storm_rows)
+    # Earlier fixes every 6 hours, drifting north-west at about 20 km/h towards the current position
+    conn.executemany("INSERT INTO storm_track VALUES (?, ?, ?, ?, ?, ?, ?)", [
+        (row[0], _text(now - timedelta(hours=hours)), round(row[2] - hours * rng.uniform(0.05, 0.15), 4),
+         round(row[3] + hours * rng.uniform(0.05, 0.15), 4), row[4], row[6], row[7])
+        for row in storm_rows for hours in (18, 12, 6)
+    ])
+    conn.execute("COMMIT")
+
+    names = [row[1] for row in port_rows]
+    for start in range(0, ships, batch):
+        rows = []
+        for i in range(start, min(ships, start + batch)):
+            port_from, port_to = rng.sample(names, 2)
+            rows.append((
+                9000000 + i, f"Ship {i:07d}", port_from, port_to,
+                _text(now + timedelta(minutes=rng.randint(-2000, 60000))),
+                rng.choice((0.0, 0.0, 1.5, 6.0, 12.0)), rng.choice(STATUSES), None,
+                round(rng.uniform(0, 2000), 2), round(rng.uniform(-30, 45), 6), round(rng.uniform(95, 145), 6),
+                _text(now - timedelta(seconds=rng.randint(60, 86400))),
+            ))
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT INTO eta_results (IMO, ship_name, port_from, port_to, eta_expected, delay_hours, status, "
+            "reason, distance_to_hazard, latitude, longitude, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.execute("COMMIT")
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--ships", type=int, default=1000)
+    parser.add_argument("--ports", type=int, default=500)
+    parser.add_argument("--storms", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    seed(args.path, args.ships, args.ports, args.storms, args.seed)
+    print(f"seeded {args.ships} ships into {args.path} in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
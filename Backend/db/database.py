@@ -1,7 +1,12 @@
+import logging
 import os
+import threading
 from dotenv import load_dotenv
 import mysql.connector
 from mysql.connector import Error
+from db.pool import ConnectionPool
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -17,6 +22,25 @@ DB_CONFIG = {
     'raise_on_warnings': True
 }
 
+# Connection pool configuration (per worker process)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+DB_POOL_PING_INTERVAL = float(os.getenv('DB_POOL_PING_INTERVAL', '30'))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def open_connection():
+    """
+    Open a new database connection, raising on failure.
+    """
+    return mysql.connector.connect(
+        **DB_CONFIG,
+        connection_timeout=10,
+        buffered=True,
+        autocommit=True
+    )
+
 def get_db_connection():
     """
     Create and return a new database connection.
@@ -24,31 +48,57 @@ def get_db_connection():
     """
     try:
         # Create connection with extended timeout and better error handling
-        connection = mysql.connector.connect(
-            **DB_CONFIG,
-            connection_timeout=10,
-            buffered=True,
-            autocommit=True
-        )
+        connection = open_connection()
         
         if connection.is_connected():
-            print("Successfully connected to MySQL database")
+            logger.debug("Connected to MySQL database")
             return connection
             
     except Error as e:
-        print(f"Error connecting to MySQL database: {str(e)}")
+        logger.error(f"Error connecting to MySQL database: {str(e)}")
         if "Access denied" in str(e):
-            print("Check your MySQL username and password in .env file")
+            logger.error("Check your MySQL username and password in .env file")
         elif "Can't connect" in str(e):
-            print("Make sure MySQL server is running")
+            logger.error("Make sure MySQL server is running")
         elif "Unknown database" in str(e):
-            print(f"Database '{DB_CONFIG['database']}' does not exist")
+            logger.error(f"Database '{DB_CONFIG['database']}' does not exist")
         return None
         
     except Exception as e:
-        print(f"Unexpected error while connecting to database: {str(e)}")
+        logger.error(f"Unexpected error while connecting to database: {str(e)}")
         return None
 
+def init_pool():
+    """
+    Create the shared connection pool for this process if it does not exist yet.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                open_connection,
+                size=DB_POOL_SIZE,
+                timeout=DB_POOL_TIMEOUT,
+                ping_interval=DB_POOL_PING_INTERVAL
+            )
+        return _pool
+
+def get_pool():
+    """
+    Return the shared connection pool, creating it on first use.
+    """
+    return _pool if _pool is not None else init_pool()
+
+def close_pool():
+    """
+    Close all pooled connections. Called on application shutdown.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
 def test_connection():
     """
     Test database connection and print status.
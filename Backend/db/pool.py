@@ -0,0 +1,169 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of MySQL connections.
+
+    Connections are opened lazily up to ``size``. When every connection is
+    checked out, ``acquire`` waits up to ``timeout`` seconds for one to be
+    released. Idle connections that have not been used for longer than
+    ``ping_interval`` seconds are pinged before being handed out and replaced
+    if the server dropped them.
+    """
+
+    def __init__(self, connect, size=5, timeout=10.0, ping_interval=30.0):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (connection, released_at)
+        self._open = 0
+        self._in_use = 0
+        self._closed = False
+
+        # Metrics
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+
+    def acquire(self):
+        """Check out a healthy connection, waiting for one if the pool is exhausted."""
+        started = time.monotonic()
+        waited = False
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout("Connection pool is closed")
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    break
+                if self._open < self.size:
+                    # Reserve the slot before connecting outside the lock
+                    self._open += 1
+                    conn, released_at = None, None
+                    break
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._timeouts += 1
+                    self._record_wait(started, waited)
+                    raise PoolTimeout(
+                        f"Timed out after {self.timeout}s waiting for a database connection"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+            self._in_use += 1
+            self._checkouts += 1
+            self._record_wait(started, waited)
+
+        try:
+            if conn is None or not self._is_healthy(conn, released_at):
+                conn = self._open_connection()
+        except BaseException:
+            with self._cond:
+                self._in_use -= 1
+                self._open -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool, or close it if ``discard`` is set."""
+        if conn is None:
+            return
+        if not discard:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed:
+                self._open -= 1
+                self._discarded += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+        if discard or self._closed:
+            _close_quietly(conn)
+
+    def close(self):
+        """Close all idle connections and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            _close_quietly(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_time_total_s": round(self._wait_time, 6),
+                "wait_time_max_s": round(self._max_wait_time, 6),
+                "timeouts": self._timeouts,
+                "connections_created": self._created,
+                "connections_discarded": self._discarded,
+            }
+
+    def _record_wait(self, started, waited):
+        if not waited:
+            return
+        elapsed = time.monotonic() - started
+        self._waits += 1
+        self._wait_time += elapsed
+        self._max_wait_time = max(self._max_wait_time, elapsed)
+
+    def _is_healthy(self, conn, released_at):
+        if time.monotonic() - released_at < self.ping_interval:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            logger.warning("Discarding stale pooled database connection")
+            with self._cond:
+                self._discarded += 1
+            _close_quietly(conn)
+            return False
+
+    def _open_connection(self):
+        conn = self._connect()
+        with self._cond:
+            self._created += 1
+        return conn
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass
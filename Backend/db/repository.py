@@ -0,0 +1,266 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from db.database import get_pool
+from db.pool import PoolTimeout
+from services.metrics import record_query
+
+# Threads used for blocking driver calls. Defaults to the pool size so an
+# offloaded query never queues behind the pool as well as the executor.
+DB_EXECUTOR_WORKERS = int(os.getenv('DB_EXECUTOR_WORKERS', '0'))
+# Streams (exports) open at once, each holding a pooled connection for the
+# whole download. Defaults to half the pool so other routes always get one.
+DB_STREAM_LIMIT = int(os.getenv('DB_STREAM_LIMIT', '0'))
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+class BulkUpdate(NamedTuple):
+    """
+    An UPDATE that writes a chunk of rows with one statement: the new values
+    are a derived table joined to ``table`` (alias ``t``) on ``keys``. Rows
+    are ``(*columns, *keys)`` tuples, ordered like the usual
+    ``SET ... WHERE ...`` parameters.
+    """
+    table: str
+    columns: tuple     # columns set from the row values
+    keys: tuple        # expressions on ``t`` matched against the row keys
+    extra: str = ""    # further assignments, e.g. "updated_at = NOW()"
+
+    def query(self, count):
+        return _bulk_update_query(self, count)
+
+
+@functools.lru_cache(maxsize=32)
+def _bulk_update_query(update, count):
+    names = [f"c{i}" for i in range(len(update.columns))] + [f"k{i}" for i in range(len(update.keys))]
+    derived = ("SELECT " + ", ".join(f"%s AS {name}" for name in names)
+               + (" UNION ALL SELECT " + ", ".join(["%s"] * len(names))) * (count - 1))
+    assignments = [f"{column} = v.c{i}" for i, column in enumerate(update.columns)]
+    if update.extra:
+        assignments.append(update.extra)
+    on = " AND ".join(f"{key} = v.k{i}" for i, key in enumerate(update.keys))
+    return f"UPDATE {update.table} AS t JOIN ({derived}) AS v ON {on} SET {', '.join(assignments)}"
+
+
+class Repository:
+    """
+    Async data-access interface used by the route handlers.
+
+    mysql-connector is a blocking driver, so every query runs on a bounded
+    thread pool with a connection checked out of the shared pool. The event
+    loop only awaits the result, which lets concurrent requests overlap their
+    database waits instead of stalling the worker.
+    """
+
+    def __init__(self, pool, max_workers=None, stream_limit=None):
+        self.pool = pool
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or pool.size,
+            thread_name_prefix="db"
+        )
+        self.stream_limit = stream_limit or max(1, pool.size // 2)
+        self._stream_slots = None  # asyncio.Semaphore, created on first use
+        self._active_streams = 0
+
+    async def run(self, fn, *args):
+        """Run ``fn(conn, *args)`` on the executor with a pooled connection."""
+        loop = asyncio.get_running_loop()
+        result, acquire_s, execute_s = await loop.run_in_executor(self._executor, self._call, fn, args)
+        # Recorded here rather than on the executor thread, which does not
+        # see the request's context
+        record_query(fn.__name__.lstrip("_"), acquire_s, execute_s)
+        return result
+
+    async def fetch_all(self, query, params=None):
+        return await self.run(_fetch_all, query, params)
+
+    async def fetch_one(self, query, params=None):
+        return await self.run(_fetch_one, query, params)
+
+    async def stream(self, query, params=None, batch_size=1000):
+        """
+        Yield result rows in batches of up to ``batch_size`` dicts.
+
+        Uses an unbuffered (server-side) cursor so only one batch is held in
+        memory at a time. The connection stays checked out until the stream
+        is exhausted or closed; an abandoned stream discards its connection,
+        since it may still have unread rows. At most ``stream_limit`` streams
+        are open at once; the rest wait up to the pool timeout for a slot.
+        """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        if self._stream_slots is None:
+            self._stream_slots = asyncio.Semaphore(self.stream_limit)
+        try:
+            await asyncio.wait_for(self._stream_slots.acquire(), self.pool.timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeout(f"No stream slot free after {self.pool.timeout}s "
+                              f"({self.stream_limit} streams open)") from None
+        self._active_streams += 1
+        conn = None
+        cursor = None
+        finished = False
+        try:
+            conn = await loop.run_in_executor(self._executor, self.pool.acquire)
+            acquire_s = time.perf_counter() - started
+            started = time.perf_counter()
+            cursor = await loop.run_in_executor(self._executor, _open_stream, conn, query, params)
+            while True:
+                rows = await loop.run_in_executor(self._executor, cursor.fetchmany, batch_size)
+                if not rows:
+                    break
+                record_query("stream", acquire_s, time.perf_counter() - started)
+                acquire_s = 0.0
+                yield rows
+                started = time.perf_counter()
+            finished = True
+        finally:
+            if conn is not None:
+                if finished:
+                    cursor.close()
+                self.pool.release(conn, discard=not finished)
+            self._active_streams -= 1
+            self._stream_slots.release()
+
+    def streams_full(self):
+        """True when every stream slot is taken and a new stream would wait."""
+        return self._active_streams >= self.stream_limit
+
+    async def execute(self, query, params=None):
+        """Execute a statement and return the affected row count."""
+        return await self.run(_execute, query, params)
+
+    async def execute_many(self, query, rows, chunk_size=1000):
+        """
+        Run ``executemany`` over ``rows`` in chunks, each chunk in its own
+        transaction. Returns the total affected row count.
+
+        mysql-connector folds an INSERT into one multi-row statement but runs
+        any other statement once per row; use ``update_many`` for UPDATEs.
+        """
+        return await self.run(_execute_many, query, rows, chunk_size)
+
+    async def update_many(self, update, rows, chunk_size=1000):
+        """
+        Apply a ``BulkUpdate`` to ``rows``, one statement and one transaction
+        per chunk. Returns the total affected row count.
+        """
+        return await self.run(_update_many, update, rows, chunk_size)
+
+    def stats(self):
+        return {"streams": self._active_streams, "stream_limit": self.stream_limit}
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def _call(self, fn, args):
+        started = time.perf_counter()
+        conn = self.pool.acquire()
+        acquired = time.perf_counter()
+        broken = False
+        try:
+            result = fn(conn, *args)
+            return result, acquired - started, time.perf_counter() - acquired
+        except Exception:
+            # Don't hand a connection the server dropped back to the next caller
+            broken = not conn.is_connected()
+            raise
+        finally:
+            self.pool.release(conn, discard=broken)
+
+
+def _fetch_all(conn, query, params):
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def _fetch_one(conn, query, params):
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def _open_stream(conn, query, params):
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    cursor.execute(query, params)
+    return cursor
+
+
+def _execute(conn, query, params):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+def _in_transactions(conn, rows, chunk_size, write):
+    # Pooled connections are in autocommit mode, so each chunk opens an
+    # explicit transaction; a failed chunk leaves none of its rows written
+    total = 0
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(rows), chunk_size):
+            conn.start_transaction()
+            try:
+                write(cursor, rows[start:start + chunk_size])
+                total += max(cursor.rowcount, 0)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        return total
+    finally:
+        cursor.close()
+
+
+def _execute_many(conn, query, rows, chunk_size):
+    return _in_transactions(conn, rows, chunk_size, lambda cursor, chunk: cursor.executemany(query, chunk))
+
+
+def _update_many(conn, update, rows, chunk_size):
+    def write(cursor, chunk):
+        cursor.execute(update.query(len(chunk)), [value for row in chunk for value in row])
+    return _in_transactions(conn, rows, chunk_size, write)
+
+
+def init_repository():
+    """
+    Create the shared repository for this process if it does not exist yet.
+    """
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            _repository = Repository(get_pool(), max_workers=DB_EXECUTOR_WORKERS or None,
+                                     stream_limit=DB_STREAM_LIMIT or None)
+        return _repository
+
+
+def get_repository():
+    """
+    FastAPI dependency returning the shared repository.
+    """
+    return _repository if _repository is not None else init_repository()
+
+
+def close_repository():
+    global _repository
+    with _repository_lock:
+        if _repository is not None:
+            _repository.close()
+            _repository = None
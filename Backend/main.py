@@ -1,14 +1,27 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from routes import ports, eta, ships, storm
+from routes import ports, eta, ships, storm, stats, stream, admin, metrics
+from db.database import init_pool, close_pool
+from db.repository import init_repository, close_repository, get_repository
+from middleware.conditional import ConditionalGetMiddleware
+from middleware.compression import CompressionMiddleware
+from middleware.metrics import MetricsMiddleware
+from services.port_index import port_index
+from services.fleet_state import fleet_state
+from services.history import HISTORY_RECORD, history_recorder
+from services.inference import inference
+from services.serialization import FastJSONResponse
+from services.weather import weather_index
 import logging
+import os
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Set up logging; LOG_LEVEL=WARNING silences the sampled access log too
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Routes returning plain dicts/lists are rendered with the fast JSON encoder
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # CORS configuration
 app.add_middleware(
@@ -21,11 +34,56 @@ app.add_middleware(
     max_age=3600,
 )
 
+# ETag / Last-Modified validators and 304 responses for polled read endpoints
+app.add_middleware(ConditionalGetMiddleware)
+
+# gzip/brotli for bodies over COMPRESS_MIN_SIZE; added last so it wraps the
+# ETag middleware and can cache compressed bodies by ETag
+app.add_middleware(CompressionMiddleware)
+
+# Per-route latency histograms for /metrics and the sampled access log
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(ports.router)
 app.include_router(eta.router)
 app.include_router(ships.router)
 app.include_router(storm.router)
+app.include_router(stats.router)
+app.include_router(stream.router)
+app.include_router(admin.router)
+app.include_router(metrics.router)
+
+@app.on_event("startup")
+async def startup():
+    # One shared connection pool per worker, sized by DB_POOL_SIZE
+    init_pool()
+    repo = init_repository()
+    # Load sea_ports into memory and keep it refreshed (PORT_INDEX_REFRESH)
+    port_index.start(repo)
+    # Append every eta_results revision the fleet state sees to eta_history;
+    # started first so the initial load is compared against what is recorded
+    if HISTORY_RECORD:
+        await history_recorder.start(repo, fleet_state)
+    # In-memory eta_results, synced incrementally (FLEET_STATE_INTERVAL); the
+    # ETA/ship lists and the ship spatial index are derived from it
+    fleet_state.start(repo)
+    # Single change poller per worker feeding every /api/stream client
+    stream.change_feed.start(repo)
+    # Memory-map the ingested weather datasets (WEATHER_STORE) used as model inputs
+    weather_index.open()
+    # Load the ETA model once per worker for /api/eta/predict
+    await inference.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await inference.stop()
+    await stream.change_feed.stop()
+    await port_index.stop()
+    await fleet_state.stop()
+    await history_recorder.stop(get_repository())
+    close_repository()
+    close_pool()
 
 @app.get("/")
 async def root():
@@ -33,11 +91,9 @@ async def root():
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    logger.info(f"Request: {request.method} {request.url}")
+    # Access logging (sampled) is done by MetricsMiddleware
     try:
-        response = await call_next(request)
-        logger.info(f"Response status: {response.status_code}")
-        return response
+        return await call_next(request)
     except Exception as e:
         logger.error(f"Request failed: {str(e)}")
         return JSONResponse(
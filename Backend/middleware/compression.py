@@ -0,0 +1,350 @@
+import asyncio
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# Bodies smaller than this many bytes are sent uncompressed
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '5'))
+# Compressed bodies kept per worker, keyed by ETag and encoding
+COMPRESS_CACHE_ENTRIES = int(os.getenv('COMPRESS_CACHE_ENTRIES', '64'))
+COMPRESS_CACHE_BYTES = int(os.getenv('COMPRESS_CACHE_BYTES', str(32 * 1024 * 1024)))
+# Bodies at least this large are compressed on a worker thread, off the event loop
+OFFLOAD_SIZE = 256 * 1024
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript",
+                      "application/xml", "image/svg+xml")
+
+
+class _GzipStream:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def process(self, data):
+        # Sync flush so every chunk reaches the client as it is produced
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def process(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def _gzip(data):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+# Content-coding -> (one-shot compress, streaming compressor), in preference order
+ENCODINGS = OrderedDict()
+if brotli is not None:
+    ENCODINGS["br"] = (lambda data: brotli.compress(data, quality=BROTLI_QUALITY), _BrotliStream)
+ENCODINGS["gzip"] = (_gzip, _GzipStream)
+
+
+def negotiate(accept_encoding):
+    """Pick the preferred supported coding allowed by an Accept-Encoding value, or None."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for coding in ENCODINGS:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+class CompressionCache:
+    """
+    Compressed response bodies keyed by (ETag, coding), so a poll of an
+    unchanged body reuses the bytes compressed for the previous one. Also
+    keeps the compression metrics reported by /api/stats.
+    """
+
+    def __init__(self, max_entries=COMPRESS_CACHE_ENTRIES, max_bytes=COMPRESS_CACHE_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._compressed = {coding: 0 for coding in ENCODINGS}
+        self._streamed = 0
+        self._skipped_small = 0
+        self._bytes_in = 0
+        self._bytes_out = 0
+        self._cpu_s = 0.0
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = body
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def compress(self, coding, data):
+        """One-shot compress ``data``, recording size and CPU time."""
+        started = time.thread_time()
+        body = ENCODINGS[coding][0](data)
+        self.record(coding, len(data), len(body), time.thread_time() - started)
+        return body
+
+    def record(self, coding, size_in, size_out, cpu_s, streamed=False):
+        with self._lock:
+            if streamed:
+                self._streamed += 1
+            else:
+                self._compressed[coding] += 1
+            self._bytes_in += size_in
+            self._bytes_out += size_out
+            self._cpu_s += cpu_s
+
+    def skipped(self):
+        self._skipped_small += 1
+
+    def stats(self):
+        lookups = self._hits + self._misses
+        return {
+            "encodings": list(ENCODINGS),
+            "min_size": COMPRESS_MIN_SIZE,
+            "compressed": dict(self._compressed),
+            "streamed": self._streamed,
+            "skipped_small": self._skipped_small,
+            "bytes_in": self._bytes_in,
+            "bytes_out": self._bytes_out,
+            "bytes_saved": self._bytes_in - self._bytes_out,
+            "ratio": round(self._bytes_out / self._bytes_in, 3) if self._bytes_in else None,
+            "cpu_ms": round(self._cpu_s * 1000, 1),
+            "cache_entries": len(self._entries),
+            "cache_bytes": self._bytes,
+            "cache_hit_rate": round(self._hits / lookups, 3) if lookups else None,
+        }
+
+
+compression_cache = CompressionCache()
+
+
+def _header(headers, name):
+    for key, value in headers:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _tagged(etag, coding):
+    # Each coding is a different representation, so it gets its own ETag
+    return etag[:-1] + "-" + coding + '"' if etag.endswith('"') else etag + "-" + coding
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with brotli or gzip, as negotiated
+    through Accept-Encoding.
+
+    Bodies under ``minimum_size`` bytes, non-text content types and event
+    streams are passed through. Complete bodies carrying an ETag (set by
+    ConditionalGetMiddleware, which must sit inside this middleware) are
+    compressed once and cached; other streamed bodies are compressed chunk
+    by chunk. The coding is appended to the ETag, and stripped again from
+    If-None-Match before the request is passed on.
+    """
+
+    def __init__(self, app, minimum_size=COMPRESS_MIN_SIZE, cache=compression_cache):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = scope["headers"]
+        coding = negotiate(_header(headers, b"accept-encoding"))
+        matched_coding = self._strip_validators(scope)
+        start_message = None
+        state = None  # None, "passthrough" or a streaming compressor
+        stream_in = stream_out = 0
+        stream_cpu = 0.0
+
+        async def send_wrapper(message):
+            nonlocal start_message, state, stream_in, stream_out, stream_cpu
+            if state == "passthrough":
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                if message["status"] == 304 and matched_coding:
+                    await send(self._retag(message, matched_coding))
+                    state = "passthrough"
+                elif not self._compressible(message):
+                    await send(message)
+                    state = "passthrough"
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if state is None:
+                if not more_body:
+                    await self._send_whole(start_message, body, coding, send)
+                    state = "passthrough"
+                    return
+                if coding is None:
+                    await send(self._vary(start_message))
+                    await send(message)
+                    state = "passthrough"
+                    return
+                state = ENCODINGS[coding][1]()
+                await send(self._encoded_start(start_message, coding, None))
+
+            started = time.thread_time()
+            chunk = state.process(body)
+            if not more_body:
+                chunk += state.finish()
+            stream_cpu += time.thread_time() - started
+            stream_in += len(body)
+            stream_out += len(chunk)
+            if not more_body:
+                self.cache.record(coding, stream_in, stream_out, stream_cpu, streamed=True)
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_whole(self, start_message, body, coding, send):
+        if len(body) < self.minimum_size:
+            self.cache.skipped()
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+            return
+        if coding is None:
+            await send(self._vary(start_message))
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        etag = _header(start_message["headers"], b"etag")
+        key = (etag, coding) if etag else None
+        compressed = self.cache.get(key) if key else None
+        if compressed is None:
+            if len(body) >= OFFLOAD_SIZE:
+                loop = asyncio.get_running_loop()
+                compressed = await loop.run_in_executor(None, self.cache.compress, coding, body)
+            else:
+                compressed = self.cache.compress(coding, body)
+            if key:
+                self.cache.put(key, compressed)
+        await send(self._encoded_start(start_message, coding, len(compressed)))
+        await send({"type": "http.response.body", "body": compressed})
+
+    @staticmethod
+    def _compressible(start_message):
+        if start_message["status"] in (204, 304):
+            return False
+        headers = start_message["headers"]
+        if _header(headers, b"content-encoding"):
+            return False
+        content_type = (_header(headers, b"content-type") or "").lower()
+        if content_type.startswith("text/event-stream"):
+            return False
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    @staticmethod
+    def _strip_validators(scope):
+        """
+        Drop our coding suffix from If-None-Match so inner validators see the
+        plain ETag; returns the coding that was stripped. Updates ``scope`` in
+        place, so outer middleware still see what the router adds to it.
+        """
+        value = _header(scope["headers"], b"if-none-match")
+        if not value:
+            return None
+        matched = None
+        tags = []
+        for tag in value.split(","):
+            tag = tag.strip()
+            for coding in ENCODINGS:
+                suffix = "-" + coding + '"'
+                if tag.endswith(suffix):
+                    tag, matched = tag[:-len(suffix)] + '"', coding
+                    break
+            tags.append(tag)
+        headers = [(k, v) for k, v in scope["headers"] if k != b"if-none-match"]
+        headers.append((b"if-none-match", ", ".join(tags).encode("latin-1")))
+        scope["headers"] = headers
+        return matched
+
+    @staticmethod
+    def _vary(start_message):
+        headers = list(start_message["headers"])
+        vary = _header(headers, b"vary")
+        if vary is None:
+            headers.append((b"vary", b"Accept-Encoding"))
+        elif "accept-encoding" not in vary.lower():
+            headers = [(k, v) for k, v in headers if k != b"vary"]
+            headers.append((b"vary", (vary + ", Accept-Encoding").encode("latin-1")))
+        return {**start_message, "headers": headers}
+
+    def _retag(self, start_message, coding):
+        headers = [
+            (k, _tagged(v.decode("latin-1"), coding).encode("latin-1") if k == b"etag" else v)
+            for k, v in start_message["headers"]
+        ]
+        return self._vary({**start_message, "headers": headers})
+
+    def _encoded_start(self, start_message, coding, length):
+        message = self._retag(start_message, coding)
+        headers = [(k, v) for k, v in message["headers"] if k != b"content-length"]
+        headers.append((b"content-encoding", coding.encode("latin-1")))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode("latin-1")))
+        return {**message, "headers": headers}
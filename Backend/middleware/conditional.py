@@ -0,0 +1,122 @@
+import hashlib
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+# Headers that describe the body and must not be sent with a 304
+_BODY_HEADERS = {b"content-length", b"content-type", b"content-encoding"}
+
+
+class ConditionalGetMiddleware:
+    """
+    ASGI middleware adding ETag / Last-Modified validators to GET responses.
+
+    The ETag is a hash of the response body, so it is stable for as long as
+    the endpoint returns the same bytes. Last-Modified is the time this
+    worker first saw the current ETag for the URL. Requests whose
+    If-None-Match (or If-Modified-Since) matches get an empty 304 instead of
+    the full body. Streaming responses are passed through untouched.
+    """
+
+    def __init__(self, app, path_prefix="/api/", max_tracked_urls=1024):
+        self.app = app
+        self.path_prefix = path_prefix
+        self.max_tracked_urls = max_tracked_urls
+        # url -> (etag, last_modified_epoch)
+        self._seen = OrderedDict()
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http"
+                or scope["method"] != "GET"
+                or not scope["path"].startswith(self.path_prefix)):
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = dict(scope["headers"])
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            if message.get("more_body", False) or start_message["status"] != 200:
+                # Streamed or non-200 responses are not validated
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            await self._send_validated(scope, request_headers, start_message, message, send)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_validated(self, scope, request_headers, start_message, message, send):
+        body = message.get("body", b"")
+        etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        last_modified = self._last_modified(scope, etag)
+
+        headers = [(k, v) for k, v in start_message["headers"]
+                   if k not in (b"etag", b"last-modified", b"cache-control")]
+        headers.append((b"etag", etag.encode("latin-1")))
+        headers.append((b"last-modified", formatdate(last_modified, usegmt=True).encode("latin-1")))
+        # Clients may keep the body but must revalidate before reusing it
+        headers.append((b"cache-control", b"no-cache"))
+
+        if self._not_modified(request_headers, etag, last_modified):
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(k, v) for k, v in headers if k not in _BODY_HEADERS],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await send({**start_message, "headers": headers})
+        await send(message)
+
+    def _last_modified(self, scope, etag):
+        url = scope["path"]
+        if scope.get("query_string"):
+            url += "?" + scope["query_string"].decode("latin-1")
+
+        seen = self._seen.get(url)
+        if seen and seen[0] == etag:
+            self._seen.move_to_end(url)
+            return seen[1]
+
+        # Whole seconds, as that is all an HTTP date can carry
+        now = float(int(time.time()))
+        self._seen[url] = (etag, now)
+        self._seen.move_to_end(url)
+        while len(self._seen) > self.max_tracked_urls:
+            self._seen.popitem(last=False)
+        return now
+
+    @staticmethod
+    def _not_modified(request_headers, etag, last_modified):
+        if_none_match = request_headers.get(b"if-none-match")
+        if if_none_match is not None:
+            # Weak comparison, as recommended for If-None-Match
+            tags = [tag.strip() for tag in if_none_match.decode("latin-1").split(",")]
+            tags = {tag[2:] if tag.startswith("W/") else tag for tag in tags}
+            return "*" in tags or etag in tags
+
+        if_modified_since = request_headers.get(b"if-modified-since")
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since.decode("latin-1")).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return last_modified <= since
+        return False
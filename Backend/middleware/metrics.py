@@ -0,0 +1,64 @@
+import logging
+import time
+
+from services.metrics import (
+    SLOW_REQUEST_MS, finish_request, request_duration, request_errors, request_phase, sampled, start_request
+)
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by route template (so
+    ``/api/eta/{ship_name}`` is one series), with the acquire / execute /
+    transform / serialize split collected while it ran. Also writes the
+    access log: a sample of successful requests at INFO, slow ones as
+    warnings and failures as errors.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = start_request()
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            phases = finish_request(token)
+            self._record(scope, status, elapsed, phases)
+
+    @staticmethod
+    def _record(scope, status, elapsed, phases):
+        route = getattr(scope.get("route"), "path", None) or "unmatched"
+        request_duration.observe(elapsed, scope["method"], route, str(status))
+        for phase, seconds in phases.items():
+            if seconds:
+                request_phase.observe(seconds, route, phase)
+
+        elapsed_ms = elapsed * 1000
+        if status >= 500:
+            request_errors.inc(route)
+            log = logger.error
+        elif elapsed_ms >= SLOW_REQUEST_MS:
+            log = logger.warning
+        elif sampled() and logger.isEnabledFor(logging.INFO):
+            log = logger.info
+        else:
+            return
+        split = " ".join(f"{phase}={seconds * 1000:.1f}ms" for phase, seconds in phases.items() if seconds)
+        log("%s %s %s %.1fms %s", scope["method"], scope["path"], status, elapsed_ms, split)
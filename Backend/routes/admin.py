@@ -0,0 +1,134 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from db.repository import get_repository
+from routes.eta import eta_cache
+from services.eta_model import MODELS, load_model
+from services.eta_pipeline import PipelineRun, resume_checkpoint, run_pipeline
+from services.hazard import recompute_hazards
+from services.history import compact
+from services.storm_track import scan_encounters
+from typing import Optional
+import asyncio
+import hmac
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Shared secret for /api/admin/* (sent as X-Admin-Token); unset disables the admin routes
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """Hide the admin routes unless ADMIN_TOKEN is set, and require it when it is."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+router = APIRouter(dependencies=[Depends(require_admin_token)])
+
+# ETA pipeline run started from this worker (at most one at a time)
+_pipeline_task = None
+_pipeline_run = None
+
+@router.post("/api/admin/hazards/recompute")
+async def recompute_storm_hazards(dry_run: bool = False, repo=Depends(get_repository)):
+    """
+    Recompute distance_to_hazard and status for every ship from the current
+    storm_info and write back the rows that changed.
+    """
+    try:
+        summary = await recompute_hazards(repo, dry_run=dry_run)
+    except Exception as e:
+        logger.error(f"Hazard recompute failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if summary["written"]:
+        eta_cache.invalidate()
+    return summary
+
+
+@router.post("/api/admin/storms/encounters")
+async def scan_storm_encounters(dry_run: bool = False, repo=Depends(get_repository)):
+    """
+    Record new storm fixes, forecast every storm and write each ship's first
+    forecast encounter into reason and delay_hours.
+    """
+    try:
+        summary = await scan_encounters(repo, dry_run=dry_run)
+    except Exception as e:
+        logger.error(f"Storm encounter scan failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if summary["written"]:
+        eta_cache.invalidate()
+    return summary
+
+
+@router.post("/api/admin/history/compact")
+async def compact_history(repo=Depends(get_repository)):
+    """
+    Fold eta_history revisions older than HISTORY_RAW_DAYS into hourly rows
+    and drop hourly rows past HISTORY_RETENTION_DAYS.
+    """
+    try:
+        return await compact(repo)
+    except Exception as e:
+        logger.error(f"History compaction failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/api/admin/eta/recompute", status_code=202)
+async def start_eta_recompute(
+    model: Optional[str] = None,
+    resume: bool = False,
+    dry_run: bool = False,
+    page_size: int = 5000,
+    repo=Depends(get_repository)
+):
+    """
+    Start the batch ETA recompute pipeline in the background. Poll
+    GET /api/admin/eta/recompute for progress.
+
+    ``model`` must name a built-in model; ``module:Name`` specs are only
+    accepted from ETA_MODEL and the command line. ``resume`` is refused if
+    the checkpoint was written by another model.
+
+    The 409 for a run already in progress only covers this worker: with
+    several workers (or a CLI run alongside), start recomputes from one
+    place, since concurrent runs share the checkpoint file.
+    """
+    global _pipeline_task, _pipeline_run
+    if _pipeline_task is not None and not _pipeline_task.done():
+        raise HTTPException(status_code=409, detail="An ETA recompute is already running")
+    if not 1 <= page_size <= 50000:
+        raise HTTPException(status_code=400, detail="page_size must be between 1 and 50000")
+    if model is not None and model not in MODELS:
+        raise HTTPException(status_code=400, detail=f"Unknown model '{model}'; use one of {sorted(MODELS)}")
+    try:
+        eta_model = load_model(model)
+    except (ValueError, ImportError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    run = PipelineRun(getattr(eta_model, "name", type(eta_model).__name__), dry_run)
+    if resume:
+        try:
+            resume_checkpoint(run.model_name)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    _pipeline_run = run
+    _pipeline_task = asyncio.ensure_future(run_pipeline(
+        repo, eta_model, run, page_size=page_size, dry_run=dry_run, resume=resume
+    ))
+    _pipeline_task.add_done_callback(_pipeline_done)
+    return run.to_dict()
+
+@router.get("/api/admin/eta/recompute")
+async def get_eta_recompute():
+    """Progress of the current (or last) ETA recompute started from this worker."""
+    if _pipeline_run is None:
+        raise HTTPException(status_code=404, detail="No ETA recompute has been started")
+    return _pipeline_run.to_dict()
+
+def _pipeline_done(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"ETA recompute failed: {str(task.exception())}")
+    if not _pipeline_run.dry_run and _pipeline_run.written:
+        eta_cache.invalidate()
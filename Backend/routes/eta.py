@@ -1,11 +1,48 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
-from db.database import get_db_connection
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
+from db.repository import get_repository
+from services.cache import ResponseCache
+from services.feature_store import feature_store
+from services.fleet_state import fleet_state
+from services.history import load_history
+from services.fleet_store import (
+    RowEncoder, datetime_field, float_field, imo_field, mapped_field, string_field
+)
+from services.inference import inference
+from services.port_index import port_index
+from services.pagination import (
+    bbox_conditions, decode_cursor, encode_cursor, page_size, parse_fields, project, split_csv
+)
+from services.metrics import timed
+from services.serialization import FastJSONResponse, dumps
+from datetime import datetime, timedelta
+import csv
+import io
+import logging
+import os
+import numpy as np
 from typing import List, Optional, Union
 from pydantic import BaseModel, validator
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Identifiers per IN (...) query and per /api/eta/batch request
+ETA_BATCH_CHUNK = int(os.getenv('ETA_BATCH_CHUNK', '500'))
+ETA_BATCH_MAX = int(os.getenv('ETA_BATCH_MAX', '5000'))
+
+# Seconds a cached ETA list is served before eta_results is re-checked (0 disables)
+ETA_CACHE_TTL = float(os.getenv('ETA_CACHE_TTL', '5'))
+
+async def eta_fingerprint(repo):
+    """Sync the fleet state (fetching only changed rows) and report its version."""
+    await fleet_state.sync(repo)
+    return (fleet_state.version, port_index.version)
+
+# Cheap change check: the list is only rebuilt when eta_results changed
+eta_cache = ResponseCache("eta", ETA_CACHE_TTL, fingerprint=eta_fingerprint)
+# Cached rows embed port coordinates, so drop them when sea_ports changes
+port_index.on_change(eta_cache.invalidate)
 
 class ETAResponse(BaseModel):
     ship_name: str
@@ -35,79 +72,433 @@ class ETAResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class PredictRequest(BaseModel):
+    latitude: float
+    longitude: float
+    port_to: str
+    port_from: Optional[str] = None
+    distance_to_hazard: Optional[float] = None
+    wind_kmh: Optional[float] = None
+    wave_height_m: Optional[float] = None
+
+class ETABatchRequest(BaseModel):
+    ship_names: List[str] = []
+    imos: List[int] = []
+
+ETA_SELECT = """
+    SELECT 
+        e.IMO as imo,
+        e.ship_name,
+        e.port_from,
+        e.port_to,
+        -- %T is %H:%i:%s; a literal %s would be taken as a query parameter
+        COALESCE(DATE_FORMAT(e.eta_expected, '%Y-%m-%dT%T'), NULL) as eta_expected,
+        COALESCE(e.delay_hours, 0) as delay_hours,
+        COALESCE(e.status, 'unknown') as status,
+        e.reason,
+        COALESCE(e.distance_to_hazard, 0) as distance_to_hazard,
+        e.latitude,
+        e.longitude
+    -- include IMO column (aliased to lower-case 'imo' for predictable dict key);
+    -- port coordinates are attached from the in-memory port index
+    FROM eta_results e
+"""
+
+# Fields accepted by the fields= projection on /api/eta
+ETA_FIELDS = (
+    "imo", "ship_name", "port_from", "port_to", "eta_expected", "delay_hours", "status",
+    "reason", "distance_to_hazard", "latitude", "longitude",
+    "from_lat", "from_lng", "to_lat", "to_lng"
+)
+
+def format_eta_row(row):
+    """
+    Convert one eta_results row into an /api/eta dict, or None if it is
+    malformed. The port index must be loaded first.
+    """
+    from_lat, from_lng = port_index.coordinates(row["port_from"])
+    to_lat, to_lng = port_index.coordinates(row["port_to"])
+    eta_expected = row["eta_expected"]
+    if isinstance(eta_expected, datetime):
+        eta_expected = eta_expected.replace(microsecond=0).isoformat()
+    # Convert None values to appropriate defaults
+    try:
+        return {
+            "imo": int(row["imo"]) if row.get("imo") is not None else None,
+            "ship_name": row["ship_name"] or "",
+            "port_from": row["port_from"] or "",
+            "port_to": row["port_to"] or "",
+            "eta_expected": eta_expected,
+            "delay_hours": float(row["delay_hours"]) if row["delay_hours"] is not None else 0,
+            "status": row["status"] or "unknown",
+            "reason": row["reason"],
+            "distance_to_hazard": float(row["distance_to_hazard"]) if row["distance_to_hazard"] is not None else 0,
+            "latitude": float(row["latitude"]) if row["latitude"] is not None else None,
+            "longitude": float(row["longitude"]) if row["longitude"] is not None else None,
+            "from_lat": from_lat,
+            "from_lng": from_lng,
+            "to_lat": to_lat,
+            "to_lng": to_lng
+        }
+    except (ValueError, TypeError) as e:
+        logger.warning(f"Error processing row {row['ship_name']}: {str(e)}")
+        return None
+
+def format_eta_rows(results):
+    """Convert eta_results rows into /api/eta dicts, skipping malformed rows."""
+    with timed("transform"):
+        return [row for row in map(format_eta_row, results) if row is not None]
+
+def _port_coordinate(index):
+    return lambda name: port_index.coordinates(name)[index]
+
+# /api/eta rows encoded straight from the fleet state columns, with the same
+# defaults as format_eta_row; rows are re-encoded only when they change
+eta_encoder = RowEncoder(fleet_state, (
+    ("imo", imo_field),
+    ("ship_name", string_field("ship_name", '""')),
+    ("port_from", string_field("port_from", '""')),
+    ("port_to", string_field("port_to", '""')),
+    ("eta_expected", datetime_field("eta_expected")),
+    ("delay_hours", float_field("delay_hours", "0")),
+    ("status", string_field("status", '"unknown"')),
+    ("reason", string_field("reason")),
+    ("distance_to_hazard", float_field("distance_to_hazard", "0")),
+    ("latitude", float_field("latitude")),
+    ("longitude", float_field("longitude")),
+    ("from_lat", mapped_field("port_from", _port_coordinate(0))),
+    ("from_lng", mapped_field("port_from", _port_coordinate(1))),
+    ("to_lat", mapped_field("port_to", _port_coordinate(0))),
+    ("to_lng", mapped_field("port_to", _port_coordinate(1))),
+), version=lambda: port_index.version)
+
+_eta_order = (None, None)  # (fleet version, slots in /api/eta order)
+
+def eta_order():
+    """Fleet slots ordered by ship name (case-insensitive), then IMO."""
+    global _eta_order
+    if _eta_order[0] != fleet_state.version:
+        columns = fleet_state.columns
+        slots = columns.live_slots()
+        names = columns.table("ship_name").rank()[columns.codes["ship_name"][slots]]
+        _eta_order = (fleet_state.version, slots[np.lexsort((columns.imo[slots], names))])
+    return _eta_order[1]
+
+async def load_eta_json(repo, fields=None):
+    """The full /api/eta list as JSON bytes, encoded from the fleet state."""
+    await port_index.ensure_loaded(repo)
+    await fleet_state.sync(repo)
+    with timed("transform"):
+        order = eta_order()
+    with timed("serialize"):
+        return eta_encoder.encode(order, fields)
+
+async def load_eta_page(repo, conditions, params, after=None, limit=None):
+    """
+    Filtered, keyset-paginated read of eta_results ordered by (ship_name, IMO).
+    ``after`` is the (ship_name, imo) key of the last row already returned.
+    Returns the formatted rows and the key to continue from, if any.
+    """
+    conditions, params = list(conditions), list(params)
+    if after is not None:
+        conditions.append("(e.ship_name > %s OR (e.ship_name = %s AND COALESCE(e.IMO, 0) > %s))")
+        params.extend([after[0], after[0], after[1]])
+
+    query = ETA_SELECT
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY e.ship_name ASC, COALESCE(e.IMO, 0) ASC"
+    if limit is not None:
+        # One extra row tells us whether there is a next page
+        query += " LIMIT %s"
+        params.append(limit + 1)
+
+    await port_index.ensure_loaded(repo)
+    results = await repo.fetch_all(query, tuple(params))
+    next_key = None
+    if limit is not None and len(results) > limit:
+        results = results[:limit]
+        last = results[-1]
+        next_key = [last["ship_name"], int(last["imo"] or 0)]
+    return format_eta_rows(results), next_key
+
+def eta_filter_conditions(status=None, port_from=None, port_to=None, min_delay=None,
+                          min_lat=None, max_lat=None, min_lng=None, max_lng=None):
+    """SQL conditions and params for the /api/eta filter parameters."""
+    conditions, params = [], []
+    statuses = split_csv(status)
+    if statuses:
+        conditions.append("e.status IN (" + ", ".join(["%s"] * len(statuses)) + ")")
+        params.extend(statuses)
+    if port_from:
+        conditions.append("e.port_from = %s")
+        params.append(port_from)
+    if port_to:
+        conditions.append("e.port_to = %s")
+        params.append(port_to)
+    if min_delay is not None:
+        conditions.append("e.delay_hours >= %s")
+        params.append(min_delay)
+    box, box_params = bbox_conditions("e.latitude", "e.longitude", min_lat, max_lat, min_lng, max_lng)
+    conditions.extend(box)
+    params.extend(box_params)
+    return conditions, params
+
 @router.get("/api/eta")
-async def get_eta_info():
-    conn = None
-    cursor = None
+async def get_eta_info(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    status: Optional[str] = None,
+    port_from: Optional[str] = None,
+    port_to: Optional[str] = None,
+    min_delay: Optional[float] = None,
+    min_lat: Optional[float] = None,
+    max_lat: Optional[float] = None,
+    min_lng: Optional[float] = None,
+    max_lng: Optional[float] = None,
+    repo=Depends(get_repository)
+):
+    """
+    ETA list for all ships. With no query parameters the full list is
+    returned as a JSON array (served from cache). Filters narrow the rows in
+    SQL; ``fields`` selects columns; ``limit``/``cursor`` switch to keyset
+    pagination and return ``{"results": [...], "next_cursor": ...}``.
+    """
     try:
-        conn = get_db_connection()
-        if not conn:
-            raise HTTPException(status_code=500, detail="Database connection error")
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        query = """
-            SELECT 
-                e.IMO as imo,
-                e.ship_name,
-                e.port_from,
-                e.port_to,
-                COALESCE(DATE_FORMAT(e.eta_expected, '%Y-%m-%dT%H:%i:%s'), NULL) as eta_expected,
-                COALESCE(e.delay_hours, 0) as delay_hours,
-                COALESCE(e.status, 'unknown') as status,
-                e.reason,
-                COALESCE(e.distance_to_hazard, 0) as distance_to_hazard,
-                e.latitude,
-                e.longitude,
-                p1.latitude as from_lat,
-                p1.longitude as from_lng,
-                p2.latitude as to_lat,
-                p2.longitude as to_lng
-            FROM eta_results e
-            -- include IMO column (aliased to lower-case 'imo' for predictable dict key)
-            LEFT JOIN sea_ports p1 ON e.port_from = p1.port_name
-            LEFT JOIN sea_ports p2 ON e.port_to = p2.port_name
-            ORDER BY e.ship_name ASC
-        """
-        
-        cursor.execute(query)
-        results = cursor.fetchall()
-        
-        # Process the results
-        processed_results = []
-        for row in results:
-            # Convert None values to appropriate defaults
-            try:
-                row_dict = {
-                    "imo": int(row["imo"]) if row.get("imo") is not None else None,
-                    "ship_name": row["ship_name"] or "",
-                    "port_from": row["port_from"] or "",
-                    "port_to": row["port_to"] or "",
-                    "eta_expected": row["eta_expected"],
-                    "delay_hours": float(row["delay_hours"]) if row["delay_hours"] is not None else 0,
-                    "status": row["status"] or "unknown",
-                    "reason": row["reason"],
-                    "distance_to_hazard": float(row["distance_to_hazard"]) if row["distance_to_hazard"] is not None else 0,
-                    "latitude": float(row["latitude"]) if row["latitude"] is not None else None,
-                    "longitude": float(row["longitude"]) if row["longitude"] is not None else None
-                }
-            except (ValueError, TypeError) as e:
-                print(f"Error processing row {row['ship_name']}: {str(e)}")
-                continue
-            processed_results.append(row_dict)
-            
-        return JSONResponse(content=processed_results)
+        paged = limit is not None or cursor is not None
+        try:
+            projection = parse_fields(fields, ETA_FIELDS)
+            after = decode_cursor(cursor, 2) if cursor else None
+            size = page_size(limit) if paged else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        conditions, params = eta_filter_conditions(
+            status, port_from, port_to, min_delay, min_lat, max_lat, min_lng, max_lng
+        )
+
+        if not paged and not conditions:
+            if projection is None:
+                # Encoded once per fleet change; unchanged polls reuse the same bytes
+                body = await eta_cache.get(repo, load_eta_json)
+            else:
+                body = await load_eta_json(repo, projection)
+            return Response(content=body, media_type="application/json")
+
+        rows, next_key = await load_eta_page(repo, conditions, params, after, size)
+        rows = project(rows, projection)
+        if not paged:
+            return FastJSONResponse(content=rows)
+        return FastJSONResponse(content={
+            "results": rows,
+            "next_cursor": encode_cursor(next_key) if next_key else None
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Columns of the compact CSV export, in order
+ETA_CSV_COLUMNS = (
+    "imo", "ship_name", "port_from", "port_to", "eta_expected", "delay_hours",
+    "status", "distance_to_hazard", "latitude", "longitude"
+)
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+    "csv": "text/csv; charset=utf-8",
+}
+
+async def export_eta_rows(repo, format, conditions=(), params=(), batch_size=1000):
+    """
+    Encode eta_results for export, one chunk per fetched batch.
+
+    Rows are read through an unbuffered cursor and encoded as they arrive,
+    so memory stays bounded by ``batch_size`` regardless of fleet size.
+    """
+    query = ETA_SELECT
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY e.ship_name ASC"
+
+    await port_index.ensure_loaded(repo)
+    if format == "json":
+        yield b"["
+    elif format == "csv":
+        yield _csv_chunk([ETA_CSV_COLUMNS])
+
+    first = True
+    async for batch in repo.stream(query, tuple(params), batch_size=batch_size):
+        rows = format_eta_rows(batch)
+        if not rows:
+            continue
+        if format == "ndjson":
+            yield b"".join(dumps(row) + b"\n" for row in rows)
+        elif format == "json":
+            # One encode per batch; the array brackets are dropped
+            chunk = dumps(rows)[1:-1]
+            yield chunk if first else b"," + chunk
+        else:
+            yield _csv_chunk([[row[column] for column in ETA_CSV_COLUMNS] for row in rows])
+        first = False
+
+    if format == "json":
+        yield b"]"
+
+def _csv_chunk(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+@router.get("/api/eta/export")
+async def export_eta(
+    format: str = "ndjson",
+    batch_size: int = 1000,
+    status: Optional[str] = None,
+    port_from: Optional[str] = None,
+    port_to: Optional[str] = None,
+    min_delay: Optional[float] = None,
+    min_lat: Optional[float] = None,
+    max_lat: Optional[float] = None,
+    min_lng: Optional[float] = None,
+    max_lng: Optional[float] = None,
+    repo=Depends(get_repository)
+):
+    """
+    Stream the full ETA table for bulk consumers as NDJSON (default), a
+    chunked JSON array (``format=json``) or compact CSV (``format=csv``).
+    Accepts the same filters as /api/eta.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if not 1 <= batch_size <= 10000:
+        raise HTTPException(status_code=400, detail="batch_size must be between 1 and 10000")
+
+    if repo.streams_full():
+        # Each export holds a pooled connection; turn extra ones away rather
+        # than queueing behind downloads of unknown length
+        raise HTTPException(status_code=503, detail="Too many exports in progress, try again later",
+                            headers={"Retry-After": "10"})
+
+    conditions, params = eta_filter_conditions(
+        status, port_from, port_to, min_delay, min_lat, max_lat, min_lng, max_lng
+    )
+    extension = "ndjson" if format == "ndjson" else format
+    return StreamingResponse(
+        export_eta_rows(repo, format, conditions, params, batch_size),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="eta_export.{extension}"'}
+    )
+
+@router.post("/api/eta/predict")
+async def predict_eta(request: PredictRequest, repo=Depends(get_repository)):
+    """
+    On-demand ETA for a ship position and destination port (plus optional
+    origin, storm distance and weather), from the warm model. Concurrent
+    requests are run through the model together in micro-batches.
+    """
+    if not (-90 <= request.latitude <= 90 and -180 <= request.longitude <= 180):
+        raise HTTPException(status_code=400, detail="latitude/longitude out of range")
+    try:
+        await port_index.ensure_loaded(repo)
+        # Storm distance is derived from storm_info when the caller has none
+        await feature_store.refresh_storms(repo)
+        for field in ("port_to", "port_from"):
+            name = getattr(request, field)
+            if name is not None and port_index.coordinates(name)[0] is None:
+                raise HTTPException(status_code=400, detail=f"Unknown {field}: {name}")
+
+        transit_hours, delay_hours = await inference.predict(request.dict())
+        eta = datetime.now() + timedelta(hours=transit_hours + delay_hours)
+        return {
+            "eta_expected": eta.replace(microsecond=0).isoformat(),
+            "transit_hours": round(transit_hours, 2),
+            "delay_hours": round(delay_hours, 2),
+            "model": inference.model_name
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _unique(values):
+    return list(dict.fromkeys(values))
+
+async def load_eta_by(repo, column, values, chunk_size=ETA_BATCH_CHUNK):
+    """
+    Fetch eta_results rows whose ``column`` is in ``values`` with one
+    ``IN (...)`` query per chunk. Returns formatted rows in (ship_name, IMO)
+    order, so the first row per identifier is deterministic.
+    """
+    rows = []
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:start + chunk_size]
+        query = (ETA_SELECT + f" WHERE {column} IN (" + ", ".join(["%s"] * len(chunk)) + ")"
+                 + " ORDER BY e.ship_name ASC, COALESCE(e.IMO, 0) ASC")
+        rows.extend(await repo.fetch_all(query, tuple(chunk)))
+    return format_eta_rows(rows)
+
+@router.post("/api/eta/batch")
+async def get_eta_batch(request: ETABatchRequest, repo=Depends(get_repository)):
+    """
+    ETA rows for many ships at once, looked up by ship name and/or IMO.
+
+    Returns ``{"ships": {name: row}, "imos": {imo: row}, "not_found":
+    {"ship_names": [...], "imos": [...]}}`` with rows shaped as in /api/eta.
+    """
+    ship_names = _unique(request.ship_names)
+    imos = _unique(request.imos)
+    if len(ship_names) + len(imos) > ETA_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {ETA_BATCH_MAX} identifiers per request")
+
+    try:
+        await port_index.ensure_loaded(repo)
+        by_name, by_imo = {}, {}
+        if ship_names:
+            for row in await load_eta_by(repo, "e.ship_name", ship_names):
+                by_name.setdefault(row["ship_name"], row)
+        if imos:
+            for row in await load_eta_by(repo, "e.IMO", imos):
+                by_imo.setdefault(row["imo"], row)
+
+        return FastJSONResponse(content={
+            "ships": {name: by_name[name] for name in ship_names if name in by_name},
+            "imos": {str(imo): by_imo[imo] for imo in imos if imo in by_imo},
+            "not_found": {
+                "ship_names": [name for name in ship_names if name not in by_name],
+                "imos": [imo for imo in imos if imo not in by_imo]
+            }
+        })
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/eta/{ship_name}/history")
+async def get_ship_eta_history(
+    ship_name: str,
+    imo: Optional[int] = None,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    resolution: str = "auto",
+    repo=Depends(get_repository)
+):
+    """
+    ETA and position revisions of one ship between ``from`` and ``to``
+    (default: the last 7 days) from eta_history. ``resolution`` is ``raw``,
+    ``hour`` or ``day``; ``auto`` picks one from the length of the range.
+    """
+    try:
+        return await load_history(repo, ship_name, imo, start, end, resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error loading history for {ship_name}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/api/eta/{ship_name}", response_model=ETAResponse)
-async def get_ship_eta(ship_name: str):
+async def get_ship_eta(ship_name: str, repo=Depends(get_repository)):
     try:
-        conn = get_db_connection()
-        if not conn:
-            raise HTTPException(status_code=500, detail="Database connection error")
-        cursor = conn.cursor(dictionary=True)
-        
         query = """
             SELECT 
                 ship_name,
@@ -130,11 +521,7 @@ async def get_ship_eta(ship_name: str):
             LIMIT 1
         """
         
-        cursor.execute(query, (ship_name,))
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
+        result = await repo.fetch_one(query, (ship_name,))
         
         if not result:
             raise HTTPException(status_code=404, detail="Ship not found")
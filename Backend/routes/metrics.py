@@ -0,0 +1,28 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from db.database import get_pool
+from middleware.compression import compression_cache
+from services.fleet_state import fleet_state
+from services.metrics import metrics
+
+router = APIRouter()
+
+def _pool_connections():
+    stats = get_pool().stats()
+    return {(state,): stats[state] for state in ("open", "in_use", "idle")}
+
+def _compression_bytes():
+    stats = compression_cache.stats()
+    return {("in",): stats["bytes_in"], ("out",): stats["bytes_out"]}
+
+metrics.gauge("db_pool_connections", "Pooled database connections by state.", _pool_connections, ("state",))
+metrics.gauge("db_pool_timeouts", "Checkouts that timed out waiting for a connection.",
+              lambda: {(): get_pool().stats()["timeouts"]})
+metrics.gauge("response_compression_bytes", "Response bytes before and after compression.",
+              _compression_bytes, ("direction",))
+metrics.gauge("fleet_state_rows", "Ships held in the in-memory fleet state.", lambda: {(): len(fleet_state)})
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus scrape endpoint for this worker process."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
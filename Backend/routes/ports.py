@@ -1,139 +1,69 @@
-from fastapi import APIRouter, HTTPException
-from db.database import get_db_connection
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from db.repository import get_repository
+from services.port_catalog import port_catalog
+from services.port_index import port_index
+from services.spatial_index import ship_index
+from typing import Optional
 import logging
 
 router = APIRouter()
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 @router.get("/api/ports")
-async def get_ports():
+async def get_ports(repo=Depends(get_repository)):
     try:
-        conn = get_db_connection()
-        if not conn:
-            raise HTTPException(status_code=500, detail="Database connection error")
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        query = """
-            SELECT 
-                id,
-                port_name as name,
-                region,
-                country,
-                latitude,
-                longitude,
-                status
-            FROM sea_ports
-            ORDER BY port_name
-        """
-        
-        cursor.execute(query)
-        ports = cursor.fetchall()
-        
-        # Process and format the results
-        formatted_ports = []
-        for port in ports:
-            try:
-                def convert_coordinate(coord, is_longitude=False):
-                    if coord is None:
-                        return None
-                    try:
-                        # Convert to float directly since coordinates are already in decimal degrees
-                        coord_float = float(coord)
-                        
-                        # Validate range
-                        if is_longitude and abs(coord_float) > 180:
-                            logger.warning(f"Invalid longitude value: {coord_float}")
-                            return None
-                        if not is_longitude and abs(coord_float) > 90:
-                            logger.warning(f"Invalid latitude value: {coord_float}")
-                            return None
-                            
-                        return round(coord_float, 6)  # Round to 6 decimal places
-                        
-                    except Exception as e:
-                        logger.error(f"Error converting coordinate {coord}: {str(e)}")
-                        return None
+        # Served from the in-memory port index instead of querying sea_ports;
+        # the body is formatted once per port index version
+        await port_index.ensure_loaded(repo)
+        return Response(content=port_catalog.list_body(), media_type="application/json")
 
-                formatted_port = {
-                    "id": port["id"],
-                    "name": port["name"],
-                    "region": port["region"],
-                    "country": port["country"],
-                    "location": {
-                        "latitude": convert_coordinate(port["latitude"], False),
-                        "longitude": convert_coordinate(port["longitude"], True)
-                    },
-                    "status": port["status"] or "ổn định",
-                    "dockedShips": 0,  # Temporary default value
-                    "capacity": 100,    # Temporary default value
-                    "availableSlots": 100,  # Temporary default value
-                    "avgWaitingTime": "N/A"  # Temporary default value
-                }
-                formatted_ports.append(formatted_port)
-            except Exception as e:
-                logger.error(f"Error processing port {port['id']}: {str(e)}")
-                continue
-        
-        return {"ports": formatted_ports}
-        
     except Exception as e:
         logger.error(f"Error fetching ports: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if 'cursor' in locals() and cursor:
-            cursor.close()
-        if 'conn' in locals() and conn:
-            conn.close()
 
 @router.get("/api/ports/{port_id}")
-async def get_port(port_id: int):
+async def get_port(port_id: int, repo=Depends(get_repository)):
     try:
-        conn = get_db_connection()
-        if not conn:
-            raise HTTPException(status_code=500, detail="Database connection error")
-        
-        cursor = conn.cursor(dictionary=True)
-        
-        query = """
-            SELECT 
-                id,
-                port_name as name,
-                region,
-                country,
-                latitude,
-                longitude,
-                status,
-                created_at
-            FROM sea_ports
-            WHERE id = %s
-        """
-        
-        cursor.execute(query, (port_id,))
-        port = cursor.fetchone()
-        
+        await port_index.ensure_loaded(repo)
+        body = port_catalog.detail_body(port_id)
+
+        if body is None:
+            raise HTTPException(status_code=404, detail="Port not found")
+
+        return Response(content=body, media_type="application/json")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching port {port_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/ports/{port_id}/nearby-ships")
+async def get_nearby_ships(
+    port_id: int,
+    radius_km: float = Query(50, gt=0, le=5000),
+    limit: Optional[int] = Query(None, ge=1),
+    repo=Depends(get_repository)
+):
+    """Ships within ``radius_km`` of a port, nearest first."""
+    try:
+        await port_index.ensure_loaded(repo)
+        port = port_index.by_id.get(port_id)
         if not port:
             raise HTTPException(status_code=404, detail="Port not found")
-        
+        if port["latitude"] is None or port["longitude"] is None:
+            raise HTTPException(status_code=422, detail="Port has no coordinates")
+
+        await ship_index.ensure_loaded(repo)
+        ships = ship_index.near(float(port["latitude"]), float(port["longitude"]), radius_km, limit)
         return {
-            "id": port["id"],
-            "name": port["name"],
-            "region": port["region"],
-            "country": port["country"],
-            "location": {
-                "latitude": float(port["latitude"]) if port["latitude"] else None,
-                "longitude": float(port["longitude"]) if port["longitude"] else None
-            },
-            "status": port["status"] or "ổn định",
-            "last_updated": port["created_at"].isoformat() if port["created_at"] else None
+            "port": {"id": port["id"], "name": port["name"]},
+            "radius_km": radius_km,
+            "count": len(ships),
+            "ships": ships
         }
-        
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error fetching port {port_id}: {str(e)}")
+        logger.error(f"Error fetching ships near port {port_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if 'cursor' in locals() and cursor:
-            cursor.close()
-        if 'conn' in locals() and conn:
-            conn.close()
\ No newline at end of file
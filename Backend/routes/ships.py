@@ -1,23 +1,211 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response
 from datetime import datetime
+from typing import Optional
+import json
+import numpy as np
 try:
-    from ..db.database import get_db_connection
+    from ..db.repository import get_repository
+    from ..services.fleet_state import fleet_state
+    from ..services.metrics import timed
+    from ..services.fleet_store import (
+        RowEncoder, datetime_field, float_field, mapped_field, string_field
+    )
+    from ..services.port_index import port_index
+    from ..services.serialization import FastJSONResponse
+    from ..services.voyage import route_table
+    from ..services.pagination import (
+        bbox_conditions, decode_cursor, encode_cursor, page_size, parse_fields, project, split_csv
+    )
 except Exception:
-    from db.database import get_db_connection
+    from db.repository import get_repository
+    from services.fleet_state import fleet_state
+    from services.metrics import timed
+    from services.fleet_store import (
+        RowEncoder, datetime_field, float_field, mapped_field, string_field
+    )
+    from services.port_index import port_index
+    from services.serialization import FastJSONResponse
+    from services.voyage import route_table
+    from services.pagination import (
+        bbox_conditions, decode_cursor, encode_cursor, page_size, parse_fields, project, split_csv
+    )
 
 router = APIRouter()
 
+# Fields accepted by the fields= projection on /api/ships
+SHIP_FIELDS = ("id", "name", "route", "eta", "delay_hours", "status", "reason", "lat", "lng", "voyage")
+
+def format_ship(r):
+    """Shape one eta_results row for the frontend."""
+    lat, lng = port_index.coordinates(r['port_to'])
+    return {
+        'id': r['ship_name'],
+        'name': r['ship_name'],
+        'route': f"{r['port_from']} → {r['port_to']}",
+        'eta': _isoformat(r['eta_expected']),
+        'delay_hours': float(r['delay_hours']) if r['delay_hours'] is not None else 0,
+        'status': r['status'] or 'active',
+        'reason': r['reason'],
+        'lat': lat,
+        'lng': lng
+    }
+
+def route_field(columns, slots):
+    """Route text for each row, formatted once per distinct port pair."""
+    ports = columns.table("port_from")
+    size = len(ports)
+    pairs = columns.codes["port_from"][slots].astype(np.int64) * size + columns.codes["port_to"][slots]
+    unique, inverse = np.unique(pairs, return_inverse=True)
+    fragments = np.array([
+        json.dumps(f"{ports.values[pair // size]} → {ports.values[pair % size]}", ensure_ascii=False)
+        for pair in unique.tolist()
+    ], dtype=object)
+    return fragments[inverse].tolist()
+
+def _port_to_coordinate(index):
+    return mapped_field("port_to", lambda name: port_index.coordinates(name)[index])
+
+def _hours_between(start, end):
+    return (end - start) / np.timedelta64(1, "h")
+
+def voyage_field(columns, slots):
+    """Route progress and projected positions, computed for all rows at once."""
+    voyages = route_table.voyages(
+        route_table.slot_route_ids(columns, slots), columns.floats["latitude"][slots], columns.floats["longitude"][slots],
+        _hours_between(columns.dates["updated_at"][slots], columns.dates["eta_expected"][slots])
+    )
+    return route_table.encode(voyages)
+
+def add_voyages(results, rows):
+    """Attach ``voyage`` to formatted SQL rows (which must carry position and timestamps)."""
+    if not rows:
+        return
+    ids = route_table.route_ids([r['port_from'] for r in rows], [r['port_to'] for r in rows])
+    voyages = route_table.voyages(
+        ids,
+        np.array([r['latitude'] for r in rows], dtype=np.float64),
+        np.array([r['longitude'] for r in rows], dtype=np.float64),
+        _hours_between(np.array([r['updated_at'] for r in rows], dtype="datetime64[us]"),
+                       np.array([r['eta_expected'] for r in rows], dtype="datetime64[us]"))
+    )
+    for result, fragment in zip(results, route_table.encode(voyages)):
+        result['voyage'] = json.loads(fragment)
+
+# /api/ships rows encoded straight from the fleet state columns (same shape
+# as format_ship); rows are re-encoded only when they change
+ships_encoder = RowEncoder(fleet_state, (
+    ("id", string_field("ship_name")),
+    ("name", string_field("ship_name")),
+    ("route", route_field),
+    ("eta", datetime_field("eta_expected")),
+    ("delay_hours", float_field("delay_hours", "0")),
+    ("status", string_field("status", '"active"')),
+    ("reason", string_field("reason")),
+    ("lat", _port_to_coordinate(0)),
+    ("lng", _port_to_coordinate(1)),
+), version=lambda: port_index.version)
+
+# Same rows plus "voyage"; a separate cache so plain /api/ships pays nothing for it
+voyage_encoder = RowEncoder(fleet_state, ships_encoder.fields + (("voyage", voyage_field),),
+                            version=lambda: port_index.version)
+
+_ships_order = (None, None, None)  # (fleet version, slots by (eta, name), their etas)
+
+async def load_upcoming_ships(repo, fields=None, voyage=False):
+    """
+    Ships whose ETA is still ahead (by the database clock), soonest first,
+    as JSON bytes; ``voyage`` adds route progress to every row.
+    """
+    global _ships_order
+    await port_index.ensure_loaded(repo)
+    await fleet_state.sync(repo)
+    if _ships_order[0] != fleet_state.version:
+        columns = fleet_state.columns
+        slots = columns.live_slots()
+        etas = columns.dates["eta_expected"][slots]
+        slots = slots[~np.isnat(etas)]
+        names = columns.table("ship_name").rank()[columns.codes["ship_name"][slots]]
+        order = slots[np.lexsort((names, columns.dates["eta_expected"][slots]))]
+        _ships_order = (fleet_state.version, order, columns.dates["eta_expected"][order])
+    _, order, etas = _ships_order
+    now = np.datetime64(fleet_state.db_now().replace(microsecond=0), "us")
+    encoder = voyage_encoder if voyage or (fields and "voyage" in fields) else ships_encoder
+    with timed("serialize"):
+        return encoder.encode(order[np.searchsorted(etas, now, side="right"):], fields)
+
 @router.get("/api/ships")
-async def get_ships():
-    """Return ship list from eta_results table."""
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="Database connection error")
+async def get_ships(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    status: Optional[str] = None,
+    port_from: Optional[str] = None,
+    port_to: Optional[str] = None,
+    min_delay: Optional[float] = None,
+    min_lat: Optional[float] = None,
+    max_lat: Optional[float] = None,
+    min_lng: Optional[float] = None,
+    max_lng: Optional[float] = None,
+    voyage: bool = False,
+    repo=Depends(get_repository)
+):
+    """
+    Return ship list from eta_results table.
+
+    ``voyage=true`` (or ``voyage`` in ``fields``) adds each ship's progress
+    along its great-circle route, the remaining distance and its projected
+    positions ``ROUTE_PROJECTION_HOURS`` after its last position report.
 
+    The unfiltered list is served from the in-memory fleet state. Filters
+    are applied in SQL (the bounding box is on the ship position);
+    ``fields`` selects columns; ``limit``/``cursor`` switch to keyset
+    pagination over (eta, name, IMO) and return ``{"results": [...], "next_cursor": ...}``.
+    """
     try:
-        cursor = conn.cursor(dictionary=True)
+        paged = limit is not None or cursor is not None
+        try:
+            projection = parse_fields(fields, SHIP_FIELDS)
+            after = decode_cursor(cursor, 3) if cursor else None
+            size = page_size(limit) if paged else None
+            after_eta = datetime.fromisoformat(after[0]) if after else None
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        filtered = any(value is not None for value in (
+            status, port_from, port_to, min_delay, min_lat, max_lat, min_lng, max_lng
+        ))
+        if not paged and not filtered:
+            body = await load_upcoming_ships(repo, projection, voyage)
+            return Response(content=body, media_type="application/json")
+
+        conditions = ["er.eta_expected > NOW()"]
+        params = []
+        statuses = split_csv(status)
+        if statuses:
+            conditions.append("er.status IN (" + ", ".join(["%s"] * len(statuses)) + ")")
+            params.extend(statuses)
+        if port_from:
+            conditions.append("er.port_from = %s")
+            params.append(port_from)
+        if port_to:
+            conditions.append("er.port_to = %s")
+            params.append(port_to)
+        if min_delay is not None:
+            conditions.append("er.delay_hours >= %s")
+            params.append(min_delay)
+        box, box_params = bbox_conditions("er.latitude", "er.longitude", min_lat, max_lat, min_lng, max_lng)
+        conditions.extend(box)
+        params.extend(box_params)
+        if after is not None:
+            # Ship names are not unique; IMO breaks ties so no row is skipped or repeated
+            conditions.append(
+                "(er.eta_expected > %s OR (er.eta_expected = %s AND "
+                "(er.ship_name > %s OR (er.ship_name = %s AND COALESCE(er.IMO, 0) > %s))))"
+            )
+            params.extend([after_eta, after_eta, after[1], after[1], int(after[2])])
 
-        # Lấy dữ liệu từ bảng eta_results và join với sea_ports để lấy tọa độ của cảng đích
+        # Lấy dữ liệu từ bảng eta_results; tọa độ cảng đích lấy từ port index trong bộ nhớ
         query = """
             SELECT 
                 er.ship_name,
@@ -27,47 +215,51 @@ async def get_ships():
                 er.delay_hours,
                 er.status,
                 er.reason,
-                sp.latitude,
-                sp.longitude
+                er.latitude,
+                er.longitude,
+                er.updated_at,
+                COALESCE(er.IMO, 0) AS imo_key
             FROM eta_results er
-            LEFT JOIN sea_ports sp ON er.port_to = sp.port_name
-            WHERE er.eta_expected > NOW()
-            ORDER BY er.eta_expected ASC
+            WHERE """ + " AND ".join(conditions) + """
+            ORDER BY er.eta_expected ASC, er.ship_name ASC, COALESCE(er.IMO, 0) ASC
         """
-            
-        cursor.execute(query)
-        rows = cursor.fetchall()
+        if size is not None:
+            # One extra row tells us whether there is a next page
+            query += " LIMIT %s"
+            params.append(size + 1)
+
+        await port_index.ensure_loaded(repo)
+        rows = await repo.fetch_all(query, tuple(params))
+
+        next_cursor = None
+        if size is not None and len(rows) > size:
+            rows = rows[:size]
+            last = rows[-1]
+            next_cursor = encode_cursor([_isoformat(last['eta_expected']), last['ship_name'], int(last['imo_key'] or 0)])
 
         # Chuyển đổi dữ liệu theo định dạng frontend cần
-        results = []
-        for r in rows:
-            ship_data = {
-                'id': r['ship_name'],
-                'name': r['ship_name'],
-                'route': f"{r['port_from']} → {r['port_to']}",
-                'eta': r['eta_expected'].isoformat() if isinstance(r['eta_expected'], datetime) else r['eta_expected'],
-                'delay_hours': float(r['delay_hours']) if r['delay_hours'] is not None else 0,
-                'status': r['status'] or 'active',
-                'reason': r['reason'],
-                'lat': float(r['latitude']) if r['latitude'] is not None else None,
-                'lng': float(r['longitude']) if r['longitude'] is not None else None
-            }
-            results.append(ship_data)
-
-        cursor.close()
-        conn.close()
-        return results
+        with timed("transform"):
+            results = [format_ship(r) for r in rows]
+            if voyage or (projection and "voyage" in projection):
+                add_voyages(results, rows)
+            results = project(results, projection)
+        if not paged:
+            return FastJSONResponse(content=results)
+        return FastJSONResponse(content={"results": results, "next_cursor": next_cursor})
 
+    except HTTPException:
+        raise
     except Exception as e:
-        # ensure connection closed on error
-        if 'cursor' in locals():
-            try:
-                cursor.close()
-            except:
-                pass
-        if 'conn' in locals():
-            try:
-                conn.close()
-            except:
-                pass
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/routes")
+async def get_route(port_from: str, port_to: str, repo=Depends(get_repository)):
+    """Great-circle waypoints between two ports, built once per port pair."""
+    await port_index.ensure_loaded(repo)
+    body = route_table.path(port_from, port_to)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Unknown port")
+    return Response(content=body, media_type="application/json")
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, datetime) else value
@@ -0,0 +1,37 @@
+from fastapi import APIRouter
+from db.database import get_pool
+from db.repository import get_repository
+from middleware.compression import compression_cache
+from routes.eta import eta_cache
+from routes.stream import change_feed
+from services.fleet_state import fleet_state
+from services.history import history_recorder
+from services.port_catalog import port_catalog
+from services.port_index import port_index
+from services.spatial_index import ship_index
+from services.inference import inference
+from services.feature_store import feature_store
+from services.voyage import route_table
+from services.weather import weather_index
+
+router = APIRouter()
+
+@router.get("/api/stats")
+async def get_stats():
+    """Return runtime metrics for this worker process."""
+    return {
+        "db_pool": get_pool().stats(),
+        "db_streams": get_repository().stats(),
+        "eta_cache": eta_cache.stats(),
+        "compression": compression_cache.stats(),
+        "change_feed": change_feed.stats(),
+        "fleet_state": fleet_state.stats(),
+        "history": history_recorder.stats(),
+        "port_index": port_index.stats(),
+        "port_catalog": port_catalog.stats(),
+        "ship_index": ship_index.stats(),
+        "inference": inference.stats(),
+        "feature_store": feature_store.stats(),
+        "routes": route_table.stats(),
+        "weather": weather_index.stats()
+    }
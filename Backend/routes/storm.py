@@ -1,11 +1,16 @@
-from fastapi import APIRouter, HTTPException
-from db.database import get_db_connection
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from db.repository import get_repository
+from services.serialization import trusted_response
+from services.spatial_index import ship_index
+from services.storm_track import load_forecast
+from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
+import logging
 import pytz
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 class StormAlert(BaseModel):
     alert_id: int
@@ -29,83 +34,120 @@ class StormInfo(BaseModel):
     warning_radius_km: float
 
 @router.get("/api/storms", response_model=List[StormInfo])
-async def get_storms():
+async def get_storms(repo=Depends(get_repository)):
     try:
-        conn = get_db_connection()
-        if not conn:
-            raise HTTPException(status_code=500, detail="Database connection error")
-        
-        cursor = conn.cursor(dictionary=True)
         query = """
             SELECT id, name, latitude, longitude, 
                    wind_kmh, level, radius_km, warning_radius_km
             FROM storm_info
             ORDER BY wind_kmh DESC
         """
-        cursor.execute(query)
-        storms = cursor.fetchall()
-        
-        cursor.close()
-        conn.close()
+        storms = await repo.fetch_all(query)
         
-        return storms
+        # Rows already have the StormInfo shape; skip per-row model validation
+        return trusted_response(storms, StormInfo)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/storms/{storm_id}/ships-at-risk")
+async def get_ships_at_risk(
+    storm_id: int,
+    radius_km: Optional[float] = Query(None, gt=0, le=5000),
+    limit: Optional[int] = Query(None, ge=1),
+    repo=Depends(get_repository)
+):
+    """
+    Ships inside a storm's warning radius (or ``radius_km``), nearest first,
+    answered from the in-memory spatial index.
+    """
+    try:
+        storm = await repo.fetch_one(
+            "SELECT id, name, latitude, longitude, radius_km, warning_radius_km FROM storm_info WHERE id = %s",
+            (storm_id,)
+        )
+        if not storm:
+            raise HTTPException(status_code=404, detail="Storm not found")
+
+        core = float(storm["radius_km"] or 0)
+        search = radius_km or max(float(storm["warning_radius_km"] or 0), core)
+        await ship_index.ensure_loaded(repo)
+        ships = ship_index.near(float(storm["latitude"]), float(storm["longitude"]), search, limit)
+        for ship in ships:
+            ship["zone"] = "core" if ship["distance_km"] <= core else "warning"
+
+        return {"storm": storm, "radius_km": search, "count": len(ships), "ships": ships}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/api/storms/{storm_id}/forecast")
+async def get_storm_forecast(
+    storm_id: int,
+    limit: int = Query(100, ge=1, le=5000),
+    repo=Depends(get_repository)
+):
+    """
+    Recorded track of a storm, its forecast positions with the cone-widened
+    radii every STORM_FORECAST_STEP_HOURS, and the ships forecast to meet it
+    (as of the last encounter scan), soonest first.
+    """
+    try:
+        forecast = await load_forecast(repo, storm_id, limit)
+        if forecast is None:
+            raise HTTPException(status_code=404, detail="Storm not found")
+        return forecast
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+STORM_ALERTS_QUERY = """
+        SELECT 
+            id as alert_id,
+            name as message,
+            latitude,
+            longitude,
+            radius_km,
+            warning_radius_km,
+            wind_kmh,
+            CASE
+                WHEN level = 'Super Typhoon' THEN 'critical'
+                WHEN level IN ('Category 5', 'Category 4') THEN 'high'
+                WHEN level IN ('Category 3', 'Category 2', 'Category 1') THEN 'medium'
+                ELSE 'low'
+            END as severity,
+            CASE
+                WHEN wind_kmh > 150 THEN 'Siêu bão'
+                WHEN wind_kmh > 120 THEN 'Bão mạnh'
+                WHEN wind_kmh > 80 THEN 'Bão'
+                ELSE 'Áp thấp nhiệt đới'
+            END as status
+        FROM storm_info
+        ORDER BY 
+            CASE level
+                WHEN 'Super Typhoon' THEN 1
+                WHEN 'Category 5' THEN 2
+                WHEN 'Category 4' THEN 3
+                WHEN 'Category 3' THEN 4
+                WHEN 'Category 2' THEN 5
+                WHEN 'Category 1' THEN 6
+                WHEN 'Tropical Storm' THEN 7
+                ELSE 8
+            END,
+            wind_kmh DESC
+    """
+
+async def load_storm_alerts(repo):
+    """Return storm_info rows shaped as storm alerts, most severe first."""
+    return await repo.fetch_all(STORM_ALERTS_QUERY)
+
 @router.get("/api/storm-alerts", response_model=List[StormAlert])
-async def get_storm_alerts():
+async def get_storm_alerts(repo=Depends(get_repository)):
     try:
-        print("Starting to fetch storm alerts...")
-        conn = get_db_connection()
-        if not conn:
-            raise HTTPException(status_code=500, detail="Database connection error")
-        
-        cursor = conn.cursor(dictionary=True)
-        print("Database connection successful")
-        query = """
-            SELECT 
-                id as alert_id,
-                name as message,
-                latitude,
-                longitude,
-                radius_km,
-                warning_radius_km,
-                wind_kmh,
-                CASE
-                    WHEN level = 'Super Typhoon' THEN 'critical'
-                    WHEN level IN ('Category 5', 'Category 4') THEN 'high'
-                    WHEN level IN ('Category 3', 'Category 2', 'Category 1') THEN 'medium'
-                    ELSE 'low'
-                END as severity,
-                CASE
-                    WHEN wind_kmh > 150 THEN 'Siêu bão'
-                    WHEN wind_kmh > 120 THEN 'Bão mạnh'
-                    WHEN wind_kmh > 80 THEN 'Bão'
-                    ELSE 'Áp thấp nhiệt đới'
-                END as status
-            FROM storm_info
-            ORDER BY 
-                CASE level
-                    WHEN 'Super Typhoon' THEN 1
-                    WHEN 'Category 5' THEN 2
-                    WHEN 'Category 4' THEN 3
-                    WHEN 'Category 3' THEN 4
-                    WHEN 'Category 2' THEN 5
-                    WHEN 'Category 1' THEN 6
-                    WHEN 'Tropical Storm' THEN 7
-                    ELSE 8
-                END,
-                wind_kmh DESC
-        """
-        print("Executing query:", query)
-        cursor.execute(query)
-        alerts = cursor.fetchall()
-        
-        print(f"Found {len(alerts)} alerts")
-        
-        cursor.close()
-        conn.close()
+        alerts = await load_storm_alerts(repo)
+        logger.debug(f"Found {len(alerts)} storm alerts")
         
-        return alerts
+        return trusted_response(alerts, StormAlert)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from db.repository import get_repository
+from services.change_feed import Channel, ChangeFeed, FleetChannel
+from services.fleet_state import fleet_state
+from services.port_index import port_index
+from routes.eta import eta_encoder, eta_order
+from routes.storm import load_storm_alerts
+from services.serialization import dumps
+import asyncio
+import os
+
+router = APIRouter()
+
+# Seconds between change checks of the shared poller
+STREAM_POLL_INTERVAL = float(os.getenv('STREAM_POLL_INTERVAL', '5'))
+# Seconds between keep-alive comments on idle streams
+STREAM_KEEPALIVE = 15
+
+def _eta_key(fleet_key):
+    # IMO identifies a vessel; fall back to the name for rows without one
+    # (the fleet state keeps a missing IMO as 0)
+    name, imo = fleet_key
+    return str(imo) if imo else name
+
+async def _sync_eta(repo):
+    # Rows embed port coordinates, so the port index must be loaded too
+    await port_index.ensure_loaded(repo)
+    await fleet_state.sync(repo)
+
+change_feed = ChangeFeed(
+    [
+        FleetChannel("eta", fleet_state, eta_encoder, _sync_eta, eta_order, _eta_key),
+        Channel("storms", load_storm_alerts, lambda row: str(row["alert_id"])),
+    ],
+    interval=STREAM_POLL_INTERVAL
+)
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {dumps(data).decode('utf-8')}\n\n"
+
+@router.get("/api/stream")
+async def stream_changes(request: Request, channels: str = "eta,storms", repo=Depends(get_repository)):
+    """
+    Server-Sent Events stream of ETA and storm changes.
+
+    Sends a ``snapshot`` event with the current rows on connect, then
+    ``eta`` / ``storms`` events carrying ``upserted`` rows and ``removed``
+    keys (IMO or ship name for ETA, alert id for storms).
+    """
+    queue, snapshot = await change_feed.subscribe(repo, channels.split(","))
+
+    async def events():
+        try:
+            yield format_event("snapshot", snapshot)
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None:
+                    break
+                name, delta = item
+                yield format_event(name, delta)
+        finally:
+            change_feed.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
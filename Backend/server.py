@@ -1,15 +1,17 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import mysql.connector
-from mysql.connector import Error
-from typing import Dict, Any
-import os
 from dotenv import load_dotenv
+import logging
 from fastapi.responses import HTMLResponse
 from routes import eta
+from db.database import init_pool, close_pool
+from db.repository import init_repository, close_repository
+from services.inference import inference
+from services.port_index import port_index
 
 # Load environment variables
 load_dotenv()
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -22,21 +24,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Database configuration
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', '123456'),
-    'database': os.getenv('DB_NAME', 'shipping_ml')
-}
+@app.on_event("startup")
+async def startup():
+    init_pool()
+    repo = init_repository()
+    # Load sea_ports into memory and keep it refreshed (PORT_INDEX_REFRESH)
+    port_index.start(repo)
+    # Load the ETA model for /api/eta/predict, served by the eta router below
+    await inference.start()
 
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        return conn
-    except Error as e:
-        print(f"Error connecting to database: {e}")
-        return None
+@app.on_event("shutdown")
+async def shutdown():
+    await inference.stop()
+    await port_index.stop()
+    close_repository()
+    close_pool()
 
 @app.get("/", response_class=HTMLResponse)
 async def root():
@@ -76,94 +78,15 @@ async def root():
     </html>
     """
 
-@app.get("/api/ports/{port_id}")
-async def get_port_info(port_id: int) -> Dict[str, Any]:
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="Database connection error")
-    
-    try:
-        cursor = conn.cursor(dictionary=True)
-        
-        cursor.execute("""
-            SELECT port_name, region, country, latitude, longitude, status, created_at
-            FROM sea_ports
-            WHERE id = %s
-        """, (port_id,))
-        
-        port_info = cursor.fetchone()
-        if not port_info:
-            raise HTTPException(status_code=404, detail="Port not found")
-        
-        response = {
-            "portName": port_info['port_name'],
-            "region": port_info['region'],
-            "country": port_info['country'],
-            "status": port_info['status'],
-            "location": {
-                "latitude": port_info['latitude'],
-                "longitude": port_info['longitude']
-            },
-            "lastUpdated": port_info['created_at'].isoformat()
-        }
-        
-        return response
-        
-    except Error as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-
-@app.get("/api/ports")
-async def get_ports_list():
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="Database connection error")
-    
-    try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT id, port_name, region, country, latitude, longitude, status
-            FROM sea_ports
-        """)
-        ports = cursor.fetchall()
-        
-        return {
-            "ports": [
-                {
-                    "id": port['id'],
-                    "name": port['port_name'],
-                    "region": port['region'],
-                    "country": port['country'],
-                    "status": port['status'],
-                    "location": {
-                        "latitude": port['latitude'],
-                        "longitude": port['longitude']
-                    }
-                }
-                for port in ports
-            ]
-        }
-        
-    except Error as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-
-
 # Include routers
 try:
-    from routes import eta, storm
+    from routes import eta, ports, storm
+    # /api/ports and /api/ports/{port_id} come from the shared port catalog
+    app.include_router(ports.router)
     app.include_router(eta.router)
     app.include_router(storm.router)
 except Exception as e:
-    print(f"Warning: could not include routers: {e}")
+    logger.warning(f"Could not include routers: {e}")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Single-value, per-process cache for an expensive read.
+
+    A cached value is served without revalidation for ``ttl`` seconds.
+    After that the ``fingerprint`` coroutine is awaited with the repository
+    and the value is reused if the fingerprint is unchanged; otherwise
+    ``loader`` is called again. Concurrent misses share one in-flight load
+    (single-flight), so a burst of polls runs the expensive load once.
+    ``invalidate`` drops the value, and a load already in flight when it is
+    called does not store its (possibly stale) result.
+    """
+
+    def __init__(self, name, ttl, fingerprint=None):
+        self.name = name
+        self.ttl = ttl
+        self.fingerprint = fingerprint
+
+        self._value = None
+        self._fingerprint = None
+        self._expires_at = 0.0
+        self._inflight = None
+        self._generation = 0  # bumped by invalidate()
+
+        self._hits = 0
+        self._revalidated = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._invalidations = 0
+        self._errors = 0
+
+    async def get(self, repo, loader):
+        """Return the cached value, calling ``await loader(repo)`` when stale."""
+        if self.ttl <= 0:
+            self._misses += 1
+            return await loader(repo)
+
+        if self._value is not None and time.monotonic() < self._expires_at:
+            self._hits += 1
+            return self._value
+
+        if self._inflight is not None:
+            self._coalesced += 1
+            return await asyncio.shield(self._inflight)
+
+        task = asyncio.ensure_future(self._refresh(repo, loader))
+        self._inflight = task
+        task.add_done_callback(self._clear_inflight)
+        return await asyncio.shield(task)
+
+    def invalidate(self):
+        """Drop the cached value so the next request reloads it."""
+        self._value = None
+        self._fingerprint = None
+        self._expires_at = 0.0
+        self._generation += 1
+        # The next request starts a fresh load instead of joining this one
+        self._inflight = None
+        self._invalidations += 1
+
+    def stats(self):
+        lookups = self._hits + self._revalidated + self._misses + self._coalesced
+        return {
+            "ttl_s": self.ttl,
+            "hits": self._hits,
+            "revalidated_hits": self._revalidated,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "invalidations": self._invalidations,
+            "errors": self._errors,
+            "hit_ratio": round((lookups - self._misses) / lookups, 4) if lookups else None,
+        }
+
+    async def _refresh(self, repo, loader):
+        generation = self._generation
+        fingerprint = await self._read_fingerprint(repo)
+        if (self._value is not None and fingerprint is not None
+                and fingerprint == self._fingerprint):
+            self._revalidated += 1
+            self._expires_at = time.monotonic() + self.ttl
+            return self._value
+
+        if self._value is not None:
+            self._invalidations += 1
+        self._misses += 1
+        # Fingerprint is read before loading so a change that lands during the
+        # load is picked up by the next revalidation rather than missed.
+        value = await loader(repo)
+        if generation != self._generation:
+            # Invalidated while loading; hand the result to the callers
+            # already waiting but don't keep it
+            return value
+        self._value = value
+        self._fingerprint = fingerprint
+        self._expires_at = time.monotonic() + self.ttl
+        return value
+
+    async def _read_fingerprint(self, repo):
+        if self.fingerprint is None:
+            return None
+        try:
+            return await self.fingerprint(repo)
+        except Exception as e:
+            # Without a fingerprint the cache degrades to plain TTL expiry
+            self._errors += 1
+            logger.warning(f"Could not read {self.name} cache fingerprint: {str(e)}")
+            return None
+
+    def _clear_inflight(self, task):
+        if self._inflight is task:
+            self._inflight = None
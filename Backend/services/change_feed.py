@@ -0,0 +1,226 @@
+import asyncio
+import logging
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+
+from services.serialization import loads
+
+logger = logging.getLogger(__name__)
+
+
+class Channel:
+    """A named, keyed dataset published on the change feed, diffed on every poll."""
+
+    def __init__(self, name, loader, key):
+        self.name = name
+        self.loader = loader  # async loader(repo) -> list of row dicts
+        self.key = key        # key(row) -> stable identifier
+        self.rows = {}
+        self.loaded = False
+        self.source = None  # last loader result, to skip diffing cached lists
+
+    async def poll(self, repo):
+        """Reload; returns ``(upserted, removed)``, or None on the first load or no change."""
+        source = await self.loader(repo)
+        if self.loaded and source is self.source:
+            return None
+        self.source = source
+        rows = jsonable_encoder(source)
+        current = {self.key(row): row for row in rows}
+        previous = self.rows
+
+        upserted = [row for key, row in current.items() if previous.get(key) != row]
+        removed = [key for key in previous if key not in current]
+        self.rows = current
+        first_load = not self.loaded
+        self.loaded = True
+        if first_load or not (upserted or removed):
+            return None
+        return upserted, removed
+
+    def snapshot(self):
+        return list(self.rows.values())
+
+
+class FleetChannel:
+    """
+    The fleet state as a channel. Deltas are built from the keys each
+    fleet state sync reports as changed or removed, so a poll costs
+    O(changes) instead of a diff of the whole list.
+
+    ``sync(repo)`` brings the state up to date. Changes are recorded from
+    every sync, including the ones other requests trigger, and published on
+    the next poll; snapshots are encoded from the state as it is when taken
+    (``order()`` gives the slots in list order), so a snapshot is never
+    older than a delta already sent. ``encoder`` (a ``RowEncoder``) encodes
+    rows; when its ``version`` moves every row is re-sent. ``key(fleet_key)``
+    is the identifier sent in ``removed``.
+    """
+
+    def __init__(self, name, state, encoder, sync, order, key):
+        self.name = name
+        self.state = state
+        self.encoder = encoder
+        self.sync = sync
+        self.order = order
+        self.key = key
+        self.loaded = False
+        self._rows = (None, [])  # ((fleet version, encoder version), decoded rows)
+        self._version = None
+        self._changed = set()
+        self._removed = set()
+        state.on_change(self._on_change)
+
+    def _on_change(self, changed, removed):
+        self._changed.difference_update(removed)
+        self._changed.update(changed)
+        self._removed.difference_update(changed)
+        self._removed.update(removed)
+
+    def _encoder_version(self):
+        return self.encoder.version() if self.encoder.version else None
+
+    async def poll(self, repo):
+        """Sync; returns ``(upserted, removed)``, or None on the first load or no change."""
+        await self.sync(repo)
+        version = self._encoder_version()
+        changed, removed = self._changed, self._removed
+        self._changed, self._removed = set(), set()
+        if not self.loaded or version != self._version:
+            first_load = not self.loaded
+            self.loaded = True
+            self._version = version
+            if first_load:
+                # Subscribers start from a snapshot of the current state
+                return None
+            # Every row embeds data from the version source (port coordinates)
+            changed = set(self.state.keys())
+        if not (changed or removed):
+            return None
+
+        slots = self.state.columns.slots
+        live = np.array(sorted(slots[key] for key in changed if key in slots), dtype=np.int64)
+        upserted = loads(b"[" + b",".join(self.encoder.encode_slots(live)) + b"]") if live.size else []
+        return upserted, [self.key(key) for key in removed]
+
+    def snapshot(self):
+        # Decoded once per fleet version, however many subscribers connect
+        version = (self.state.version, self._encoder_version())
+        if self._rows[0] != version:
+            self._rows = (version, loads(self.encoder.encode(self.order())))
+        return list(self._rows[1])
+
+
+class ChangeFeed:
+    """
+    Per-worker change detector that fans deltas out to stream subscribers.
+
+    One background task polls every channel each ``interval`` seconds
+    (only while someone is subscribed) for the rows that changed since the
+    previous poll, and pushes ``{"upserted": [...], "removed": [...]}``
+    events to every subscriber queue. Database load therefore depends on the
+    number of workers, not the number of open dashboards.
+    """
+
+    def __init__(self, channels, interval=5.0, queue_size=100):
+        self.channels = {channel.name: channel for channel in channels}
+        self.interval = interval
+        self.queue_size = queue_size
+        self._subscribers = {}  # queue -> set of channel names
+        self._task = None
+        self._repo = None
+        self._poll_lock = asyncio.Lock()
+
+        self._polls = 0
+        self._events = 0
+        self._dropped = 0
+
+    def start(self, repo):
+        self._repo = repo
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for queue in list(self._subscribers):
+            self._close(queue)
+
+    async def subscribe(self, repo, names):
+        """
+        Register a subscriber for ``names`` and return ``(queue, snapshot)``.
+        The snapshot holds the current rows of every requested channel.
+        """
+        names = [name for name in names if name in self.channels]
+        if self._repo is None:
+            self._repo = repo
+        if any(not self.channels[name].loaded for name in names):
+            await self.poll()
+
+        # No await between taking the snapshot and registering the queue, so
+        # the subscriber cannot miss a delta.
+        snapshot = {name: self.channels[name].snapshot() for name in names}
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers[queue] = set(names)
+        return queue, snapshot
+
+    def unsubscribe(self, queue):
+        self._subscribers.pop(queue, None)
+
+    def stats(self):
+        return {
+            "subscribers": len(self._subscribers),
+            "interval_s": self.interval,
+            "polls": self._polls,
+            "events_published": self._events,
+            "subscribers_dropped": self._dropped,
+        }
+
+    async def poll(self):
+        """Reload every channel once and publish what changed."""
+        async with self._poll_lock:
+            self._polls += 1
+            for channel in self.channels.values():
+                delta = await channel.poll(self._repo)
+                if delta is not None:
+                    upserted, removed = delta
+                    self._publish(channel.name, {"upserted": upserted, "removed": removed})
+
+    def _publish(self, name, delta):
+        self._events += 1
+        for queue, names in list(self._subscribers.items()):
+            if name not in names:
+                continue
+            try:
+                queue.put_nowait((name, delta))
+            except asyncio.QueueFull:
+                # A client this far behind reconnects and gets a fresh snapshot
+                self._dropped += 1
+                self._close(queue)
+
+    def _close(self, queue):
+        self._subscribers.pop(queue, None)
+        try:
+            queue.put_nowait(None)
+        except asyncio.QueueFull:
+            queue.get_nowait()
+            queue.put_nowait(None)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if not self._subscribers:
+                # Nobody is listening; the next subscriber triggers a fresh load
+                for channel in self.channels.values():
+                    channel.loaded = False
+                continue
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error(f"Change feed poll failed: {str(e)}")
@@ -0,0 +1,162 @@
+"""
+ETA models.
+
+A model is any object with ``predict(features)`` that takes a dict of
+equal-length NumPy arrays keyed by ``FEATURES`` and returns
+``(transit_hours, delay_hours)`` arrays. ``load_model`` resolves a model
+spec: ``"baseline"``, ``"stub"`` or ``"package.module:Name"`` for a class (or factory)
+importable from the backend, called with no arguments.
+"""
+import importlib
+import os
+import time
+
+import numpy as np
+
+from services.hazard import EARTH_RADIUS_KM, to_unit_vectors
+
+# Model used when none is given explicitly
+ETA_MODEL = os.getenv('ETA_MODEL', 'baseline')
+
+FEATURES = (
+    "latitude", "longitude",       # current position (origin port if unknown)
+    "origin_lat", "origin_lng",
+    "dest_lat", "dest_lng",
+    "distance_to_hazard",          # km to nearest storm core, NaN if none
+    "wind_kmh", "wave_height_m",   # current weather at the ship, NaN if unknown
+    "route_km", "remaining_km",    # derived: port to port, position to destination
+)
+
+KM_PER_NAUTICAL_MILE = 1.852
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    """Element-wise great-circle distance between two arrays of points."""
+    chord = np.linalg.norm(to_unit_vectors(lat1, lng1) - to_unit_vectors(lat2, lng2), axis=-1)
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord / 2.0, 1.0))
+
+
+def build_features(rows, coordinates, store=None, weather=None):
+    """
+    Feature arrays for eta_results-style rows (port_from, port_to, latitude,
+    longitude, and optionally distance_to_hazard, wind_kmh, wave_height_m).
+    ``coordinates`` maps a port name to (lat, lng), e.g.
+    ``port_index.coordinates``. Derived distances come from ``store`` (a
+    FeatureStore) when given, which also fills in a missing
+    distance_to_hazard from storm_info. ``weather`` (a WeatherIndex) fills in
+    missing wind_kmh and wave_height_m at each ship's position. Returns the
+    feature dict and a mask of rows with enough data to predict.
+    """
+    n = len(rows)
+    features = {name: np.full(n, np.nan) for name in FEATURES}
+    if n == 0:
+        return features, np.zeros(0, dtype=bool)
+
+    # Built column-wise; None becomes NaN in a float array
+    for name in ("latitude", "longitude", "distance_to_hazard", "wind_kmh", "wave_height_m"):
+        features[name] = np.array([row.get(name) for row in rows], dtype=np.float64)
+
+    # One port lookup per distinct name rather than per row
+    names = {row["port_from"] for row in rows} | {row["port_to"] for row in rows}
+    lookup = {name: coordinates(name) for name in names}
+    origin = np.array([lookup[row["port_from"]] for row in rows], dtype=np.float64)
+    dest = np.array([lookup[row["port_to"]] for row in rows], dtype=np.float64)
+    features["origin_lat"], features["origin_lng"] = origin[:, 0], origin[:, 1]
+    features["dest_lat"], features["dest_lng"] = dest[:, 0], dest[:, 1]
+
+    # Ships without a position are assumed to still be at their origin port
+    unknown = np.isnan(features["latitude"]) | np.isnan(features["longitude"])
+    features["latitude"][unknown] = features["origin_lat"][unknown]
+    features["longitude"][unknown] = features["origin_lng"][unknown]
+
+    valid = ~(np.isnan(features["latitude"]) | np.isnan(features["longitude"])
+              | np.isnan(features["dest_lat"]) | np.isnan(features["dest_lng"]))
+
+    if store is not None:
+        derived = store.derive(rows, features)
+        unknown = np.isnan(features["distance_to_hazard"])
+        features["distance_to_hazard"][unknown] = derived["nearest_storm_km"][unknown]
+    else:
+        derived = {
+            "route_km": distance_km(features["origin_lat"], features["origin_lng"],
+                                    features["dest_lat"], features["dest_lng"]),
+            "remaining_km": distance_km(features["latitude"], features["longitude"],
+                                        features["dest_lat"], features["dest_lng"]),
+        }
+    features["route_km"] = derived["route_km"]
+    features["remaining_km"] = derived["remaining_km"]
+    if weather is not None:
+        weather.fill(features)
+    return features, valid
+
+
+class BaselineModel:
+    """
+    Physics baseline: remaining great-circle distance at a fixed service
+    speed, plus a delay that grows linearly as the ship gets closer to a
+    storm core (``max_hazard_delay_hours`` inside it, none beyond
+    ``hazard_influence_km``). Strong wind and high waves, when known, slow
+    the ship down and add to the delay.
+    """
+
+    name = "baseline"
+
+    def __init__(self, speed_knots=14.0, hazard_influence_km=500.0, max_hazard_delay_hours=12.0):
+        self.speed_kmh = speed_knots * KM_PER_NAUTICAL_MILE
+        self.hazard_influence_km = hazard_influence_km
+        self.max_hazard_delay_hours = max_hazard_delay_hours
+
+    def predict(self, features):
+        remaining = features.get("remaining_km")
+        if remaining is None:
+            remaining = distance_km(features["latitude"], features["longitude"],
+                                    features["dest_lat"], features["dest_lng"])
+        transit = remaining / self.speed_kmh
+        proximity = 1.0 - features["distance_to_hazard"] / self.hazard_influence_km
+        delay = self.max_hazard_delay_hours * np.nan_to_num(np.clip(proximity, 0.0, 1.0))
+
+        # Involuntary speed loss: 1% per km/h of wind above 40, 10% per metre
+        # of sea above 2 m, at most half the service speed
+        loss = (np.nan_to_num(np.clip(features["wind_kmh"] - 40.0, 0.0, None)) * 0.01
+                + np.nan_to_num(np.clip(features["wave_height_m"] - 2.0, 0.0, None)) * 0.10)
+        slowdown = 1.0 / (1.0 - np.minimum(loss, 0.5)) - 1.0
+        return transit, delay + transit * slowdown
+
+
+class StubModel:
+    """
+    Deterministic model for tests and benchmarks: constant transit and delay,
+    with an optional fixed ``latency_ms`` per call to stand in for a real
+    model's per-invocation overhead.
+    """
+
+    name = "stub"
+
+    def __init__(self, transit_hours=24.0, delay_hours=0.0, latency_ms=0.0):
+        self.transit_hours = transit_hours
+        self.delay_hours = delay_hours
+        self.latency_ms = latency_ms
+
+    def predict(self, features):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        n = len(features["latitude"])
+        return np.full(n, self.transit_hours), np.full(n, self.delay_hours)
+
+
+MODELS = {
+    "baseline": BaselineModel,
+    "stub": StubModel,
+}
+
+
+def load_model(spec=None):
+    """Instantiate the model named by ``spec`` (defaults to ETA_MODEL)."""
+    spec = spec or ETA_MODEL
+    if spec in MODELS:
+        return MODELS[spec]()
+    module_name, sep, attr = spec.partition(":")
+    if not sep:
+        raise ValueError(f"Unknown model '{spec}'; use one of {sorted(MODELS)} or 'module:Name'")
+    factory = getattr(importlib.import_module(module_name), attr)
+    return factory()
@@ -0,0 +1,297 @@
+"""
+Batch ETA recompute pipeline.
+
+Reads eta_results in keyset-ordered pages, builds model features (ship
+position, origin/destination port coordinates from the port index, storm
+proximity), runs the ETA model on each page as arrays and writes
+``eta_expected`` / ``delay_hours`` back with one multi-row UPDATE per chunk,
+each chunk in its own transaction. The next page is read while the current
+one is predicted and written.
+
+After every committed page the last key is saved to a checkpoint file, so an
+interrupted run continues where it stopped with ``--resume`` (with the same
+model). Only one run may use a checkpoint file at a time. Finally the
+hazard engine re-derives ship status from the new delays.
+
+    python -m services.eta_pipeline [--resume] [--dry-run] [--model baseline]
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from db.repository import BulkUpdate
+from services.eta_model import build_features, load_model
+from services.feature_store import feature_store
+from services.hazard import recompute_hazards
+from services.port_index import port_index
+from services.weather import weather_index
+
+logger = logging.getLogger(__name__)
+
+ETA_PIPELINE_CHECKPOINT = os.getenv('ETA_PIPELINE_CHECKPOINT', '.eta_pipeline_checkpoint.json')
+
+STAGES = ("read", "features", "predict", "write", "status")
+
+READ_QUERY = """
+    SELECT ship_name, COALESCE(IMO, 0) as imo, port_from, port_to,
+           latitude, longitude, distance_to_hazard
+    FROM eta_results
+    {where}
+    ORDER BY ship_name ASC, COALESCE(IMO, 0) ASC
+    LIMIT %s
+"""
+
+# (eta_expected, delay_hours, ship_name, imo) rows, one statement per chunk
+WRITE = BulkUpdate(
+    "eta_results",
+    columns=("eta_expected", "delay_hours"),
+    keys=("t.ship_name", "COALESCE(t.IMO, 0)"),
+    extra="updated_at = NOW()",
+)
+
+
+class PipelineRun:
+    """Progress and per-stage timings of one pipeline run."""
+
+    def __init__(self, model_name, dry_run=False):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.model_name = model_name
+        self.dry_run = dry_run
+        self.status = "running"
+        self.error = None
+        self.started_at = datetime.now()
+        self.finished_at = None
+        self.resumed_from = None
+        self.pages = 0
+        self.processed = 0
+        self.predicted = 0
+        self.skipped = 0
+        self.written = 0
+        self.after = None
+        self._carried = 0  # rows done by the run this one resumed
+        self._stages = {stage: [0, 0.0] for stage in STAGES}  # rows, seconds
+
+    def resume_from(self, checkpoint):
+        self.after = checkpoint["after"]
+        self.processed = self._carried = checkpoint["processed"]
+        self.written = checkpoint["written"]
+        self.resumed_from = checkpoint["run_id"]
+
+    def record(self, stage, rows, seconds):
+        self._stages[stage][0] += rows
+        self._stages[stage][1] += seconds
+
+    def to_dict(self):
+        elapsed = ((self.finished_at or datetime.now()) - self.started_at).total_seconds()
+        done = self.processed - self._carried
+        return {
+            "run_id": self.run_id,
+            "model": self.model_name,
+            "dry_run": self.dry_run,
+            "status": self.status,
+            "error": self.error,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "elapsed_s": round(elapsed, 3),
+            "resumed_from": self.resumed_from,
+            "pages": self.pages,
+            "processed": self.processed,
+            "predicted": self.predicted,
+            "skipped": self.skipped,
+            "written": self.written,
+            "rows_per_s": round(done / elapsed, 1) if elapsed > 0 else None,
+            "stages": {
+                stage: {
+                    "rows": rows,
+                    "seconds": round(seconds, 3),
+                    "rows_per_s": round(rows / seconds, 1) if seconds > 0 else None,
+                }
+                for stage, (rows, seconds) in self._stages.items()
+            },
+        }
+
+
+def load_checkpoint(path=ETA_PIPELINE_CHECKPOINT):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(run, path=ETA_PIPELINE_CHECKPOINT):
+    # Write-then-rename so a crash never leaves a half-written checkpoint
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "run_id": run.run_id,
+            "model": run.model_name,
+            "after": run.after,
+            "processed": run.processed,
+            "written": run.written,
+            "saved_at": datetime.now().isoformat(),
+        }, f)
+    os.replace(tmp, path)
+
+
+def resume_checkpoint(model_name, path=ETA_PIPELINE_CHECKPOINT):
+    """
+    The checkpoint to resume from, or None if there is none. Raises
+    ValueError if it was written by a different model: the rows before it
+    would keep that model's predictions.
+    """
+    checkpoint = load_checkpoint(path)
+    if checkpoint and checkpoint.get("model") != model_name:
+        raise ValueError(
+            f"Checkpoint {path} was written by model '{checkpoint.get('model')}', not '{model_name}'; "
+            "resume with that model or start a fresh run"
+        )
+    return checkpoint
+
+
+def clear_checkpoint(path=ETA_PIPELINE_CHECKPOINT):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def _read_page(repo, run, after, page_size):
+    started = time.perf_counter()
+    if after is None:
+        query, params = READ_QUERY.format(where=""), (page_size,)
+    else:
+        query = READ_QUERY.format(
+            where="WHERE ship_name > %s OR (ship_name = %s AND COALESCE(IMO, 0) > %s)"
+        )
+        params = (after[0], after[0], after[1], page_size)
+    rows = await repo.fetch_all(query, params)
+    run.record("read", len(rows), time.perf_counter() - started)
+    return rows
+
+
+def _predict_page(model, rows, run):
+    """Features + model for one page; returns the UPDATE parameter rows."""
+    started = time.perf_counter()
+    features, valid = build_features(rows, port_index.coordinates, feature_store, weather_index)
+    features = {name: values[valid] for name, values in features.items()}
+    run.record("features", len(rows), time.perf_counter() - started)
+
+    started = time.perf_counter()
+    transit, delay = model.predict(features)
+    transit, delay = np.asarray(transit, dtype=np.float64), np.asarray(delay, dtype=np.float64)
+    run.record("predict", int(valid.sum()), time.perf_counter() - started)
+
+    now = datetime.now().replace(microsecond=0)
+    updates = []
+    for i, hours, extra in zip(np.flatnonzero(valid).tolist(), transit.tolist(), delay.tolist()):
+        row = rows[i]
+        eta = now + timedelta(hours=hours + extra)
+        updates.append((eta.replace(microsecond=0), round(extra, 2), row["ship_name"], row["imo"]))
+    return updates
+
+
+async def run_pipeline(repo, model=None, run=None, page_size=5000, chunk_size=1000,
+                       dry_run=False, resume=False, update_status=True,
+                       checkpoint_path=ETA_PIPELINE_CHECKPOINT):
+    """
+    Recompute ETA and delay for every ship in eta_results. Returns the
+    finished ``PipelineRun``; pass ``run`` to observe progress while it runs.
+    """
+    model = model or load_model()
+    run = run or PipelineRun(getattr(model, "name", type(model).__name__), dry_run)
+    loop = asyncio.get_running_loop()
+
+    checkpoint = resume_checkpoint(run.model_name, checkpoint_path) if resume else None
+    if checkpoint:
+        run.resume_from(checkpoint)
+        logger.info(f"Resuming ETA pipeline after {run.after} ({run.processed} rows done)")
+
+    try:
+        await port_index.ensure_loaded(repo)
+        await feature_store.refresh_storms(repo)
+        rows = await _read_page(repo, run, run.after, page_size)
+        while rows:
+            last = rows[-1]
+            next_key = [last["ship_name"], int(last["imo"])]
+            # Overlap reading the next page with predicting/writing this one
+            next_page = asyncio.ensure_future(_read_page(repo, run, next_key, page_size))
+            try:
+                updates = await loop.run_in_executor(None, _predict_page, model, rows, run)
+                if updates and not dry_run:
+                    started = time.perf_counter()
+                    run.written += await repo.update_many(WRITE, updates, chunk_size=chunk_size)
+                    run.record("write", len(updates), time.perf_counter() - started)
+            except BaseException:
+                next_page.cancel()
+                raise
+
+            run.pages += 1
+            run.processed += len(rows)
+            run.predicted += len(updates)
+            run.skipped += len(rows) - len(updates)
+            run.after = next_key
+            if not dry_run:
+                save_checkpoint(run, checkpoint_path)
+            rows = await next_page
+
+        if update_status and not dry_run:
+            started = time.perf_counter()
+            summary = await recompute_hazards(repo)
+            run.record("status", summary["ships"], time.perf_counter() - started)
+
+        if not dry_run:
+            clear_checkpoint(checkpoint_path)
+        run.status = "completed"
+    except BaseException as e:
+        run.status = "failed"
+        run.error = str(e) or type(e).__name__
+        raise
+    finally:
+        run.finished_at = datetime.now()
+        logger.info(f"ETA pipeline {run.run_id} {run.status}: {run.processed} rows, {run.written} written")
+    return run
+
+
+def main():
+    import argparse
+
+    from db.database import close_pool, init_pool
+    from db.repository import close_repository, init_repository
+
+    parser = argparse.ArgumentParser(description="Recompute ETA and delay for all ships in eta_results.")
+    parser.add_argument("--model", default=None, help="'baseline' or 'module:Name' (default: ETA_MODEL)")
+    parser.add_argument("--page-size", type=int, default=5000, help="rows read and predicted per page")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="rows per write transaction")
+    parser.add_argument("--resume", action="store_true", help="continue from the last checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="compute but do not write back")
+    parser.add_argument("--skip-status", action="store_true", help="do not re-derive status afterwards")
+    parser.add_argument("--checkpoint", default=ETA_PIPELINE_CHECKPOINT)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def run():
+        init_pool()
+        try:
+            result = await run_pipeline(
+                init_repository(), load_model(args.model),
+                page_size=args.page_size, chunk_size=args.chunk_size, dry_run=args.dry_run,
+                resume=args.resume, update_status=not args.skip_status,
+                checkpoint_path=args.checkpoint
+            )
+            return result.to_dict()
+        finally:
+            close_repository()
+            close_pool()
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
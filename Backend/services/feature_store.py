@@ -0,0 +1,248 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from services.eta_model import distance_km
+from services.hazard import assess, great_circle_km, to_unit_vectors
+from services.port_index import normalize_port_name, port_index
+
+logger = logging.getLogger(__name__)
+
+# Per-ship entries kept in the LRU, and seconds between storm_info reloads
+FEATURE_CACHE_SIZE = int(os.getenv('FEATURE_CACHE_SIZE', '200000'))
+FEATURE_STORM_TTL = float(os.getenv('FEATURE_STORM_TTL', '30'))
+
+STORMS_QUERY = """
+    SELECT id, latitude, longitude, radius_km, warning_radius_km
+    FROM storm_info
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL AND radius_km IS NOT NULL
+"""
+
+# Per-ship cache entry layout (a list keeps the footprint small)
+_PORT_VERSION, _REMAINING_KM, _STORM_VERSION, _STORM_KM = range(4)
+
+
+class PortDistanceTable:
+    """Great-circle distances between every pair of sea_ports, as one matrix."""
+
+    def __init__(self, ports, version):
+        self.version = version
+        self.index = {}
+        lats, lngs = [], []
+        for port in ports:
+            key = normalize_port_name(port["name"])
+            if key is None or key in self.index or port["latitude"] is None or port["longitude"] is None:
+                continue
+            self.index[key] = len(lats)
+            lats.append(float(port["latitude"]))
+            lngs.append(float(port["longitude"]))
+        vectors = to_unit_vectors(lats, lngs).reshape(-1, 3)
+        self.matrix = great_circle_km(vectors, vectors)
+
+    def lookup(self, origins, destinations):
+        """Distances for parallel lists of port names; NaN where either is unknown."""
+        index = self.index
+        lookup = {name: index.get(normalize_port_name(name), -1) for name in set(origins) | set(destinations)}
+        i = np.array([lookup[name] for name in origins], dtype=np.int64)
+        j = np.array([lookup[name] for name in destinations], dtype=np.int64)
+        known = (i >= 0) & (j >= 0)
+        distances = np.full(len(i), np.nan)
+        distances[known] = self.matrix[i[known], j[known]]
+        return distances
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes
+
+
+class FeatureStore:
+    """
+    Cache of derived model features.
+
+    ``route_km`` (port to port) comes from a PortDistanceTable rebuilt when
+    the port index version changes. ``remaining_km`` (position to
+    destination) and the nearest storm distance are cached per ship in an
+    LRU keyed by (ship, snapshot), where the snapshot is the position and
+    destination the row was computed for. Each cached piece records the port
+    or storm version it was derived from, so a storm update recomputes only
+    storm distances and leaves remaining distances alone.
+
+    Thread-safe: derivations run on executor threads.
+    """
+
+    def __init__(self, max_entries=FEATURE_CACHE_SIZE, storm_ttl=FEATURE_STORM_TTL):
+        self.max_entries = max_entries
+        self.storm_ttl = storm_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._table = None
+        self._storms = None        # (lat, lng, radius, warning) arrays
+        self._storm_digest = None
+        self.storm_version = 0
+        self._storms_loaded_at = 0.0
+        self._storm_lock = None
+
+        self._remaining_hits = 0
+        self._remaining_misses = 0
+        self._storm_hits = 0
+        self._storm_misses = 0
+        self._evictions = 0
+        self._table_builds = 0
+
+    async def refresh_storms(self, repo, force=False):
+        """Reload storm_info when older than ``storm_ttl`` seconds."""
+        if not force and time.monotonic() - self._storms_loaded_at < self.storm_ttl:
+            return
+        if self._storm_lock is None:
+            self._storm_lock = asyncio.Lock()
+        async with self._storm_lock:
+            if not force and time.monotonic() - self._storms_loaded_at < self.storm_ttl:
+                return
+            self.set_storms(await repo.fetch_all(STORMS_QUERY))
+            self._storms_loaded_at = time.monotonic()
+
+    def set_storms(self, rows):
+        """Replace the storm set; cached storm distances go stale only if it changed."""
+        digest = hashlib.blake2b(repr(rows).encode("utf-8"), digest_size=16).hexdigest()
+        if digest == self._storm_digest:
+            return
+        columns = [
+            np.array([np.nan if row[name] is None else float(row[name]) for row in rows], dtype=np.float64)
+            for name in ("latitude", "longitude", "radius_km", "warning_radius_km")
+        ]
+        with self._lock:
+            self._storms = tuple(columns)
+            self._storm_digest = digest
+            self.storm_version += 1
+
+    def port_table(self):
+        table = self._table
+        if table is None or table.version != port_index.version:
+            table = PortDistanceTable(port_index.ports, port_index.version)
+            self._table = table
+            self._table_builds += 1
+        return table
+
+    def derive(self, rows, features):
+        """
+        Derived features for ``rows``, whose raw arrays (position and
+        destination coordinates) are already in ``features``. Returns
+        ``route_km``, ``remaining_km`` and ``nearest_storm_km`` arrays.
+        """
+        n = len(rows)
+        route = self.port_table().lookup([row["port_from"] for row in rows], [row["port_to"] for row in rows])
+        remaining = np.full(n, np.nan)
+        storm_km = np.full(n, np.nan)
+        lat, lng = features["latitude"], features["longitude"]
+
+        lat_values, lng_values = lat.tolist(), lng.tolist()
+        entries = {}
+        hit_remaining, hit_storm = [], []
+        need_remaining, need_storm = [], []
+        with self._lock:
+            port_version, storm_version, storms = port_index.version, self.storm_version, self._storms
+            get, touch = self._entries.get, self._entries.move_to_end
+            for i, row in enumerate(rows):
+                y, x = lat_values[i], lng_values[i]
+                if y != y or x != x:
+                    continue  # NaN: nothing to derive or cache without a position
+                key = (row.get("imo") or row.get("ship_name"), y, x, row["port_to"])
+                entry = get(key)
+                if entry is None:
+                    entry = [None, None, None, None]
+                    self._entries[key] = entry
+                else:
+                    touch(key)
+                entries[i] = entry
+                if entry[_PORT_VERSION] == port_version:
+                    hit_remaining.append(i)
+                else:
+                    need_remaining.append(i)
+                if entry[_STORM_VERSION] == storm_version:
+                    hit_storm.append(i)
+                else:
+                    need_storm.append(i)
+
+            self._remaining_hits += len(hit_remaining)
+            self._remaining_misses += len(need_remaining)
+            self._storm_hits += len(hit_storm)
+            self._storm_misses += len(need_storm)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+            if hit_remaining:
+                remaining[hit_remaining] = [entries[i][_REMAINING_KM] for i in hit_remaining]
+            if hit_storm:
+                storm_km[hit_storm] = [entries[i][_STORM_KM] for i in hit_storm]
+
+        # Misses are computed outside the lock, vectorized over the subset
+        if need_remaining:
+            idx = np.array(need_remaining)
+            remaining[idx] = distance_km(lat[idx], lng[idx], features["dest_lat"][idx], features["dest_lng"][idx])
+        if need_storm:
+            idx = np.array(need_storm)
+            if storms is not None and storms[0].size:
+                storm_km[idx] = assess(lat[idx], lng[idx], *storms).distance_to_hazard
+
+        # Written back under the lock, value before version, so a reader
+        # never sees a version whose value is not there yet
+        if need_remaining or need_storm:
+            with self._lock:
+                for i, value in zip(need_remaining, remaining[need_remaining].tolist()):
+                    entry = entries[i]
+                    entry[_REMAINING_KM] = value
+                    entry[_PORT_VERSION] = port_version
+                for i, value in zip(need_storm, storm_km[need_storm].tolist()):
+                    entry = entries[i]
+                    entry[_STORM_KM] = value
+                    entry[_STORM_VERSION] = storm_version
+
+        return {"route_km": route, "remaining_km": remaining, "nearest_storm_km": storm_km}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def memory_bytes(self):
+        """Approximate memory held by the cache (entries and distance table)."""
+        with self._lock:
+            count = len(self._entries)
+            sample = next(iter(self._entries.items()), None)
+        per_entry = 0
+        if sample is not None:
+            key, entry = sample
+            per_entry = (sys.getsizeof(key) + sum(sys.getsizeof(part) for part in key)
+                         + sys.getsizeof(entry) + sum(sys.getsizeof(part) for part in entry)
+                         + 100)  # OrderedDict slot and link overhead
+        table = self._table.nbytes if self._table is not None else 0
+        return count * per_entry + table
+
+    def stats(self):
+        remaining = self._remaining_hits + self._remaining_misses
+        storms = self._storm_hits + self._storm_misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "evictions": self._evictions,
+            "port_pairs": len(self._table.index) ** 2 if self._table is not None else 0,
+            "port_table_builds": self._table_builds,
+            "storm_version": self.storm_version,
+            "remaining_hit_ratio": round(self._remaining_hits / remaining, 4) if remaining else None,
+            "storm_hit_ratio": round(self._storm_hits / storms, 4) if storms else None,
+            "remaining_hits": self._remaining_hits,
+            "remaining_misses": self._remaining_misses,
+            "storm_hits": self._storm_hits,
+            "storm_misses": self._storm_misses,
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+feature_store = FeatureStore()
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from services.fleet_store import FleetColumns
+
+logger = logging.getLogger(__name__)
+
+# Seconds between background syncs, minimum gap between on-demand syncs,
+# seconds of updated_at overlap re-read on each delta, and seconds between
+# full reloads (a safety net for writes the high-water mark cannot see)
+FLEET_STATE_INTERVAL = float(os.getenv('FLEET_STATE_INTERVAL', '5'))
+FLEET_STATE_MIN_INTERVAL = float(os.getenv('FLEET_STATE_MIN_INTERVAL', '1'))
+FLEET_STATE_OVERLAP = float(os.getenv('FLEET_STATE_OVERLAP', '5'))
+FLEET_STATE_RESYNC = float(os.getenv('FLEET_STATE_RESYNC', '300'))
+
+FLEET_QUERY = """
+    SELECT IMO as imo, ship_name, port_from, port_to, eta_expected, delay_hours,
+           status, reason, distance_to_hazard, latitude, longitude, updated_at
+    FROM eta_results
+"""
+
+FINGERPRINT_QUERY = """
+    SELECT COUNT(*) AS row_count, MAX(updated_at) AS last_updated, NOW() AS db_now
+    FROM eta_results
+"""
+
+
+def fleet_key(row):
+    """(ship_name, IMO) identifies an eta_results row; IMO may be NULL."""
+    name = row["ship_name"]
+    # Interned, so keys share the name stored in the ship string table
+    return (sys.intern(name) if isinstance(name, str) else name, int(row["imo"] or 0))
+
+
+class FleetState:
+    """
+    In-memory copy of eta_results (stored column-wise, see
+    ``services.fleet_store``), kept current incrementally.
+
+    A sync reads the table fingerprint (row count and ``MAX(updated_at)``)
+    and, if it moved, fetches only rows with ``updated_at`` at or after the
+    high-water mark (minus a small overlap for rows committed late with an
+    earlier timestamp) and merges them. If the merged row count disagrees
+    with the table, rows were deleted or written without a timestamp, and
+    the state is reloaded in full; it is also reloaded every
+    ``resync_interval`` seconds.
+
+    Listeners registered with ``on_change`` receive the changed and removed
+    keys after every sync that changed something, so derived views can be
+    updated in O(changes).
+    """
+
+    def __init__(self, interval=FLEET_STATE_INTERVAL, min_interval=FLEET_STATE_MIN_INTERVAL,
+                 overlap=FLEET_STATE_OVERLAP, resync_interval=FLEET_STATE_RESYNC):
+        self.interval = interval
+        self.min_interval = min_interval
+        self.overlap = timedelta(seconds=overlap)
+        self.resync_interval = resync_interval
+        self.columns = FleetColumns()
+        self.version = 0
+        self.high_water = None
+        self._fingerprint = None
+        self._duplicates = 0    # table rows sharing a key with another row
+        self._clock_offset = timedelta(0)
+        self._synced_at = 0.0
+        self._full_at = 0.0
+        self._loaded = False
+        self._listeners = []
+        self._lock = None
+        self._task = None
+
+        self._syncs = 0
+        self._deltas = 0
+        self._full_loads = 0
+        self._rows_fetched = 0
+        self._rows_changed = 0
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def __len__(self):
+        return len(self.columns)
+
+    def keys(self):
+        return self.columns.slots.keys()
+
+    def row(self, key):
+        """The current row for a fleet key as a dict, or None."""
+        return self.columns.row(key)
+
+    def on_change(self, callback):
+        self._listeners.append(callback)
+
+    def db_now(self):
+        """Current time on the database clock (as of the last sync)."""
+        return datetime.now() + self._clock_offset
+
+    async def ensure_loaded(self, repo):
+        if not self._loaded:
+            await self.sync(repo)
+
+    def _fresh(self, max_age):
+        if max_age is None:
+            max_age = self.min_interval
+        return self._loaded and time.monotonic() - self._synced_at < max_age
+
+    async def sync(self, repo, max_age=None, force_full=False):
+        """
+        Bring the state up to date unless it was synced less than ``max_age``
+        seconds ago (default ``min_interval``; 0 after a write that must be
+        seen). Concurrent callers share one sync. Returns True if any row
+        changed.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        if not force_full and self._fresh(max_age):
+            return False
+        async with self._lock:
+            if not force_full and self._fresh(max_age):
+                return False
+            return await self._sync(repo, force_full)
+
+    async def _sync(self, repo, force_full):
+        self._syncs += 1
+        started = time.monotonic()
+        fingerprint = await repo.fetch_one(FINGERPRINT_QUERY)
+        db_now = fingerprint.get("db_now")
+        if db_now is not None:
+            self._clock_offset = db_now - datetime.now()
+        count, last_updated = fingerprint["row_count"], fingerprint["last_updated"]
+
+        full = (force_full or not self._loaded
+                or started - self._full_at >= self.resync_interval)
+        # updated_at has one-second resolution, so a write in the same second
+        # as the last one leaves the fingerprint unchanged; recent maxima are
+        # always re-read.
+        settled = last_updated is None or db_now is None or db_now - last_updated > self.overlap
+        if not full and (count, last_updated) == self._fingerprint and settled:
+            self._synced_at = started
+            return False
+
+        changed, removed = set(), set()
+        if not full:
+            since = self.high_water - self.overlap if self.high_water is not None else None
+            if since is None:
+                full = True
+            else:
+                rows = await repo.fetch_all(FLEET_QUERY + " WHERE updated_at >= %s", (since,))
+                self._deltas += 1
+                self._merge(rows, changed)
+                # Deletions (and rows without updated_at) are invisible to the delta
+                full = len(self.columns) + self._duplicates != count
+
+        if full:
+            rows = await repo.fetch_all(FLEET_QUERY)
+            self._full_loads += 1
+            self._full_at = started
+            seen = self._merge(rows, changed)
+            self._duplicates = len(rows) - len(seen)
+            removed = set(self.columns.slots) - seen
+            for key in removed:
+                self.columns.remove(key)
+            changed -= removed
+
+        self._fingerprint = (count, last_updated)
+        self._synced_at = started
+        self._loaded = True
+        if changed or removed:
+            self.version += 1
+            self._rows_changed += len(changed) + len(removed)
+            for callback in self._listeners:
+                try:
+                    callback(changed, removed)
+                except Exception as e:
+                    logger.error(f"Fleet state listener failed: {str(e)}")
+            return True
+        return False
+
+    def _merge(self, rows, changed):
+        self._rows_fetched += len(rows)
+        keys = [fleet_key(row) for row in rows]
+        changed.update(self.columns.put_many(keys, rows))
+        updated = [row["updated_at"] for row in rows if row["updated_at"] is not None]
+        if updated:
+            latest = max(updated)
+            if self.high_water is None or latest > self.high_water:
+                self.high_water = latest
+        return set(keys)
+
+    def start(self, repo):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run(repo))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {
+            "rows": len(self.columns),
+            "duplicate_keys": self._duplicates,
+            "version": self.version,
+            "high_water": self.high_water.isoformat() if isinstance(self.high_water, datetime) else self.high_water,
+            "syncs": self._syncs,
+            "delta_syncs": self._deltas,
+            "full_loads": self._full_loads,
+            "rows_fetched": self._rows_fetched,
+            "rows_changed": self._rows_changed,
+            "memory_bytes": self.columns.nbytes(),
+        }
+
+    async def _run(self, repo):
+        while True:
+            try:
+                await self.sync(repo)
+            except Exception as e:
+                logger.error(f"Fleet state sync failed: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+
+fleet_state = FleetState()
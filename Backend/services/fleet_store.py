@@ -0,0 +1,347 @@
+"""
+Columnar storage and JSON encoding for the in-memory fleet state.
+
+Each eta_results row lives in a slot of per-column NumPy arrays: floats
+(NaN for NULL), ``datetime64`` timestamps (NaT for NULL), the IMO as int64
+(0 for NULL) and int32 codes into interned string tables, so a ship costs a
+few dozen bytes of arrays instead of a dict of Python objects.
+
+Routes serialize straight from the columns with a ``RowEncoder``: a list of
+``(json_key, field)`` pairs where each field encodes the values of many
+slots at once into JSON fragments. Encoded rows are cached per slot and only
+re-encoded when their row changes, so a full list response is one join.
+"""
+import json
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+
+FLOAT_COLUMNS = ("delay_hours", "distance_to_hazard", "latitude", "longitude")
+DATETIME_COLUMNS = ("eta_expected", "updated_at")
+# Column -> string table; origin and destination share the port table
+STRING_COLUMNS = {
+    "ship_name": "ships",
+    "port_from": "ports",
+    "port_to": "ports",
+    "status": "statuses",
+    "reason": "reasons",
+}
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_NAT = np.iinfo(np.int64).min
+
+
+def _datetimes(values):
+    """datetime64[us] array of naive datetimes (None becomes NaT)."""
+    # Several times faster than np.array(values, dtype="datetime64[us]")
+    micros = [_NAT if value is None else (value - _EPOCH) // _MICROSECOND for value in values]
+    return np.array(micros, dtype=np.int64).view("datetime64[us]")
+
+
+class StringTable:
+    """Interned strings referenced by int32 codes; code 0 is None."""
+
+    def __init__(self):
+        self.values = [None]
+        self.codes = {}
+        self._fragments = np.array(["null"], dtype=object)
+        self._rank = None
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def encode(self, values):
+        codes = self.codes
+        result = [0 if value is None else codes.get(value) for value in values]
+        if None in result:
+            for i, code in enumerate(result):
+                if code is None:
+                    value = values[i]
+                    code = codes.get(value)
+                    if code is None:
+                        code = codes[value] = len(self.values)
+                        # One stored copy is shared by every row with this value
+                        self.values.append(sys.intern(value) if isinstance(value, str) else value)
+                        self._bytes += sys.getsizeof(value)
+                    result[i] = code
+            self._rank = None
+        return np.array(result, dtype=np.int32)
+
+    def fragments(self, null="null"):
+        """JSON fragment per code, with ``null`` standing in for None."""
+        known = self._fragments.shape[0]
+        if known < len(self.values):
+            extra = [json.dumps(value, ensure_ascii=False) for value in self.values[known:]]
+            self._bytes += sum(sys.getsizeof(fragment) for fragment in extra)
+            self._fragments = np.concatenate((self._fragments, np.array(extra, dtype=object)))
+        if null == "null":
+            return self._fragments
+        fragments = self._fragments.copy()
+        fragments[0] = null
+        return fragments
+
+    def rank(self):
+        """Sort position of each code, case-insensitively (None first)."""
+        if self._rank is None or self._rank.shape[0] != len(self.values):
+            order = sorted(range(1, len(self.values)), key=lambda code: (str(self.values[code]).casefold(), code))
+            rank = np.zeros(len(self.values), dtype=np.int64)
+            rank[order] = np.arange(1, len(order) + 1)
+            self._rank = rank
+        return self._rank
+
+    def nbytes(self):
+        return (self._bytes + sys.getsizeof(self.values) + sys.getsizeof(self.codes)
+                + self._fragments.nbytes)
+
+
+class FleetColumns:
+    """eta_results rows as slots of NumPy columns, keyed by fleet key."""
+
+    def __init__(self, capacity=1024):
+        self.slots = {}     # fleet key -> slot
+        self.keys = []      # slot -> fleet key, None when free
+        self._free = []
+        self.tables = {name: StringTable() for name in set(STRING_COLUMNS.values())}
+        self.live = np.zeros(capacity, dtype=bool)
+        self.imo = np.zeros(capacity, dtype=np.int64)
+        self.floats = {name: np.full(capacity, np.nan) for name in FLOAT_COLUMNS}
+        self.dates = {name: np.full(capacity, np.datetime64("NaT"), dtype="datetime64[us]")
+                      for name in DATETIME_COLUMNS}
+        self.codes = {name: np.zeros(capacity, dtype=np.int32) for name in STRING_COLUMNS}
+
+    def __len__(self):
+        return len(self.slots)
+
+    @property
+    def capacity(self):
+        return self.live.shape[0]
+
+    def table(self, column):
+        return self.tables[STRING_COLUMNS[column]]
+
+    def live_slots(self):
+        return np.flatnonzero(self.live[:len(self.keys)])
+
+    def put_many(self, keys, rows):
+        """
+        Store ``rows`` under ``keys`` (later duplicates win) and return the
+        keys whose stored values changed, including new keys.
+        """
+        latest = {key: i for i, key in enumerate(keys)}
+        if len(latest) < len(keys):
+            keys = list(latest)
+            rows = [rows[i] for i in latest.values()]
+        if not rows:
+            return []
+
+        new = np.array([key not in self.slots for key in keys], dtype=bool)
+        slots = np.array([self.slots[key] if key in self.slots else self._allocate(key) for key in keys],
+                         dtype=np.int64)
+        changed = new.copy()
+
+        def store(column, values, equal):
+            current = column[slots]
+            changed[~equal(current, values)] = True
+            column[slots] = values
+
+        store(self.imo, np.array([row["imo"] or 0 for row in rows], dtype=np.int64), np.equal)
+        for name in FLOAT_COLUMNS:
+            values = np.array([row[name] for row in rows], dtype=np.float64)
+            store(self.floats[name], values, _same_float)
+        for name in DATETIME_COLUMNS:
+            values = _datetimes([row[name] for row in rows])
+            store(self.dates[name], values, _same_datetime)
+        for name in STRING_COLUMNS:
+            values = self.table(name).encode([row[name] for row in rows])
+            store(self.codes[name], values, np.equal)
+        self.live[slots] = True
+        return [keys[i] for i in np.flatnonzero(changed).tolist()]
+
+    def remove(self, key):
+        slot = self.slots.pop(key, None)
+        if slot is not None:
+            self.live[slot] = False
+            self.keys[slot] = None
+            self._free.append(slot)
+
+    def values(self, column, slots):
+        """Python values of ``column`` for ``slots`` (None for NULL)."""
+        if column == "imo":
+            return [value or None for value in self.imo[slots].tolist()]
+        if column in FLOAT_COLUMNS:
+            return [None if value != value else value for value in self.floats[column][slots].tolist()]
+        if column in DATETIME_COLUMNS:
+            # datetime64[us] converts to datetime (NaT to None)
+            return self.dates[column][slots].tolist()
+        table = self.table(column).values
+        return [table[code] for code in self.codes[column][slots].tolist()]
+
+    def row(self, key):
+        """The stored row for ``key`` as a dict, or None."""
+        slot = self.slots.get(key)
+        if slot is None:
+            return None
+        slots = np.array([slot])
+        columns = ("imo",) + FLOAT_COLUMNS + DATETIME_COLUMNS + tuple(STRING_COLUMNS)
+        return {name: self.values(name, slots)[0] for name in columns}
+
+    def nbytes(self):
+        """Approximate memory held by the columns, string tables and key map."""
+        arrays = (self.live.nbytes + self.imo.nbytes
+                  + sum(a.nbytes for a in self.floats.values())
+                  + sum(a.nbytes for a in self.dates.values())
+                  + sum(a.nbytes for a in self.codes.values()))
+        keys = sys.getsizeof(self.slots) + sys.getsizeof(self.keys)
+        sample = next(iter(self.slots), None)
+        if sample is not None:
+            # Key tuples; their names are shared with the ship table
+            keys += len(self.slots) * (sys.getsizeof(sample) + sys.getsizeof(sample[1]))
+        return arrays + keys + sum(table.nbytes() for table in self.tables.values())
+
+    def _allocate(self, key):
+        if self._free:
+            slot = self._free.pop()
+            self.keys[slot] = key
+        else:
+            slot = len(self.keys)
+            if slot == self.capacity:
+                self._grow()
+            self.keys.append(key)
+        self.slots[key] = slot
+        return slot
+
+    def _grow(self):
+        def double(array, fill):
+            return np.concatenate((array, np.full_like(array, fill)))
+        self.live = double(self.live, False)
+        self.imo = double(self.imo, 0)
+        self.floats = {name: double(a, np.nan) for name, a in self.floats.items()}
+        self.dates = {name: double(a, np.datetime64("NaT")) for name, a in self.dates.items()}
+        self.codes = {name: double(a, 0) for name, a in self.codes.items()}
+
+
+def _same_float(a, b):
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+def _same_datetime(a, b):
+    return (a == b) | (np.isnat(a) & np.isnat(b))
+
+
+# Fields: callables (columns, slots) -> list of JSON fragments, one per slot
+
+def float_field(column, null="null"):
+    def encode(columns, slots):
+        values = columns.floats[column][slots]
+        fragments = list(map(repr, values.tolist()))
+        for i in np.flatnonzero(~np.isfinite(values)).tolist():
+            fragments[i] = null
+        return fragments
+    return encode
+
+
+def imo_field(columns, slots):
+    return ["null" if value == 0 else str(value) for value in columns.imo[slots].tolist()]
+
+
+def string_field(column, null="null"):
+    def encode(columns, slots):
+        return columns.table(column).fragments(null)[columns.codes[column][slots]].tolist()
+    return encode
+
+
+def datetime_field(column):
+    """ISO 8601 to the second, like ``DATE_FORMAT(.., '%Y-%m-%dT%T')``."""
+    def encode(columns, slots):
+        values = columns.dates[column][slots]
+        text = np.datetime_as_string(values, unit="s").tolist()
+        missing = np.isnat(values)
+        return ["null" if missing[i] else '"' + value + '"' for i, value in enumerate(text)]
+    return encode
+
+
+def mapped_field(column, fn):
+    """
+    JSON fragment of ``fn(value)`` for a string column, computed once per
+    distinct value; meant for small tables such as ports.
+    """
+    def encode(columns, slots):
+        table = columns.table(column)
+        fragments = np.array([json.dumps(fn(value)) for value in table.values], dtype=object)
+        return fragments[columns.codes[column][slots]].tolist()
+    return encode
+
+
+class RowEncoder:
+    """
+    JSON objects for fleet rows built from ``fields``, a sequence of
+    ``(json_key, field)``. Encoded rows are cached per slot and refreshed
+    for the keys a FleetState reports as changed; when ``version`` (e.g. the
+    port index version, for fields that depend on it) moves, every row is
+    re-encoded.
+    """
+
+    def __init__(self, state, fields, version=None):
+        self.state = state
+        self.fields = tuple(fields)
+        self.version = version
+        self._built_for = None
+        self._fragments = np.empty(0, dtype=object)
+        self._pending = set()
+        self._stale = True
+        state.on_change(self._changed)
+
+    def _changed(self, changed, removed):
+        if not self._stale:
+            slots = self.state.columns.slots
+            self._pending.update(slots[key] for key in changed)
+
+    def encode_slots(self, slots, fields=None):
+        """Encode ``slots`` to UTF-8 now (no caching); ``fields`` picks a subset of keys, in order."""
+        columns = self.state.columns
+        specs = dict(self.fields)
+        names = list(dict.fromkeys(fields)) if fields is not None else [name for name, _ in self.fields]
+        template = "{" + ",".join('"%s":%%s' % name for name in names) + "}"
+        parts = [specs[name](columns, slots) for name in names]
+        return [(template % values).encode("utf-8") for values in zip(*parts)]
+
+    def fragments(self):
+        """Encoded row per slot, brought up to date."""
+        columns = self.state.columns
+        version = self.version() if self.version else None
+        if version != self._built_for:
+            self._stale = True
+        if self._fragments.shape[0] < columns.capacity:
+            grown = np.empty(columns.capacity, dtype=object)
+            grown[:self._fragments.shape[0]] = self._fragments
+            self._fragments = grown
+        if self._stale:
+            slots = columns.live_slots()
+            self._built_for = version
+            self._stale = False
+            self._pending.clear()
+        elif self._pending:
+            slots = np.array(sorted(self._pending), dtype=np.int64)
+            slots = slots[columns.live[slots]]
+            self._pending.clear()
+        else:
+            return self._fragments
+        self._fragments[slots] = self.encode_slots(slots)
+        return self._fragments
+
+    def nbytes(self):
+        """Approximate memory held by the cached row fragments."""
+        fragments = self._fragments[self.state.columns.live_slots()].tolist()
+        return self._fragments.nbytes + sum(sys.getsizeof(fragment) for fragment in fragments if fragment)
+
+    def encode(self, order, fields=None):
+        """A JSON array of the rows at ``order`` (slots), as UTF-8 bytes."""
+        if fields is None:
+            rows = self.fragments()[order].tolist()
+        else:
+            rows = self.encode_slots(order, fields)
+        return b"[" + b",".join(rows) + b"]"
@@ -0,0 +1,247 @@
+"""
+Storm-hazard proximity engine.
+
+Computes the great-circle distance from every ship in eta_results to every
+storm in storm_info, picks each ship's nearest hazard and derives
+``distance_to_hazard``, inside-core / inside-warning flags and the ship
+status. Ships are processed in batches so the ships x storms matrix never
+exceeds ``batch_size`` rows at a time.
+
+Run once from the command line (writes results back to eta_results):
+
+    python -m services.hazard [--dry-run]
+"""
+import asyncio
+import functools
+import logging
+from typing import NamedTuple
+
+import numpy as np
+
+from db.repository import BulkUpdate
+from services.fleet_state import fleet_state
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Ship statuses, in increasing order of severity (matches get_ship_eta)
+STATUS_ACTIVE = "active"
+STATUS_WARNING = "warning"
+STATUS_INACTIVE = "inactive"
+
+# Delay thresholds (hours) used by get_ship_eta to derive status
+WARNING_DELAY_HOURS = 0
+INACTIVE_DELAY_HOURS = 4
+
+
+class HazardAssessment(NamedTuple):
+    """Per-ship nearest-hazard results; all arrays have one entry per ship."""
+    nearest_storm: np.ndarray     # index into the storm arrays, -1 if no storms
+    distance_km: np.ndarray       # distance to that storm's centre
+    distance_to_hazard: np.ndarray  # distance to the edge of its core (0 inside)
+    inside_core: np.ndarray
+    inside_warning: np.ndarray
+
+
+def to_unit_vectors(lat, lng):
+    """Convert degree coordinates to (n, 3) unit vectors on the sphere."""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lng = np.radians(np.asarray(lng, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack((cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)), axis=-1)
+
+
+def great_circle_km(a_vectors, b_vectors):
+    """Pairwise great-circle distances (km) between two sets of unit vectors."""
+    # Chord length -> central angle is better conditioned than arccos(dot)
+    # for the small distances we care about most.
+    dot = a_vectors @ b_vectors.T
+    chord = np.sqrt(np.clip(2.0 - 2.0 * dot, 0.0, 4.0))
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(chord / 2.0)
+
+
+def assess(ship_lat, ship_lng, storm_lat, storm_lng, radius_km, warning_radius_km, batch_size=8192):
+    """
+    Find each ship's nearest hazard.
+
+    "Nearest" is measured to the edge of a storm's core (distance minus
+    ``radius_km``), so a large storm further away can outrank a small one
+    nearby. Ships with unknown positions (NaN) get no hazard, and storms
+    without a position or radius are never picked.
+    """
+    ship_lat = np.asarray(ship_lat, dtype=np.float64)
+    ship_lng = np.asarray(ship_lng, dtype=np.float64)
+    n = ship_lat.shape[0]
+
+    nearest = np.full(n, -1, dtype=np.int64)
+    distance = np.full(n, np.nan)
+    to_hazard = np.full(n, np.nan)
+    inside_core = np.zeros(n, dtype=bool)
+    inside_warning = np.zeros(n, dtype=bool)
+
+    storm_lat = np.asarray(storm_lat, dtype=np.float64)
+    storm_lng = np.asarray(storm_lng, dtype=np.float64)
+    radius = np.asarray(radius_km, dtype=np.float64)
+    warning_radius = np.asarray(warning_radius_km, dtype=np.float64)
+    # Indices into the caller's storm list of the storms that can be measured
+    usable = np.flatnonzero(np.isfinite(storm_lat) & np.isfinite(storm_lng) & np.isfinite(radius))
+    if n == 0 or usable.size == 0:
+        return HazardAssessment(nearest, distance, to_hazard, inside_core, inside_warning)
+    storm_lat, storm_lng = storm_lat[usable], storm_lng[usable]
+    radius, warning_radius = radius[usable], warning_radius[usable]
+
+    storm_vectors = to_unit_vectors(storm_lat, storm_lng)
+    ship_vectors = to_unit_vectors(ship_lat, ship_lng)
+    known = np.isfinite(ship_lat) & np.isfinite(ship_lng)
+
+    for start in range(0, n, batch_size):
+        stop = min(start + batch_size, n)
+        batch = np.flatnonzero(known[start:stop]) + start
+        if batch.size == 0:
+            continue
+        d = great_circle_km(ship_vectors[batch], storm_vectors)
+        edge = d - radius
+        idx = np.nanargmin(edge, axis=1)
+        rows = np.arange(batch.size)
+        nearest_d = d[rows, idx]
+
+        nearest[batch] = usable[idx]
+        distance[batch] = nearest_d
+        to_hazard[batch] = np.maximum(edge[rows, idx], 0.0)
+        # A ship can sit in one storm's warning zone while another storm's
+        # core edge is closer, so flags look at every storm, not just the nearest.
+        inside_core[batch] = (d <= radius).any(axis=1)
+        inside_warning[batch] = (d <= warning_radius).any(axis=1)
+
+    return HazardAssessment(nearest, distance, to_hazard, inside_core, inside_warning)
+
+
+def derive_status(assessment, delay_hours):
+    """Worst of the hazard status and the delay-based status, per ship."""
+    delay = np.nan_to_num(np.asarray(delay_hours, dtype=np.float64))
+    severity = np.zeros(delay.shape[0], dtype=np.int8)
+    severity[delay > WARNING_DELAY_HOURS] = 1
+    severity[delay > INACTIVE_DELAY_HOURS] = 2
+    severity[assessment.inside_warning] = np.maximum(severity[assessment.inside_warning], 1)
+    severity[assessment.inside_core] = 2
+    labels = np.array([STATUS_ACTIVE, STATUS_WARNING, STATUS_INACTIVE], dtype=object)
+    return labels[severity]
+
+
+CORE_REASON = "Inside core of storm "
+WARNING_REASON = "Inside warning radius of storm "
+
+
+def hazard_reason(assessment, i, storm_names, current=None):
+    """
+    Reason text for ship ``i``. Reasons written by other processes are kept
+    unless the ship is in a hazard; stale hazard reasons are cleared.
+    """
+    storm = assessment.nearest_storm[i]
+    if storm >= 0 and assessment.inside_core[i]:
+        return CORE_REASON + storm_names[storm]
+    if storm >= 0 and assessment.inside_warning[i]:
+        return WARNING_REASON + storm_names[storm]
+    if current and current.startswith((CORE_REASON, WARNING_REASON)):
+        return None
+    return current
+
+
+STORMS_QUERY = """
+    SELECT id, name, latitude, longitude, radius_km, warning_radius_km
+    FROM storm_info
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL AND radius_km IS NOT NULL
+"""
+
+# One multi-row UPDATE per chunk of (distance, status, reason, ship_name, imo) rows
+UPDATE = BulkUpdate(
+    "eta_results",
+    columns=("distance_to_hazard", "status", "reason"),
+    keys=("t.ship_name", "COALESCE(t.IMO, 0)"),
+    extra="updated_at = NOW()",
+)
+
+
+def _column(rows, key):
+    return np.array([np.nan if row[key] is None else float(row[key]) for row in rows], dtype=np.float64)
+
+
+async def recompute_hazards(repo, dry_run=False, batch_size=8192):
+    """
+    Recompute distance_to_hazard, status and hazard reason for every ship and
+    write back the rows whose values changed. Returns a summary dict.
+
+    Ships are read from the fleet state, synced first so that writes made
+    just before (e.g. by the ETA pipeline) are seen.
+    """
+    await fleet_state.sync(repo, max_age=0)
+    columns = fleet_state.columns
+    slots = columns.live_slots()
+    keys = [columns.keys[slot] for slot in slots.tolist()]
+    storms = await repo.fetch_all(STORMS_QUERY)
+
+    # CPU-bound; keep it off the event loop
+    assessment = await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+        assess,
+        columns.floats["latitude"][slots], columns.floats["longitude"][slots],
+        _column(storms, "latitude"), _column(storms, "longitude"),
+        _column(storms, "radius_km"), _column(storms, "warning_radius_km"),
+        batch_size=batch_size
+    ))
+    statuses = derive_status(assessment, columns.floats["delay_hours"][slots])
+    storm_names = [storm["name"] for storm in storms]
+    current_distances = columns.values("distance_to_hazard", slots)
+    current_statuses = columns.values("status", slots)
+    current_reasons = columns.values("reason", slots)
+
+    updates = []
+    for i, key in enumerate(keys):
+        distance = assessment.distance_to_hazard[i]
+        distance = None if np.isnan(distance) else round(float(distance), 2)
+        status = statuses[i]
+        reason = hazard_reason(assessment, i, storm_names, current_reasons[i])
+        current = current_distances[i]
+        current = None if current is None else round(current, 2)
+        if (distance, status, reason) != (current, current_statuses[i], current_reasons[i]):
+            updates.append((distance, status, reason) + key)
+
+    written = 0
+    if updates and not dry_run:
+        written = await repo.update_many(UPDATE, updates)
+
+    return {
+        "ships": len(keys),
+        "storms": len(storms),
+        "inside_core": int(assessment.inside_core.sum()),
+        "inside_warning": int(assessment.inside_warning.sum()),
+        "changed": len(updates),
+        "written": written,
+        "dry_run": dry_run,
+    }
+
+
+def main():
+    import argparse
+    import json
+
+    from db.database import close_pool, init_pool
+    from db.repository import close_repository, init_repository
+
+    parser = argparse.ArgumentParser(description="Recompute storm hazards for all ships in eta_results.")
+    parser.add_argument("--dry-run", action="store_true", help="compute but do not write back")
+    args = parser.parse_args()
+
+    async def run():
+        init_pool()
+        try:
+            return await recompute_hazards(init_repository(), dry_run=args.dry_run)
+        finally:
+            close_repository()
+            close_pool()
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
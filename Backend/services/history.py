@@ -0,0 +1,408 @@
+"""
+Append-only history of eta_results revisions.
+
+Every change the fleet state sync sees is appended to ``eta_history``, one
+row per (ship, updated_at), so ETA drift and positions can be replayed.
+Nothing is added to the eta_results queries: the recorder reads the rows
+the sync has already fetched and writes them in batches. Revisions older
+than HISTORY_RAW_DAYS are folded by ``compact`` into one row per ship and
+hour in ``eta_history_hourly``, which is kept for HISTORY_RETENTION_DAYS.
+
+    python -m services.history compact
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Record revisions from this process's fleet state (duplicates across workers are ignored)
+HISTORY_RECORD = os.getenv('HISTORY_RECORD', 'true').lower() == 'true'
+# Seconds between batched writes, and revisions held while the database is unavailable
+HISTORY_FLUSH_INTERVAL = float(os.getenv('HISTORY_FLUSH_INTERVAL', '5'))
+HISTORY_BUFFER_MAX = int(os.getenv('HISTORY_BUFFER_MAX', '500000'))
+# Days of per-revision rows before they are folded into hourly rows, and days hourly rows are kept
+HISTORY_RAW_DAYS = float(os.getenv('HISTORY_RAW_DAYS', '7'))
+HISTORY_RETENTION_DAYS = float(os.getenv('HISTORY_RETENTION_DAYS', '365'))
+# eta_history is partitioned by day (see README): compaction drops partitions instead of deleting
+HISTORY_PARTITIONS = os.getenv('HISTORY_PARTITIONS', 'false').lower() == 'true'
+# Most points returned by one /api/eta/{ship_name}/history request
+HISTORY_MAX_POINTS = int(os.getenv('HISTORY_MAX_POINTS', '5000'))
+
+# Bucket width per resolution; "raw" returns every recorded revision
+RESOLUTIONS = {"raw": 0, "hour": 3600, "day": 86400}
+_EPOCH = datetime(1970, 1, 1)
+
+COLUMNS = ("ship_name", "imo", "updated_at", "eta_expected", "delay_hours", "status",
+           "latitude", "longitude", "distance_to_hazard")
+
+INSERT_QUERY = """
+    INSERT IGNORE INTO eta_history
+        (ship_name, imo, updated_at, eta_expected, delay_hours, status, latitude, longitude, distance_to_hazard)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+HIGH_WATER_QUERY = "SELECT MAX(updated_at) AS last_recorded FROM eta_history"
+
+RAW_QUERY = """
+    SELECT updated_at AS t, eta_expected, delay_hours, delay_hours AS delay_min, delay_hours AS delay_max,
+           status, latitude, longitude, 1 AS revisions
+    FROM eta_history
+    WHERE ship_name = %s AND updated_at >= %s AND updated_at < %s{imo}
+    ORDER BY updated_at
+"""
+
+HOURLY_QUERY = """
+    SELECT bucket AS t, eta_expected, delay_hours, delay_min, delay_max,
+           status, latitude, longitude, revisions
+    FROM eta_history_hourly
+    WHERE ship_name = %s AND bucket >= %s AND bucket < %s{imo}
+    ORDER BY bucket
+"""
+
+COMPACT_QUERY = """
+    SELECT ship_name, imo, updated_at AS t, eta_expected, delay_hours, delay_hours AS delay_min,
+           delay_hours AS delay_max, status, latitude, longitude, 1 AS revisions
+    FROM eta_history
+    WHERE updated_at >= %s AND updated_at < %s
+    ORDER BY updated_at
+"""
+
+UPSERT_HOURLY_QUERY = """
+    INSERT INTO eta_history_hourly
+        (ship_name, imo, bucket, eta_expected, delay_hours, delay_min, delay_max, status,
+         latitude, longitude, revisions)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        eta_expected = VALUES(eta_expected), delay_hours = VALUES(delay_hours),
+        delay_min = VALUES(delay_min), delay_max = VALUES(delay_max), status = VALUES(status),
+        latitude = VALUES(latitude), longitude = VALUES(longitude), revisions = VALUES(revisions)
+"""
+
+PARTITIONS_QUERY = """
+    SELECT PARTITION_NAME AS name
+    FROM information_schema.PARTITIONS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'eta_history' AND PARTITION_NAME IS NOT NULL
+"""
+
+
+def floor_time(value, seconds):
+    """Start of the ``seconds``-wide bucket holding ``value``."""
+    return value - timedelta(seconds=(value - _EPOCH).total_seconds() % seconds)
+
+
+def _min(a, b):
+    return b if a is None else a if b is None else min(a, b)
+
+
+def _max(a, b):
+    return b if a is None else a if b is None else max(a, b)
+
+
+def fold(buckets, rows, seconds, key=None):
+    """
+    Fold time-ordered points into ``buckets``, one per ``seconds`` bucket
+    (and per ``key(row)`` when given): the last revision's values, the
+    delay range and the number of revisions folded in.
+    """
+    for row in rows:
+        bucket = floor_time(row["t"], seconds)
+        group = (key(row) if key else None, bucket)
+        current = buckets.get(group)
+        if current is None:
+            buckets[group] = {**row, "t": bucket}
+            continue
+        delay_min, delay_max = _min(current["delay_min"], row["delay_min"]), _max(current["delay_max"], row["delay_max"])
+        revisions = current["revisions"] + row["revisions"]
+        current.update(row, t=bucket, delay_min=delay_min, delay_max=delay_max, revisions=revisions)
+    return buckets
+
+
+def downsample(rows, seconds, key=None):
+    """``fold`` into fresh buckets; returns the folded points in time order."""
+    return list(fold({}, rows, seconds, key).values())
+
+
+class HistoryRecorder:
+    """
+    Appends the rows a FleetState reports as changed to eta_history.
+
+    Revisions are identified by (ship_name, imo, updated_at) and inserted
+    with INSERT IGNORE, so every worker may record and a row is still
+    stored once. On start, rows older than the newest recorded revision are
+    skipped, so the first full load does not re-append the whole fleet.
+    """
+
+    def __init__(self, interval=HISTORY_FLUSH_INTERVAL, max_buffer=HISTORY_BUFFER_MAX):
+        self.interval = interval
+        self._buffer = deque(maxlen=max_buffer)
+        self._since = None
+        self._state = None
+        self._task = None
+
+        self._recorded = 0
+        self._written = 0
+        self._dropped = 0
+        self._flushes = 0
+        self._errors = 0
+
+    async def start(self, repo, state):
+        """Read the newest recorded revision, then follow ``state``'s changes."""
+        if self._task is not None:
+            return
+        try:
+            row = await repo.fetch_one(HIGH_WATER_QUERY)
+        except Exception as e:
+            logger.error(f"History recorder disabled, eta_history is not readable: {str(e)}")
+            return
+        self._since = row["last_recorded"] if row else None
+        self._state = state
+        state.on_change(self._changed)
+        self._task = asyncio.ensure_future(self._run(repo))
+
+    async def stop(self, repo=None):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            if repo is not None:
+                await self.flush(repo)
+
+    def _changed(self, changed, removed):
+        columns = self._state.columns
+        slots = [columns.slots[key] for key in changed if key in columns.slots]
+        if not slots:
+            return
+        values = [columns.values(name, slots) for name in COLUMNS]
+        # imo is part of the primary key, so a missing IMO is stored as 0
+        values[1] = [imo or 0 for imo in values[1]]
+        since = self._since
+        buffer = self._buffer
+        for row in zip(*values):
+            # Position 2 is updated_at, which identifies the revision
+            if row[2] is not None and (since is None or row[2] >= since):
+                self._dropped += len(buffer) == buffer.maxlen
+                buffer.append(row)
+                self._recorded += 1
+
+    async def flush(self, repo, chunk_size=1000):
+        """Write buffered revisions; returns the rows inserted."""
+        if not self._buffer:
+            return 0
+        rows = list(self._buffer)
+        self._buffer.clear()
+        try:
+            written = await repo.execute_many(INSERT_QUERY, rows, chunk_size)
+        except Exception:
+            # Keep them for the next attempt; past the bound the oldest revisions go first
+            kept = deque(rows, maxlen=self._buffer.maxlen)
+            kept.extend(self._buffer)
+            self._dropped += len(rows) + len(self._buffer) - len(kept)
+            self._buffer = kept
+            raise
+        self._flushes += 1
+        self._written += written
+        return written
+
+    def stats(self):
+        return {
+            "recording": self._task is not None,
+            "recorded": self._recorded,
+            "written": self._written,
+            "buffered": len(self._buffer),
+            "dropped": self._dropped,
+            "flushes": self._flushes,
+            "errors": self._errors,
+        }
+
+    async def _run(self, repo):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush(repo)
+            except Exception as e:
+                self._errors += 1
+                logger.error(f"History flush failed: {str(e)}")
+
+
+history_recorder = HistoryRecorder()
+
+
+def _resolution(resolution, start, end):
+    if resolution != "auto":
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of auto, {', '.join(RESOLUTIONS)}")
+        return resolution
+    span = end - start
+    if span <= timedelta(days=2):
+        return "raw"
+    return "hour" if span <= timedelta(days=60) else "day"
+
+
+async def load_history(repo, ship_name, imo=None, start=None, end=None, resolution="auto",
+                       max_points=HISTORY_MAX_POINTS):
+    """
+    History of one ship between ``start`` and ``end`` (default: the last
+    7 days), from the per-revision rows and, for compacted periods, the
+    hourly rows. Both are range scans on (ship_name, time) keys.
+    """
+    end = end or datetime.now()
+    start = start or end - timedelta(days=7)
+    if start >= end:
+        raise ValueError("'from' must be before 'to'")
+    resolution = _resolution(resolution, start, end)
+
+    imo_clause = " AND imo = %s" if imo is not None else ""
+    params = (ship_name, start, end) + ((imo,) if imo is not None else ())
+    hourly, raw = await asyncio.gather(
+        repo.fetch_all(HOURLY_QUERY.format(imo=imo_clause), params),
+        repo.fetch_all(RAW_QUERY.format(imo=imo_clause), params),
+    )
+    # Hours folded but still in eta_history (partitions are only dropped by
+    # whole days, or compaction stopped between upsert and delete) are in
+    # both tables; the raw revisions win so nothing is counted twice
+    covered = {floor_time(row["t"], 3600) for row in raw}
+    points = sorted([row for row in hourly if row["t"] not in covered] + raw, key=lambda row: row["t"])
+    if RESOLUTIONS[resolution]:
+        points = downsample(points, RESOLUTIONS[resolution])
+    truncated = len(points) > max_points
+    if truncated:
+        # Keep the most recent points
+        points = points[-max_points:]
+    return {
+        "ship_name": ship_name,
+        "imo": imo,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "resolution": resolution,
+        "truncated": truncated,
+        "points": [{
+            "t": point["t"].isoformat(),
+            "eta": point["eta_expected"].isoformat() if point["eta_expected"] else None,
+            "delay_hours": point["delay_hours"],
+            "delay_min": point["delay_min"],
+            "delay_max": point["delay_max"],
+            "status": point["status"],
+            "lat": point["latitude"],
+            "lng": point["longitude"],
+            "revisions": point["revisions"],
+        } for point in points],
+    }
+
+
+async def _partitions(repo):
+    """Daily eta_history partitions as {name: exclusive upper bound (date)}."""
+    rows = await repo.fetch_all(PARTITIONS_QUERY)
+    return {row["name"]: datetime.strptime(row["name"][1:], "%Y%m%d") + timedelta(days=1)
+            for row in rows if row["name"] != "pmax"}
+
+
+async def add_partitions(repo, days_ahead=7, now=None):
+    """Create daily eta_history partitions up to ``days_ahead`` days from now."""
+    now = now or datetime.now()
+    existing = await _partitions(repo)
+    day = max(existing.values(), default=floor_time(now, 86400))
+    added = []
+    while day <= now + timedelta(days=days_ahead):
+        name = day.strftime("p%Y%m%d")
+        bound = (day + timedelta(days=1)).strftime("%Y-%m-%d")
+        await repo.execute(
+            f"ALTER TABLE eta_history REORGANIZE PARTITION pmax INTO ("
+            f"PARTITION {name} VALUES LESS THAN (TO_DAYS('{bound}')), "
+            f"PARTITION pmax VALUES LESS THAN MAXVALUE)"
+        )
+        added.append(name)
+        day += timedelta(days=1)
+    return added
+
+
+async def compact(repo, raw_days=HISTORY_RAW_DAYS, retention_days=HISTORY_RETENTION_DAYS,
+                  partitioned=HISTORY_PARTITIONS, now=None, batch_size=5000):
+    """
+    Fold revisions older than ``raw_days`` into eta_history_hourly, an hour
+    at a time, then remove them from eta_history. Hourly rows older than
+    ``retention_days`` are deleted. Safe to re-run after an interruption:
+    hourly rows are upserted, and an hour is only removed once folded.
+    """
+    started = time.perf_counter()
+    now = now or datetime.now()
+    cutoff = floor_time(now - timedelta(days=raw_days), 3600)
+    summary = {"cutoff": cutoff.isoformat(), "hours": 0, "revisions": 0, "hourly_rows": 0,
+               "raw_deleted": 0, "partitions_dropped": [], "hourly_deleted": 0}
+
+    after = None
+    while True:
+        query = "SELECT MIN(updated_at) AS oldest FROM eta_history"
+        row = await repo.fetch_one(query + (" WHERE updated_at >= %s" if after else ""), (after,) if after else None)
+        if not row or row["oldest"] is None or row["oldest"] >= cutoff:
+            break
+        hour = floor_time(row["oldest"], 3600)
+        end = hour + timedelta(hours=1)
+        buckets = {}
+        async for rows in repo.stream(COMPACT_QUERY, (hour, end), batch_size):
+            fold(buckets, rows, 3600, key=lambda r: (r["ship_name"], r["imo"]))
+            summary["revisions"] += len(rows)
+        await repo.execute_many(UPSERT_HOURLY_QUERY, [
+            (b["ship_name"], b["imo"], b["t"], b["eta_expected"], b["delay_hours"], b["delay_min"],
+             b["delay_max"], b["status"], b["latitude"], b["longitude"], b["revisions"])
+            for b in buckets.values()
+        ], batch_size)
+        if not partitioned:
+            summary["raw_deleted"] += await repo.execute(
+                "DELETE FROM eta_history WHERE updated_at >= %s AND updated_at < %s", (hour, end))
+        summary["hours"] += 1
+        summary["hourly_rows"] += len(buckets)
+        after = end
+
+    if partitioned:
+        # Whole days below the cutoff have been folded; dropping their partitions is O(1)
+        for name, bound in sorted((await _partitions(repo)).items(), key=lambda item: item[1]):
+            if bound <= cutoff:
+                await repo.execute(f"ALTER TABLE eta_history DROP PARTITION {name}")
+                summary["partitions_dropped"].append(name)
+
+    summary["hourly_deleted"] = await repo.execute(
+        "DELETE FROM eta_history_hourly WHERE bucket < %s", (now - timedelta(days=retention_days),))
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def main():
+    import argparse
+    import json
+
+    from db.database import close_pool, init_pool
+    from db.repository import close_repository, init_repository
+
+    parser = argparse.ArgumentParser(description="Maintain the eta_history tables.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    compact_cmd = commands.add_parser("compact", help="fold old revisions into hourly rows")
+    compact_cmd.add_argument("--raw-days", type=float, default=HISTORY_RAW_DAYS)
+    compact_cmd.add_argument("--retention-days", type=float, default=HISTORY_RETENTION_DAYS)
+    partitions_cmd = commands.add_parser("partitions", help="create upcoming daily partitions")
+    partitions_cmd.add_argument("--days-ahead", type=int, default=7)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def run():
+        init_pool()
+        try:
+            repo = init_repository()
+            if args.command == "compact":
+                return await compact(repo, args.raw_days, args.retention_days)
+            return {"added": await add_partitions(repo, args.days_ahead)}
+        finally:
+            close_repository()
+            close_pool()
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import os
+import time
+
+import numpy as np
+
+from services.eta_model import build_features, load_model
+from services.feature_store import feature_store
+from services.port_index import port_index
+from services.weather import weather_index
+
+logger = logging.getLogger(__name__)
+
+# Largest micro-batch and longest a request waits for one to fill
+MODEL_BATCH_MAX_SIZE = int(os.getenv('MODEL_BATCH_MAX_SIZE', '64'))
+MODEL_BATCH_MAX_WAIT_MS = float(os.getenv('MODEL_BATCH_MAX_WAIT_MS', '2'))
+
+
+class InferenceServer:
+    """
+    Per-process ETA model with micro-batched inference.
+
+    The model is loaded (and run once on a dummy row) at startup, so the
+    first request does not pay for it. Concurrent ``predict`` calls are
+    queued and run as one array batch: a batch starts when the first request
+    arrives and closes when ``max_batch_size`` requests are waiting or
+    ``max_wait_ms`` has passed. Batches run one at a time on a worker thread,
+    so requests arriving while the model is busy form the next batch.
+    """
+
+    def __init__(self, model_spec=None, max_batch_size=MODEL_BATCH_MAX_SIZE,
+                 max_wait_ms=MODEL_BATCH_MAX_WAIT_MS, coordinates=None, store=None):
+        self.model_spec = model_spec
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.coordinates = coordinates or port_index.coordinates
+        self.store = store
+        self.model = None
+        self._pending = []   # (row, future)
+        self._wake = None
+        self._full = None
+        self._task = None
+
+        self._requests = 0
+        self._batches = 0
+        self._rows = 0
+        self._max_batch = 0
+        self._errors = 0
+        self._model_time = 0.0
+        self._load_time = None
+
+    @property
+    def model_name(self):
+        return getattr(self.model, "name", type(self.model).__name__)
+
+    async def start(self, model=None):
+        """Load and warm the model, then start the batching loop."""
+        if self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        self.model = model or await loop.run_in_executor(None, load_model, self.model_spec)
+        warmup = {"port_from": None, "port_to": None, "latitude": 0.0, "longitude": 0.0}
+        await loop.run_in_executor(None, self._predict_rows, [warmup], lambda name: (0.0, 0.0), None)
+        self._load_time = time.perf_counter() - started
+        logger.info(f"ETA model '{self.model_name}' loaded in {self._load_time * 1000:.0f} ms")
+
+        self._wake = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for _, future in self._pending:
+            if not future.done():
+                future.cancel()
+        self._pending = []
+
+    async def predict(self, row):
+        """
+        Predict ``(transit_hours, delay_hours)`` for one row with the fields
+        accepted by ``build_features``.
+        """
+        if self._task is None:
+            raise RuntimeError("Inference server is not started")
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future))
+        self._requests += 1
+        self._wake.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._full.set()
+        return await future
+
+    def stats(self):
+        return {
+            "model": self.model_name if self.model is not None else None,
+            "load_time_ms": round(self._load_time * 1000, 1) if self._load_time is not None else None,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "requests": self._requests,
+            "batches": self._batches,
+            "mean_batch_size": round(self._rows / self._batches, 2) if self._batches else None,
+            "max_batch": self._max_batch,
+            "model_time_ms": round(self._model_time * 1000, 1),
+            "errors": self._errors,
+            "queued": len(self._pending),
+        }
+
+    def _predict_rows(self, rows, coordinates, store):
+        features, _ = build_features(rows, coordinates, store, weather_index)
+        transit, delay = self.model.predict(features)
+        return np.asarray(transit, dtype=np.float64), np.asarray(delay, dtype=np.float64)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wake.wait()
+            if len(self._pending) < self.max_batch_size and self.max_wait > 0:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            if not self._pending:
+                self._wake.clear()
+            if len(self._pending) < self.max_batch_size:
+                self._full.clear()
+            # Callers that went away (disconnects, timeouts) are not predicted
+            batch = [(row, future) for row, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                transit, delay = await loop.run_in_executor(
+                    None, self._predict_rows, [row for row, _ in batch], self.coordinates, self.store
+                )
+            except Exception as e:
+                self._errors += 1
+                logger.error(f"ETA model batch of {len(batch)} failed: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self._model_time += time.perf_counter() - started
+
+            self._batches += 1
+            self._rows += len(batch)
+            self._max_batch = max(self._max_batch, len(batch))
+            for (_, future), hours, extra in zip(batch, transit.tolist(), delay.tolist()):
+                if not future.done():
+                    future.set_result((hours, extra))
+
+
+inference = InferenceServer(store=feature_store)
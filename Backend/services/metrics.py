@@ -0,0 +1,186 @@
+"""
+Prometheus-format metrics for this worker process.
+
+Requests are timed per route and split into phases: ``acquire`` (waiting
+for a pooled connection), ``execute`` (running the query and fetching rows),
+``transform`` (shaping rows in Python) and ``serialize`` (encoding the
+body). The phase totals of the current request live in a context variable
+set by MetricsMiddleware. Code on the DB executor threads cannot see it
+(run_in_executor does not copy the context), so the repository measures
+there and records on the awaiting coroutine.
+"""
+import contextvars
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Fraction of successful requests written to the access log (errors and slow requests are always logged)
+ACCESS_LOG_SAMPLE = float(os.getenv('ACCESS_LOG_SAMPLE', '0.01'))
+# Requests slower than this many milliseconds are logged as warnings
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', '1000'))
+
+PHASES = ("acquire", "execute", "transform", "serialize")
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_request_phases = contextvars.ContextVar("request_phases", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            count = 0
+            for bound, in_bucket in zip(self.buckets + (float("inf"),), series[:-1]):
+                count += in_bucket
+                yield self.name + "_bucket", _labels(self.labels, key, [("le", _number(bound))]), count
+            yield self.name + "_count", _labels(self.labels, key), count
+            yield self.name + "_sum", _labels(self.labels, key), series[-1]
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, _labels(self.labels, key), value
+
+
+class Metrics:
+    """Registry of this worker's metrics, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+        self._gauges = []  # (name, help, fn returning {label tuple: value}, label names)
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help, fn, labels=()):
+        """Register a gauge read from ``fn()`` at scrape time."""
+        self._gauges.append((name, help, fn, tuple(labels)))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in metric.samples())
+        for name, help, fn, label_names in self._gauges:
+            try:
+                values = fn()
+            except Exception:
+                continue
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(f"{name}{_labels(label_names, key)} {_number(value)}" for key, value in values.items())
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+request_duration = metrics.register(Histogram(
+    "http_request_duration_seconds", "Request latency by route.", ("method", "route", "status")))
+request_phase = metrics.register(Histogram(
+    "http_request_phase_seconds", "Time per request spent in each phase, by route.", ("route", "phase")))
+db_acquire = metrics.register(Histogram(
+    "db_acquire_seconds", "Wait for a pooled database connection, per query."))
+db_execute = metrics.register(Histogram(
+    "db_execute_seconds", "Query execution and fetch time, per query.", ("operation",)))
+request_errors = metrics.register(Counter(
+    "http_request_errors_total", "Requests that ended in a 5xx or an exception, by route.", ("route",)))
+
+
+def start_request():
+    """Begin collecting phase timings for the current request; returns the reset token."""
+    return _request_phases.set(dict.fromkeys(PHASES, 0.0))
+
+
+def finish_request(token):
+    """Stop collecting and return the request's phase totals."""
+    phases = _request_phases.get()
+    _request_phases.reset(token)
+    return phases
+
+
+def add_phase(phase, seconds):
+    phases = _request_phases.get()
+    if phases is not None:
+        phases[phase] += seconds
+
+
+def record_query(operation, acquire_s, execute_s):
+    """Record one database call measured on an executor thread."""
+    db_acquire.observe(acquire_s)
+    db_execute.observe(execute_s, operation)
+    add_phase("acquire", acquire_s)
+    add_phase("execute", execute_s)
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to ``phase`` of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase(phase, time.perf_counter() - started)
+
+
+def sampled(rate=ACCESS_LOG_SAMPLE):
+    """True for roughly ``rate`` of calls, for logging on hot paths."""
+    return rate >= 1 or (rate > 0 and random.random() < rate)
@@ -0,0 +1,71 @@
+import base64
+import json
+
+# Upper bound on rows returned by one page
+MAX_PAGE_SIZE = 1000
+DEFAULT_PAGE_SIZE = 200
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last row on a page as an opaque cursor."""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    """Decode a cursor produced by ``encode_cursor``; raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def page_size(limit):
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def split_csv(value):
+    """Split a comma-separated query parameter into a list of non-empty values."""
+    if not value:
+        return []
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def parse_fields(fields, allowed):
+    """Validate a ``fields=`` projection; returns None when all fields are wanted."""
+    names = split_csv(fields)
+    if not names:
+        return None
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def project(rows, fields):
+    if fields is None:
+        return rows
+    return [{name: row.get(name) for name in fields} for row in rows]
+
+
+def bbox_conditions(lat_column, lng_column, min_lat=None, max_lat=None, min_lng=None, max_lng=None):
+    """SQL conditions and params restricting a position to a bounding box."""
+    conditions, params = [], []
+    for column, op, value in (
+        (lat_column, ">=", min_lat),
+        (lat_column, "<=", max_lat),
+        (lng_column, ">=", min_lng),
+        (lng_column, "<=", max_lng),
+    ):
+        if value is not None:
+            conditions.append(f"{column} {op} %s")
+            params.append(value)
+    return conditions, params
@@ -0,0 +1,122 @@
+"""
+Pre-serialized /api/ports responses.
+
+Ports are validated and formatted once per port index version, not on every
+request: the list body and each port's detail body are kept as JSON bytes
+and rebuilt only when ``port_index.version`` changes. main.py and the legacy
+entry points (server.py, api/ports.py) all serve ports from here.
+"""
+import logging
+import threading
+from datetime import date, datetime
+
+from services.port_index import port_index
+from services.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATUS = "ổn định"
+
+
+def convert_coordinate(coord, is_longitude=False):
+    """Decimal degrees rounded to 6 places, or None if missing or out of range."""
+    if coord is None:
+        return None
+    try:
+        coord_float = float(coord)
+    except (TypeError, ValueError) as e:
+        logger.error(f"Error converting coordinate {coord}: {str(e)}")
+        return None
+    # NaN fails both comparisons, so it is rejected here too
+    if is_longitude and not abs(coord_float) <= 180:
+        logger.warning(f"Invalid longitude value: {coord_float}")
+        return None
+    if not is_longitude and not abs(coord_float) <= 90:
+        logger.warning(f"Invalid latitude value: {coord_float}")
+        return None
+    return round(coord_float, 6)
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+
+class PortCatalog:
+    """List and detail bodies for sea_ports, keyed on the port index version."""
+
+    def __init__(self, index=port_index):
+        self._index = index
+        self._lock = threading.Lock()
+        self._version = None
+        self._list = b'{"ports":[]}'
+        self._details = {}     # port id -> JSON bytes
+        self._builds = 0
+        self._skipped = 0
+
+    def _current(self):
+        version = self._index.version
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._build(self._index.ports, version)
+        return self._list, self._details
+
+    def _build(self, ports, version):
+        listed, details, skipped = [], {}, 0
+        for port in ports:
+            try:
+                location = {
+                    "latitude": convert_coordinate(port["latitude"], False),
+                    "longitude": convert_coordinate(port["longitude"], True)
+                }
+                status = port["status"] or DEFAULT_STATUS
+                listed.append({
+                    "id": port["id"],
+                    "name": port["name"],
+                    "region": port["region"],
+                    "country": port["country"],
+                    "location": location,
+                    "status": status,
+                    "dockedShips": 0,  # Temporary default value
+                    "capacity": 100,    # Temporary default value
+                    "availableSlots": 100,  # Temporary default value
+                    "avgWaitingTime": "N/A"  # Temporary default value
+                })
+                details[port["id"]] = dumps({
+                    "id": port["id"],
+                    "name": port["name"],
+                    "region": port["region"],
+                    "country": port["country"],
+                    "location": location,
+                    "status": status,
+                    "last_updated": _isoformat(port["created_at"])
+                })
+            except Exception as e:
+                skipped += 1
+                logger.error(f"Error processing port {port.get('id')}: {str(e)}")
+
+        self._list = dumps({"ports": listed})
+        self._details = details
+        self._version = version
+        self._builds += 1
+        self._skipped = skipped
+
+    def list_body(self):
+        """``{"ports": [...]}`` as JSON bytes."""
+        return self._current()[0]
+
+    def detail_body(self, port_id):
+        """One port as JSON bytes, or None if there is no such port."""
+        return self._current()[1].get(port_id)
+
+    def stats(self):
+        return {
+            "version": self._version,
+            "ports": len(self._details),
+            "skipped": self._skipped,
+            "builds": self._builds,
+            "list_bytes": len(self._list),
+        }
+
+
+port_catalog = PortCatalog()
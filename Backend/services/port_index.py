@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of sea_ports for changes
+PORT_INDEX_REFRESH = float(os.getenv('PORT_INDEX_REFRESH', '60'))
+
+PORTS_QUERY = """
+    SELECT
+        id,
+        port_name as name,
+        region,
+        country,
+        latitude,
+        longitude,
+        status,
+        created_at
+    FROM sea_ports
+    ORDER BY port_name
+"""
+
+
+def normalize_port_name(name):
+    """Key used to match eta_results port names against sea_ports."""
+    if name is None:
+        return None
+    return " ".join(str(name).split()).casefold()
+
+
+def _coordinate(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class PortIndex:
+    """
+    In-memory copy of the sea_ports table, indexed by id and by normalized
+    name.
+
+    Loaded once at startup and re-read every ``refresh_interval`` seconds.
+    The table is small, so a refresh reads every row and compares a digest
+    of them with the previous load; the index (and ``version``) only changes
+    when the data did, and registered listeners are notified so caches that
+    embed port data can be dropped.
+    """
+
+    def __init__(self, refresh_interval=PORT_INDEX_REFRESH):
+        self.refresh_interval = refresh_interval
+        self.version = 0
+        self.ports = []        # rows in port_name order
+        self.by_id = {}
+        self.by_name = {}
+        self._coordinates = {}  # normalized name -> (lat, lng)
+        self._digest = None
+        self._listeners = []
+        self._task = None
+        self._lock = None
+
+        self._refreshes = 0
+        self._changes = 0
+
+    @property
+    def loaded(self):
+        return self._digest is not None
+
+    def on_change(self, callback):
+        self._listeners.append(callback)
+
+    async def ensure_loaded(self, repo):
+        if not self.loaded:
+            await self.refresh(repo)
+
+    async def refresh(self, repo):
+        """Re-read sea_ports; returns True if the index changed."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            rows = await repo.fetch_all(PORTS_QUERY)
+            self._refreshes += 1
+            digest = hashlib.blake2b(repr(rows).encode("utf-8"), digest_size=16).hexdigest()
+            if digest == self._digest:
+                return False
+
+            by_id, by_name, coordinates = {}, {}, {}
+            for row in rows:
+                by_id[row["id"]] = row
+                key = normalize_port_name(row["name"])
+                if key is not None and key not in by_name:
+                    by_name[key] = row
+                    coordinates[key] = (_coordinate(row["latitude"]), _coordinate(row["longitude"]))
+
+            self.ports, self.by_id, self.by_name = rows, by_id, by_name
+            self._coordinates = coordinates
+            first_load = self._digest is None
+            self._digest = digest
+            self.version += 1
+            if not first_load:
+                self._changes += 1
+                logger.info(f"sea_ports changed; port index now at version {self.version}")
+                for callback in self._listeners:
+                    callback()
+            return True
+
+    def coordinates(self, port_name):
+        """Return (latitude, longitude) for a port name, or (None, None)."""
+        return self._coordinates.get(normalize_port_name(port_name), (None, None))
+
+    def start(self, repo):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run(repo))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {
+            "ports": len(self.ports),
+            "version": self.version,
+            "refresh_interval_s": self.refresh_interval,
+            "refreshes": self._refreshes,
+            "changes": self._changes,
+        }
+
+    async def _run(self, repo):
+        while True:
+            try:
+                await self.refresh(repo)
+            except Exception as e:
+                logger.error(f"Port index refresh failed: {str(e)}")
+            await asyncio.sleep(self.refresh_interval)
+
+
+port_index = PortIndex()
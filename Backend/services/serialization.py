@@ -0,0 +1,90 @@
+"""
+JSON encoding for API responses.
+
+Uses orjson when it is installed (``pip install orjson``) and falls back to
+the standard library otherwise; both produce compact UTF-8 with the same
+datetime/Decimal handling as FastAPI's ``jsonable_encoder``.
+``FastJSONResponse`` renders with it, skipping the ``jsonable_encoder`` pass
+of the default response class.
+"""
+import json
+import os
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+from services.metrics import timed
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+# Encoder for API responses: "auto" (orjson when installed) or "json"
+JSON_ENCODER = os.getenv('JSON_ENCODER', 'auto').lower()
+# Validate rows against their response model before sending (off: DB rows are trusted)
+VALIDATE_RESPONSES = os.getenv('VALIDATE_RESPONSES', 'false').lower() in ('1', 'true', 'yes')
+
+USE_ORJSON = orjson is not None and JSON_ENCODER != 'json'
+
+
+def _default(value):
+    """Encode the values orjson / json do not handle natively."""
+    if isinstance(value, Decimal):
+        # Same rule as FastAPI: integral decimals become ints
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if hasattr(value, "dict"):
+        return value.dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_dumps(content):
+    """Serialize ``content`` to compact JSON bytes with the standard library."""
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+if USE_ORJSON:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(content):
+        """Serialize ``content`` to compact JSON bytes."""
+        return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+    loads = orjson.loads
+else:
+    dumps = json_dumps
+    loads = json.loads
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with ``dumps`` (no jsonable_encoder pass)."""
+
+    def render(self, content):
+        with timed("serialize"):
+            return dumps(content)
+
+
+def trusted_response(rows, model=None):
+    """
+    Send rows already shaped like ``model`` by their SQL query without
+    validating each one; set VALIDATE_RESPONSES to check them in development.
+    """
+    if VALIDATE_RESPONSES and model is not None:
+        validate = getattr(model, "model_validate", None) or model.parse_obj
+        for row in rows:
+            validate(row)
+    return FastJSONResponse(content=rows)
@@ -0,0 +1,246 @@
+import logging
+import math
+import os
+
+import numpy as np
+
+from services.fleet_state import fleet_state
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+# Grid cell size in degrees
+SPATIAL_INDEX_CELL_DEG = float(os.getenv('SPATIAL_INDEX_CELL_DEG', '1'))
+
+# eta_results columns returned with each nearby ship
+POSITION_FIELDS = (
+    "imo", "ship_name", "port_from", "port_to", "eta_expected",
+    "delay_hours", "status", "latitude", "longitude"
+)
+
+
+def chord_for_km(radius_km):
+    """Squared chord length between two unit vectors ``radius_km`` apart."""
+    angle = min(radius_km / EARTH_RADIUS_KM, math.pi)
+    return (2.0 * math.sin(angle / 2.0)) ** 2
+
+
+def km_for_chord(chord_sq):
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.minimum(np.sqrt(chord_sq) / 2.0, 1.0))
+
+
+class GridIndex:
+    """
+    Fixed lat/lng grid over the sphere for radius queries.
+
+    Points live in slots of NumPy arrays (unit vector and cell id), so moving
+    or removing one is an O(1) in-place update. Queries use a copy of the
+    slots sorted by cell id, rebuilt lazily after changes: each grid row the
+    query circle's bounding box overlaps is one contiguous range of cell ids
+    (two when it wraps the antimeridian), found with ``searchsorted``, and
+    the candidates are checked with one vectorized chord-distance test.
+    """
+
+    def __init__(self, cell_deg=SPATIAL_INDEX_CELL_DEG, capacity=1024):
+        self.cell_deg = cell_deg
+        self.columns = int(math.ceil(360.0 / cell_deg))
+        self.rows = int(math.ceil(180.0 / cell_deg))
+        self.slots = {}     # key -> slot
+        self.items = []     # slot -> item
+        self._keys = []     # slot -> key
+        self._free = []
+        self._vectors = np.zeros((capacity, 3))
+        self._cells = np.full(capacity, -1, dtype=np.int64)
+        self._order = None  # slots sorted by cell id, None when stale
+        self._sorted_cells = None
+
+    def __len__(self):
+        return len(self.slots)
+
+    @property
+    def cells(self):
+        """Number of non-empty cells."""
+        used = self._cells[:len(self.items)]
+        return int(np.unique(used[used >= 0]).size)
+
+    def _row(self, lat):
+        return min(int((lat + 90.0) // self.cell_deg), self.rows - 1)
+
+    def _column(self, lng):
+        return int(((lng + 180.0) % 360.0) // self.cell_deg) % self.columns
+
+    def put(self, key, lat, lng, item):
+        """Insert or move ``key``; returns True if it changed cell."""
+        cell = self._row(lat) * self.columns + self._column(lng)
+        slot = self.slots.get(key)
+        if slot is None:
+            slot = self._allocate(key)
+        self.items[slot] = item
+        rlat, rlng = math.radians(lat), math.radians(lng)
+        cos_lat = math.cos(rlat)
+        self._vectors[slot] = (cos_lat * math.cos(rlng), cos_lat * math.sin(rlng), math.sin(rlat))
+        if self._cells[slot] == cell:
+            return False
+        self._cells[slot] = cell
+        self._order = None
+        return True
+
+    def get(self, key):
+        slot = self.slots.get(key)
+        return None if slot is None else self.items[slot]
+
+    def keys(self):
+        return self.slots.keys()
+
+    def remove(self, key):
+        slot = self.slots.pop(key, None)
+        if slot is not None:
+            self._cells[slot] = -1
+            self.items[slot] = None
+            self._keys[slot] = None
+            self._free.append(slot)
+            self._order = None
+
+    def _allocate(self, key):
+        if self._free:
+            slot = self._free.pop()
+            self._keys[slot] = key
+        else:
+            slot = len(self.items)
+            if slot == self._cells.shape[0]:
+                self._vectors = np.concatenate((self._vectors, np.zeros_like(self._vectors)))
+                self._cells = np.concatenate((self._cells, np.full_like(self._cells, -1)))
+            self.items.append(None)
+            self._keys.append(key)
+        self.slots[key] = slot
+        return slot
+
+    def _sorted(self):
+        if self._order is None:
+            cells = self._cells[:len(self.items)]
+            order = np.argsort(cells, kind="stable")
+            order = order[cells[order] >= 0]
+            self._order, self._sorted_cells = order, cells[order]
+        return self._order, self._sorted_cells
+
+    def _cell_ranges(self, lat, lng, radius_km):
+        """Inclusive (first, last) cell id ranges covering the query circle."""
+        span = radius_km / KM_PER_DEGREE
+        low, high = max(lat - span, -90.0), min(lat + span, 90.0)
+        rows = range(self._row(low), self._row(high) + 1)
+
+        widest = max(abs(low), abs(high))
+        lng_span = None
+        if widest < 90.0 - 1e-9 and span < 90.0:
+            lng_span = span / math.cos(math.radians(widest))
+        if lng_span is None or 2.0 * lng_span + self.cell_deg >= 360.0:
+            segments = [(0, self.columns - 1)]
+        else:
+            first, last = self._column(lng - lng_span), self._column(lng + lng_span)
+            segments = [(first, last)] if first <= last else [(first, self.columns - 1), (0, last)]
+
+        return [(row * self.columns + a, row * self.columns + b) for row in rows for a, b in segments]
+
+    def query(self, lat, lng, radius_km, limit=None):
+        """
+        Slots and distances (km) of points within the radius, nearest first,
+        as NumPy arrays; at most ``limit`` of them.
+        """
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0))
+        if not self.slots:
+            return empty
+        order, sorted_cells = self._sorted()
+        ranges = np.array(self._cell_ranges(lat, lng, radius_km), dtype=np.int64)
+        starts = np.searchsorted(sorted_cells, ranges[:, 0], side="left")
+        stops = np.searchsorted(sorted_cells, ranges[:, 1], side="right")
+        pieces = [order[a:b] for a, b in zip(starts.tolist(), stops.tolist()) if b > a]
+        if not pieces:
+            return empty
+        candidates = np.concatenate(pieces)
+
+        rlat, rlng = math.radians(lat), math.radians(lng)
+        cos_lat = math.cos(rlat)
+        centre = np.array((cos_lat * math.cos(rlng), cos_lat * math.sin(rlng), math.sin(rlat)))
+        diff = self._vectors[candidates] - centre
+        chord_sq = np.einsum("ij,ij->i", diff, diff)
+        inside = chord_sq <= chord_for_km(radius_km)
+        hits, chord_sq = candidates[inside], chord_sq[inside]
+        if limit is not None and limit < hits.size:
+            keep = np.argpartition(chord_sq, limit - 1)[:limit]
+            hits, chord_sq = hits[keep], chord_sq[keep]
+        nearest = np.argsort(chord_sq, kind="stable")
+        return hits[nearest], km_for_chord(chord_sq[nearest])
+
+    def within(self, lat, lng, radius_km, limit=None):
+        """Return ``(distance_km, key, item)`` for points within the radius, nearest first."""
+        slots, distances = self.query(lat, lng, radius_km, limit)
+        keys, items = self._keys, self.items
+        return [(d, keys[slot], items[slot]) for d, slot in zip(distances.tolist(), slots.tolist())]
+
+
+class ShipSpatialIndex:
+    """
+    Per-process grid index of ship positions from eta_results.
+
+    Positions come from the fleet state: after each sync only the ships
+    whose rows changed are moved in (or dropped from) the grid, so ships
+    that did not move keep their cell. The grid holds fleet keys; rows are
+    read from the fleet state for the ships a query returns.
+    """
+
+    def __init__(self, cell_deg=SPATIAL_INDEX_CELL_DEG, state=fleet_state):
+        self.grid = GridIndex(cell_deg)
+        self.state = state
+        self._updates = 0
+        self._moved = 0
+        self._queries = 0
+        state.on_change(self.apply_changes)
+
+    async def ensure_loaded(self, repo):
+        await self.state.ensure_loaded(repo)
+
+    async def refresh(self, repo):
+        """Sync the fleet state; returns True if any row changed."""
+        return await self.state.sync(repo)
+
+    def apply_changes(self, changed, removed):
+        """Apply the fleet state's changed and removed keys to the grid."""
+        grid, columns = self.grid, self.state.columns
+        for key in removed:
+            grid.remove(key)
+        if changed:
+            changed = list(changed)
+            slots = np.array([columns.slots[key] for key in changed], dtype=np.int64)
+            lats = columns.floats["latitude"][slots].tolist()
+            lngs = columns.floats["longitude"][slots].tolist()
+            for key, lat, lng in zip(changed, lats, lngs):
+                if lat != lat or lng != lng:
+                    grid.remove(key)
+                elif grid.put(key, lat, lng, key):
+                    self._moved += 1
+        self._updates += 1
+
+    def near(self, lat, lng, radius_km, limit=None):
+        """Ship rows within ``radius_km`` of a point, nearest first, with ``distance_km``."""
+        self._queries += 1
+        matches = self.grid.within(lat, lng, radius_km, limit)
+        ships = []
+        for distance, key, _ in matches:
+            row = self.state.row(key)
+            ships.append(dict({name: row[name] for name in POSITION_FIELDS}, distance_km=round(distance, 2)))
+        return ships
+
+    def stats(self):
+        return {
+            "ships": len(self.grid),
+            "cells": self.grid.cells,
+            "cell_deg": self.grid.cell_deg,
+            "updates": self._updates,
+            "cell_moves": self._moved,
+            "queries": self._queries,
+        }
+
+
+ship_index = ShipSpatialIndex()
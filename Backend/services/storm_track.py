@@ -0,0 +1,608 @@
+"""
+Storm tracks, short-range forecasts and forecast encounters with ships.
+
+storm_info holds one position per storm. ``record_fixes`` appends a fix to
+``storm_track`` whenever a storm has moved or changed size. ``forecast_storms``
+fits each storm's motion to its recent fixes and extrapolates it
+STORM_FORECAST_HOURS ahead, with an uncertainty cone that widens with lead
+time. ``find_encounters`` steps every ship along its great-circle route
+(services.voyage) over the same times and finds the first step at which it
+is inside a storm's forecast warning zone. Ship/storm pairs are pruned first
+by comparing a bounding box of each ship's whole track with one of each
+storm's whole cone, so only pairs that can meet are checked step by step.
+
+``scan_encounters`` writes the result back to eta_results: ``reason`` names
+the storm and the expected encounter time, and the hours the ship is
+expected to spend in it are added to ``delay_hours``.
+
+    python -m services.storm_track record|scan [--dry-run]
+"""
+import asyncio
+import functools
+import logging
+import os
+import time
+from datetime import timedelta
+from typing import NamedTuple
+
+import numpy as np
+
+from db.repository import BulkUpdate
+from services.fleet_state import fleet_state
+from services.hazard import CORE_REASON, EARTH_RADIUS_KM, WARNING_REASON, recompute_hazards, to_unit_vectors
+from services.port_index import port_index
+from services.voyage import route_table, to_lat_lng
+
+logger = logging.getLogger(__name__)
+
+# Forecast horizon and time step (hours)
+STORM_FORECAST_HOURS = float(os.getenv('STORM_FORECAST_HOURS', '72'))
+STORM_FORECAST_STEP_HOURS = float(os.getenv('STORM_FORECAST_STEP_HOURS', '1'))
+# Most recent fixes, from the last STORM_TRACK_WINDOW_HOURS, fitted for a storm's motion
+STORM_TRACK_FIXES = int(os.getenv('STORM_TRACK_FIXES', '6'))
+STORM_TRACK_WINDOW_HOURS = float(os.getenv('STORM_TRACK_WINDOW_HOURS', '24'))
+# Forecast cone radius growth (km per hour of lead time); storms with one fix have no known motion
+STORM_CONE_KM_PER_HOUR = float(os.getenv('STORM_CONE_KM_PER_HOUR', '2.5'))
+STORM_UNTRACKED_CONE_KM_PER_HOUR = float(os.getenv('STORM_UNTRACKED_CONE_KM_PER_HOUR', '15'))
+# Delay per hour a ship's track spends in a warning zone (hours in the core count in full)
+STORM_WARNING_DELAY_FACTOR = float(os.getenv('STORM_WARNING_DELAY_FACTOR', '0.3'))
+
+KM_PER_DEGREE = np.radians(1.0) * EARTH_RADIUS_KM
+# Forecast steps per pruning window, and padding of a ship's box for the
+# great-circle arc between the window's end points bulging out of it
+PRUNE_WINDOW_STEPS = 12
+PRUNE_PAD_KM = 25.0
+
+FORECAST_REASON = "Forecast to meet storm "
+
+FIX_COLUMNS = ("storm_id", "observed_at", "latitude", "longitude", "wind_kmh", "radius_km", "warning_radius_km")
+
+NOW_QUERY = "SELECT NOW() AS db_now"
+
+STORMS_QUERY = """
+    SELECT id, name, latitude, longitude, wind_kmh, radius_km, warning_radius_km
+    FROM storm_info
+"""
+
+FIXES_QUERY = """
+    SELECT storm_id, observed_at, latitude, longitude, wind_kmh, radius_km, warning_radius_km
+    FROM storm_track
+    WHERE observed_at >= %s
+    ORDER BY storm_id, observed_at
+"""
+
+INSERT_FIX_QUERY = """
+    INSERT IGNORE INTO storm_track
+        (storm_id, observed_at, latitude, longitude, wind_kmh, radius_km, warning_radius_km)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+ENCOUNTERS_QUERY = """
+    SELECT ship_name, imo, storm_id, zone, encounter_at, storm_delay_hours, delay_hours
+    FROM storm_encounters
+"""
+
+STORM_ENCOUNTERS_QUERY = """
+    SELECT ship_name, imo, zone, encounter_at, storm_delay_hours
+    FROM storm_encounters
+    WHERE storm_id = %s
+    ORDER BY encounter_at, ship_name
+    LIMIT %s
+"""
+
+UPSERT_ENCOUNTER_QUERY = """
+    INSERT INTO storm_encounters
+        (ship_name, imo, storm_id, zone, encounter_at, storm_delay_hours, delay_hours, computed_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        storm_id = VALUES(storm_id), zone = VALUES(zone), encounter_at = VALUES(encounter_at),
+        storm_delay_hours = VALUES(storm_delay_hours), delay_hours = VALUES(delay_hours),
+        computed_at = VALUES(computed_at)
+"""
+
+DELETE_ENCOUNTER_QUERY = "DELETE FROM storm_encounters WHERE ship_name = %s AND imo = %s"
+
+# (delay_hours, reason, ship_name, imo) rows, one statement per chunk
+UPDATE = BulkUpdate(
+    "eta_results",
+    columns=("delay_hours", "reason"),
+    keys=("t.ship_name", "COALESCE(t.IMO, 0)"),
+    extra="updated_at = NOW()",
+)
+
+
+class StormForecast(NamedTuple):
+    """Forecast of every tracked storm at ``hours`` after the scan time."""
+    storm_ids: np.ndarray
+    names: list
+    hours: np.ndarray              # (k,) lead times from the scan
+    lat: np.ndarray                # (storms, k)
+    lng: np.ndarray                # (storms, k)
+    cone_km: np.ndarray            # (storms, k) uncertainty added to both radii
+    radius_km: np.ndarray
+    warning_radius_km: np.ndarray
+    speed_kmh: np.ndarray
+    bearing_deg: np.ndarray
+
+
+class Encounters(NamedTuple):
+    """Per-ship forecast encounters; all arrays have one entry per ship."""
+    storm: np.ndarray              # index into the forecast's storms, -1 if none is met
+    hours: np.ndarray              # lead time of the first step inside its warning zone
+    core: np.ndarray               # the track also enters that storm's core
+    delay_hours: np.ndarray        # expected hours lost, over every storm met
+    candidates: int                # ship/storm pairs left after bounding-box pruning
+
+
+def _float(value):
+    return np.nan if value is None else float(value)
+
+
+def _same_fix(fix, storm):
+    return all(
+        (fix[field] is None and storm[field] is None)
+        or (fix[field] is not None and storm[field] is not None
+            and round(float(fix[field]), 4) == round(float(storm[field]), 4))
+        for field in FIX_COLUMNS[2:]
+    )
+
+
+async def db_now(repo):
+    return (await repo.fetch_one(NOW_QUERY))["db_now"]
+
+
+async def load_fixes(repo, now, window_hours=STORM_TRACK_WINDOW_HOURS):
+    """
+    ``(storms, fixes, pending)``: the storm_info rows, each storm's fixes
+    from the last ``window_hours`` (oldest first) and, as rows for
+    INSERT_FIX_QUERY, the current storm_info positions that differ from the
+    latest recorded fix. Those are appended to ``fixes`` as observed ``now``.
+    """
+    storms = await repo.fetch_all(STORMS_QUERY)
+    fixes = {}
+    for row in await repo.fetch_all(FIXES_QUERY, (now - timedelta(hours=window_hours),)):
+        fixes.setdefault(row["storm_id"], []).append(row)
+
+    pending = []
+    for storm in storms:
+        track = fixes.setdefault(storm["id"], [])
+        if storm["latitude"] is None or storm["longitude"] is None:
+            continue
+        if not track or not _same_fix(track[-1], storm):
+            fix = dict(zip(FIX_COLUMNS, (storm["id"], now)), **{field: storm[field] for field in FIX_COLUMNS[2:]})
+            track.append(fix)
+            pending.append(tuple(fix[column] for column in FIX_COLUMNS))
+    return storms, fixes, pending
+
+
+async def record_fixes(repo):
+    """Append a storm_track fix for every storm that moved or changed size. Returns the count."""
+    _, _, pending = await load_fixes(repo, await db_now(repo))
+    if pending:
+        await repo.execute_many(INSERT_FIX_QUERY, pending)
+    return len(pending)
+
+
+def fit_motion(hours, lat, lng):
+    """
+    Velocity ``(north, east)`` in km/h fitted by least squares to fixes at
+    ``hours``, on a flat projection around the last fix. Zero for fewer
+    than two distinct times.
+    """
+    hours = np.asarray(hours, dtype=np.float64)
+    if hours.size < 2 or np.ptp(hours) <= 0:
+        return 0.0, 0.0
+    north = np.radians(lat - lat[-1]) * EARTH_RADIUS_KM
+    east = np.radians((lng - lng[-1] + 180.0) % 360.0 - 180.0) * EARTH_RADIUS_KM * np.cos(np.radians(lat[-1]))
+    t = hours - hours.mean()
+    scale = (t * t).sum()
+    return float((t * north).sum() / scale), float((t * east).sum() / scale)
+
+
+def advance(lat, lng, bearing, distance_km):
+    """
+    Points ``distance_km`` (n, k) along the great circle leaving each
+    (lat, lng) (n,) on initial ``bearing`` (radians), as lat/lng arrays.
+    """
+    start = to_unit_vectors(lat, lng).reshape(-1, 3)
+    phi, lam = np.radians(lat), np.radians(lng)
+    east = np.stack((-np.sin(lam), np.cos(lam), np.zeros_like(lam)), axis=-1)
+    north = np.stack((-np.sin(phi) * np.cos(lam), -np.sin(phi) * np.sin(lam), np.cos(phi)), axis=-1)
+    direction = north * np.cos(bearing)[:, None] + east * np.sin(bearing)[:, None]
+    angle = np.asarray(distance_km, dtype=np.float64) / EARTH_RADIUS_KM
+    return to_lat_lng(start[:, None, :] * np.cos(angle)[..., None] + direction[:, None, :] * np.sin(angle)[..., None])
+
+
+def forecast_storms(storms, fixes, now, hours, max_fixes=STORM_TRACK_FIXES, cone_rate=STORM_CONE_KM_PER_HOUR,
+                    untracked_cone_rate=STORM_UNTRACKED_CONE_KM_PER_HOUR):
+    """
+    Extrapolate each storm's fitted velocity from its latest fix to ``hours``
+    after ``now``. The cone grows with the time since the latest fix, so a
+    stale fix gets a wider cone. Radii are those of the latest fix.
+    """
+    hours = np.asarray(hours, dtype=np.float64)
+    ids, names, rows = [], [], []
+    for storm in storms:
+        track = fixes.get(storm["id"], [])[-max_fixes:]
+        if track:
+            ids.append(storm["id"])
+            names.append(storm["name"])
+            rows.append(track)
+
+    s = len(rows)
+    latest = [track[-1] for track in rows]
+    lat = np.array([_float(fix["latitude"]) for fix in latest])
+    lng = np.array([_float(fix["longitude"]) for fix in latest])
+    age = np.array([(now - fix["observed_at"]).total_seconds() / 3600.0 for fix in latest])
+    velocity = np.zeros((s, 2))
+    rate = np.full(s, untracked_cone_rate, dtype=np.float64)
+    for i, track in enumerate(rows):
+        times = np.array([(fix["observed_at"] - track[-1]["observed_at"]).total_seconds() / 3600.0
+                          for fix in track])
+        if times.size > 1 and np.ptp(times) > 0:
+            velocity[i] = fit_motion(times, np.array([_float(f["latitude"]) for f in track]),
+                                     np.array([_float(f["longitude"]) for f in track]))
+            rate[i] = cone_rate
+
+    lead = np.maximum(age, 0.0)[:, None] + hours[None, :]
+    speed = np.hypot(velocity[:, 0], velocity[:, 1])
+    bearing = np.arctan2(velocity[:, 1], velocity[:, 0])
+    track_lat, track_lng = advance(lat, lng, bearing, speed[:, None] * lead)
+    return StormForecast(
+        np.array(ids, dtype=np.int64), names, hours, track_lat.reshape(s, hours.size), track_lng.reshape(s, hours.size),
+        rate[:, None] * lead,
+        np.nan_to_num(np.array([_float(fix["radius_km"]) for fix in latest])),
+        np.nan_to_num(np.array([_float(fix["warning_radius_km"]) for fix in latest])),
+        speed, np.degrees(bearing) % 360.0
+    )
+
+
+def _box(lat_min, lat_max, lng_min, lng_max, reach_km):
+    """
+    Boxes ``(lat_min, lat_max, lng_min, lng_max)`` around latitude and
+    unwrapped longitude ranges, widened by ``reach_km``. Longitudes start in
+    [-180, 180) and may run past 180; boxes reaching a pole span every longitude.
+    """
+    reach = reach_km / KM_PER_DEGREE
+    lat_min, lat_max = lat_min - reach, lat_max + reach
+    edge = np.maximum(np.abs(lat_min), np.abs(lat_max))
+    with np.errstate(divide="ignore"):
+        widen = reach / np.cos(np.radians(np.minimum(edge, 90.0)))
+    lng_min, lng_max = lng_min - widen, lng_max + widen
+    shift = np.floor((lng_min + 180.0) / 360.0) * 360.0
+    lng_min, lng_max = lng_min - shift, lng_max - shift
+    full = (edge >= 89.0) | (lng_max - lng_min >= 360.0)
+    return lat_min, lat_max, np.where(full, -180.0, lng_min), np.where(full, 180.0, lng_max)
+
+
+def _cone_boxes(lat, lng, reach_km):
+    """Box around each storm's forecast positions (storms, k) and cone-widened reach."""
+    # Unwrap longitudes along each track so one crossing 180 stays contiguous
+    turn = (np.diff(lng, axis=1) + 180.0) % 360.0 - 180.0
+    lng = np.concatenate((lng[:, :1], lng[:, :1] + np.cumsum(turn, axis=1)), axis=1)
+    return _box(lat.min(axis=1), lat.max(axis=1), lng.min(axis=1), lng.max(axis=1), reach_km.max(axis=1))
+
+
+def _track_boxes(lat, lng, pad_km):
+    """
+    Box around each ship's track in each window, from its positions at the
+    window edges (n, windows + 1). Returns (windows, n) arrays.
+    """
+    lat, lng = np.ascontiguousarray(lat.T), np.ascontiguousarray(lng.T)
+    turn = (lng[1:] - lng[:-1] + 180.0) % 360.0 - 180.0
+    return _box(np.minimum(lat[:-1], lat[1:]), np.maximum(lat[:-1], lat[1:]),
+                lng[:-1] + np.minimum(turn, 0.0), lng[:-1] + np.maximum(turn, 0.0), pad_km)
+
+
+def _overlaps(a, b):
+    """(len(a), len(b)) mask of overlapping boxes, allowing for the antimeridian."""
+    hit = (a[0][:, None] <= b[1][None, :]) & (b[0][None, :] <= a[1][:, None])
+    # Boxes start in [-180, 180); only one running past 180 can meet another shifted by 360
+    shifts = [0.0]
+    if (a[3] > 180.0).any():
+        shifts.append(-360.0)
+    if (b[3] > 180.0).any():
+        shifts.append(360.0)
+    across = np.zeros_like(hit)
+    for shift in shifts:
+        across |= (a[2][:, None] + shift <= b[3][None, :]) & (b[2][None, :] <= a[3][:, None] + shift)
+    return hit & across
+
+
+def ship_positions(routes, route_ids, lats, lngs, report_age_hours, hours_to_eta, hours, dtype=np.float64):
+    """
+    Unit vectors (n, k, 3) of ships ``hours`` (k,) or (n, k) after the scan,
+    keeping the pace that reaches port on time. Ships whose route is
+    unknown stay at their reported position.
+    """
+    points = routes.positions(route_ids, lats, lngs, hours_to_eta,
+                              np.asarray(report_age_hours)[:, None] + np.asarray(hours), dtype)
+    lost = np.isnan(points[..., 0])
+    if lost.any():
+        here = to_unit_vectors(lats, lngs).reshape(-1, 3).astype(dtype)
+        points = np.where(lost[..., None], here[:, None, :], points)
+    return points
+
+
+def find_encounters(forecast, routes, route_ids, lats, lngs, report_age_hours, hours_to_eta,
+                    warning_delay_factor=STORM_WARNING_DELAY_FACTOR, window_steps=PRUNE_WINDOW_STEPS,
+                    batch_size=32768):
+    """
+    First forecast step at which each ship is inside a storm's cone-widened
+    warning zone, before it reaches port. ``report_age_hours`` is the time
+    from each ship's position report to the scan and ``hours_to_eta`` from
+    the report to its ETA.
+
+    The horizon is cut into windows of ``window_steps`` steps. A ship is
+    checked against a storm, step by step, only in the windows where the
+    box around its track overlaps the box around the storm's cone.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    report_age_hours = np.asarray(report_age_hours, dtype=np.float64)
+    hours_to_eta = np.asarray(hours_to_eta, dtype=np.float64)
+    n, hours = lats.shape[0], forecast.hours
+    storm = np.full(n, -1, dtype=np.int64)
+    first = np.full(n, np.nan)
+    core = np.zeros(n, dtype=bool)
+    delay = np.zeros(n)
+    storms, k = forecast.lat.shape
+    if n == 0 or storms == 0 or k == 0:
+        return Encounters(storm, first, core, delay, 0)
+
+    step = float(hours[1] - hours[0]) if k > 1 else 1.0
+    # Hours from the scan until each ship reaches port; later steps are spent in port
+    at_sea = hours_to_eta - report_age_hours
+    windows = -(-k // window_steps)
+    edges = np.minimum(np.arange(windows + 1) * window_steps, k - 1)
+    spans = [slice(w * window_steps, min((w + 1) * window_steps, k)) for w in range(windows)]
+    warning_reach = np.maximum(forecast.warning_radius_km, forecast.radius_km)[:, None] + forecast.cone_km
+    storm_boxes = [_cone_boxes(forecast.lat[:, span], forecast.lng[:, span], warning_reach[:, span]) for span in spans]
+    storm_vectors = to_unit_vectors(forecast.lat, forecast.lng).astype(np.float32)
+    # Inside a zone when the dot product of unit vectors is at least the cosine of its angular radius
+    cos_core = np.cos(np.minimum((forecast.radius_km[:, None] + forecast.cone_km) / EARTH_RADIUS_KM, np.pi))
+    cos_warning = np.cos(np.minimum(warning_reach / EARTH_RADIUS_KM, np.pi))
+    cos_core, cos_warning = cos_core.astype(np.float32), cos_warning.astype(np.float32)
+    candidates = 0
+
+    for start in range(0, n, batch_size):
+        batch = np.arange(start, min(start + batch_size, n))
+        batch = batch[at_sea[batch] >= 0]
+        if batch.size == 0:
+            continue
+        # Coarse pass: one box per window around the ship's positions at its edges
+        sample = np.minimum(hours[edges][None, :], at_sea[batch, None])
+        lat, lng = to_lat_lng(ship_positions(routes, route_ids[batch], lats[batch], lngs[batch],
+                                             report_age_hours[batch], hours_to_eta[batch], sample))
+        ship_boxes = _track_boxes(lat, lng, PRUNE_PAD_KM)
+        overlap = np.stack([
+            _overlaps(storm_boxes[w], tuple(part[w] for part in ship_boxes)) for w in range(windows)
+        ])
+        candidates += int(overlap.any(axis=0).sum())
+
+        # Exact pass: every step of a candidate window, storm by storm
+        hits = []
+        for w, span in enumerate(spans):
+            near = np.flatnonzero(overlap[w].any(axis=1))
+            if near.size == 0:
+                continue
+            ships = np.flatnonzero(overlap[w, near].any(axis=0))
+            local = np.zeros(batch.size, dtype=np.int64)
+            local[ships] = np.arange(ships.size)
+            rows = batch[ships]
+            vectors = ship_positions(routes, route_ids[rows], lats[rows], lngs[rows], report_age_hours[rows],
+                                     hours_to_eta[rows], hours[span], np.float32)
+            sailing = hours[span][None, :] <= at_sea[rows][:, None]
+            for j in near.tolist():
+                candidate = local[np.flatnonzero(overlap[w, j])]
+                dot = np.einsum("msc,sc->ms", vectors[candidate], storm_vectors[j, span])
+                inside = (dot >= cos_warning[j, span]) & sailing[candidate]
+                met = inside.any(axis=1)
+                if met.any():
+                    candidate, dot, inside = candidate[met], dot[met], inside[met]
+                    inside_core = (dot >= cos_core[j, span]) & sailing[candidate]
+                    hits.append((rows[candidate], np.full(candidate.size, j), hours[span][inside.argmax(axis=1)],
+                                 inside_core.sum(axis=1), (inside & ~inside_core).sum(axis=1)))
+        if not hits:
+            continue
+
+        hit_rows, hit_storm, hit_first, core_steps, warning_steps = (np.concatenate(part) for part in zip(*hits))
+        np.add.at(delay, hit_rows, step * (core_steps + warning_delay_factor * warning_steps))
+        # Earliest storm per ship: sort by (ship, time) and keep each ship's first hit
+        order = np.lexsort((hit_first, hit_rows))
+        keep = order[np.r_[True, hit_rows[order][1:] != hit_rows[order][:-1]]]
+        storm[hit_rows[keep]] = hit_storm[keep]
+        first[hit_rows[keep]] = hit_first[keep]
+        # The core flag is for that storm over all windows
+        pair = hit_rows * storms + hit_storm
+        core[hit_rows[keep]] = np.isin(pair[keep], pair[core_steps > 0])
+
+    return Encounters(storm, first, core, delay, candidates)
+
+
+def forecast_reason(name, when, core):
+    return f"{FORECAST_REASON}{name} at {when:%Y-%m-%d %H:%M}" + (" (core)" if core else "")
+
+
+def _reason(current, encounter_reason):
+    """Storms a ship is in now (hazard reasons) outrank forecasts; stale forecasts are cleared."""
+    if current and current.startswith((CORE_REASON, WARNING_REASON)):
+        return current
+    if encounter_reason is not None:
+        return encounter_reason
+    if current and current.startswith(FORECAST_REASON):
+        return None
+    return current
+
+
+def _round(value):
+    return None if value is None else round(float(value), 2)
+
+
+def _settled(prior, storm_id, zone, when, extra, step=STORM_FORECAST_STEP_HOURS):
+    """
+    Whether a recorded encounter still stands: same storm and zone, time and
+    delay within one step. Writes move ``updated_at``, which the projection
+    takes as the position report time, so rescans jitter by up to a step.
+    """
+    return (prior is not None and prior["storm_id"] == storm_id and prior["zone"] == zone
+            and abs((prior["encounter_at"] - when).total_seconds()) <= step * 3600
+            and abs(float(prior["storm_delay_hours"]) - extra) <= step)
+
+
+async def scan_encounters(repo, dry_run=False, update_status=True):
+    """
+    Forecast every storm, find each ship's first encounter and write back
+    ``reason`` and ``delay_hours`` for the rows that changed. The storm
+    delay each row carries is kept in storm_encounters, so a rescan replaces
+    it rather than adding to it, and a delay rewritten since (e.g. by the
+    ETA pipeline) is taken as the new base. Status is re-derived afterwards
+    by the hazard engine. Returns a summary dict.
+    """
+    await fleet_state.sync(repo, max_age=0)
+    await port_index.ensure_loaded(repo)
+    now = await db_now(repo)
+    storms, fixes, pending = await load_fixes(repo, now)
+    if pending and not dry_run:
+        await repo.execute_many(INSERT_FIX_QUERY, pending)
+
+    hours = np.arange(0.0, STORM_FORECAST_HOURS + STORM_FORECAST_STEP_HOURS / 2, STORM_FORECAST_STEP_HOURS)
+    forecast = forecast_storms(storms, fixes, now, hours)
+    columns = fleet_state.columns
+    slots = columns.live_slots()
+    scan_time = np.datetime64(now, "us")
+    slots = slots[columns.dates["eta_expected"][slots] > scan_time]
+    reported = columns.dates["updated_at"][slots]
+    age = np.maximum(np.nan_to_num((scan_time - reported) / np.timedelta64(1, "h")), 0.0)
+    to_eta = age + (columns.dates["eta_expected"][slots] - scan_time) / np.timedelta64(1, "h")
+
+    started = time.perf_counter()
+    encounters = await asyncio.get_running_loop().run_in_executor(None, functools.partial(
+        find_encounters, forecast, route_table, route_table.slot_route_ids(columns, slots),
+        columns.floats["latitude"][slots], columns.floats["longitude"][slots], age, to_eta
+    ))
+    scan_ms = (time.perf_counter() - started) * 1000
+
+    previous = {(row["ship_name"], row["imo"]): row for row in await repo.fetch_all(ENCOUNTERS_QUERY)}
+    current_delays = columns.values("delay_hours", slots)
+    current_reasons = columns.values("reason", slots)
+    updates, upserts, deletes = [], [], []
+    for i, slot in enumerate(slots.tolist()):
+        key = columns.keys[slot]
+        prior = previous.pop(key, None)
+        current = _round(current_delays[i])
+        base = current
+        if prior is not None and current is not None and current == _round(prior["delay_hours"]):
+            base = round(current - float(prior["storm_delay_hours"]), 2)
+
+        j = encounters.storm[i]
+        if j >= 0:
+            storm_id = int(forecast.storm_ids[j])
+            when = now + timedelta(hours=float(encounters.hours[i]))
+            zone = "core" if encounters.core[i] else "warning"
+            extra = round(float(encounters.delay_hours[i]), 2)
+            if _settled(prior, storm_id, zone, when, extra):
+                when, extra = prior["encounter_at"], _round(prior["storm_delay_hours"])
+            delay = round((base or 0.0) + extra, 2)
+            reason = _reason(current_reasons[i], forecast_reason(forecast.names[j], when, encounters.core[i]))
+            row = (storm_id, zone, when, extra, delay)
+            if prior is None or row != (prior["storm_id"], prior["zone"], prior["encounter_at"],
+                                        _round(prior["storm_delay_hours"]), _round(prior["delay_hours"])):
+                upserts.append(key + row + (now,))
+        else:
+            delay = base
+            reason = _reason(current_reasons[i], None)
+            if prior is not None:
+                deletes.append(key)
+        if (delay, reason) != (current, current_reasons[i]):
+            updates.append((delay, reason) + key)
+    # Ships no longer at sea keep their last delay
+    deletes.extend(previous)
+
+    written = 0
+    if not dry_run:
+        if updates:
+            written = await repo.update_many(UPDATE, updates)
+        if upserts:
+            await repo.execute_many(UPSERT_ENCOUNTER_QUERY, upserts)
+        if deletes:
+            await repo.execute_many(DELETE_ENCOUNTER_QUERY, deletes)
+        if written and update_status:
+            await recompute_hazards(repo)
+
+    return {
+        "ships": int(slots.size),
+        "storms": len(forecast.storm_ids),
+        "fixes_recorded": 0 if dry_run else len(pending),
+        "candidate_pairs": encounters.candidates,
+        "encounters": int((encounters.storm >= 0).sum()),
+        "core": int(encounters.core.sum()),
+        "scan_ms": round(scan_ms, 1),
+        "changed": len(updates),
+        "written": written,
+        "dry_run": dry_run,
+    }
+
+
+async def load_forecast(repo, storm_id, limit=100):
+    """
+    Recorded fixes, forecast track with its cone and the first ``limit``
+    forecast encounters of one storm, or None if there is no such storm.
+    """
+    now = await db_now(repo)
+    storms, fixes, _ = await load_fixes(repo, now)
+    storm = next((row for row in storms if row["id"] == storm_id), None)
+    if storm is None:
+        return None
+    hours = np.arange(0.0, STORM_FORECAST_HOURS + STORM_FORECAST_STEP_HOURS / 2, STORM_FORECAST_STEP_HOURS)
+    forecast = forecast_storms([storm], fixes, now, hours)
+    track = []
+    if forecast.storm_ids.size:
+        radius, warning = float(forecast.radius_km[0]), float(forecast.warning_radius_km[0])
+        track = [
+            {"time": now + timedelta(hours=h), "latitude": round(lat, 5), "longitude": round(lng, 5),
+             "radius_km": round(radius + cone, 1), "warning_radius_km": round(warning + cone, 1)}
+            for h, lat, lng, cone in zip(hours.tolist(), forecast.lat[0].tolist(),
+                                         forecast.lng[0].tolist(), forecast.cone_km[0].tolist())
+        ]
+    encounters = await repo.fetch_all(STORM_ENCOUNTERS_QUERY, (storm_id, limit))
+    return {
+        "storm": storm,
+        "speed_kmh": round(float(forecast.speed_kmh[0]), 1) if track else None,
+        "bearing_deg": round(float(forecast.bearing_deg[0]), 1) if track else None,
+        "fixes": [{column: fix[column] for column in FIX_COLUMNS[1:]} for fix in fixes.get(storm_id, [])],
+        "forecast": track,
+        "encounters": encounters,
+    }
+
+
+def main():
+    import argparse
+    import json
+
+    from db.database import close_pool, init_pool
+    from db.repository import close_repository, init_repository
+
+    parser = argparse.ArgumentParser(description="Record storm fixes and forecast ship encounters.")
+    parser.add_argument("command", choices=("record", "scan"))
+    parser.add_argument("--dry-run", action="store_true", help="scan: compute but do not write back")
+    parser.add_argument("--skip-status", action="store_true", help="scan: do not re-derive status afterwards")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def run():
+        init_pool()
+        repo = init_repository()
+        try:
+            if args.command == "record":
+                return {"fixes_recorded": await record_fixes(repo)}
+            return await scan_encounters(repo, dry_run=args.dry_run, update_status=not args.skip_status)
+        finally:
+            close_repository()
+            close_pool()
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Voyage progress along great-circle routes between sea_ports.
+
+Each port pair's route is set up once per port index version. The
+RouteTable keeps the origin's unit vector, the unit tangent there pointing
+towards the destination, and the route's angular length. A ship's progress
+is the along-track projection of its position onto that great circle. This
+is plain array arithmetic, so the whole fleet is done in one pass. Drawable
+polylines of ROUTE_WAYPOINTS segments are built per pair on first request.
+Routes follow the great circle, not sea lanes, so they may cross land.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+from services.hazard import EARTH_RADIUS_KM, to_unit_vectors
+from services.port_index import normalize_port_name, port_index
+
+# Segments in a route polyline returned by /api/routes
+ROUTE_WAYPOINTS = int(os.getenv('ROUTE_WAYPOINTS', '32'))
+# Hours after a ship's last position report at which projected positions are given
+ROUTE_PROJECTION_HOURS = tuple(float(h) for h in os.getenv('ROUTE_PROJECTION_HOURS', '6,12,24').split(','))
+
+
+def to_lat_lng(vectors):
+    """Convert unit vectors (..., 3) back to degree latitude and longitude arrays."""
+    lat = np.degrees(np.arcsin(np.clip(vectors[..., 2], -1.0, 1.0)))
+    lng = np.degrees(np.arctan2(vectors[..., 1], vectors[..., 0]))
+    return lat, lng
+
+
+def _number(value, digits):
+    return "null" if value != value else repr(round(value, digits))
+
+
+class RouteTable:
+    """
+    Great-circle routes keyed by (origin, destination) port, with route ids
+    indexing parallel arrays. Rebuilt when ``version()`` changes.
+    """
+
+    def __init__(self, coordinates=None, version=None, waypoints=ROUTE_WAYPOINTS,
+                 projection_hours=ROUTE_PROJECTION_HOURS):
+        self._coordinates = coordinates or port_index.coordinates
+        self._version_fn = version or (lambda: port_index.version)
+        self.waypoints = waypoints
+        self.projection_hours = np.array(projection_hours, dtype=np.float64)
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, version):
+        self._version = version
+        self._ids = {}                       # (origin key, destination key) -> route id
+        self._origin = np.empty((0, 3))      # unit vector of the origin port
+        self._tangent = np.empty((0, 3))     # unit tangent at the origin, towards the destination
+        self._angle = np.empty(0)            # route length in radians; NaN if a port is unknown
+        self._paths = {}                     # route id -> polyline JSON bytes
+        self._built = 0
+
+    def route_ids(self, origins, destinations):
+        """Route id per (origin, destination) name pair, building routes not seen before."""
+        with self._lock:
+            version = self._version_fn()
+            if version != self._version:
+                self._reset(version)
+            keys = [(normalize_port_name(a), normalize_port_name(b)) for a, b in zip(origins, destinations)]
+            missing = list(dict.fromkeys(key for key in keys if key not in self._ids))
+            if missing:
+                self._add(missing)
+            ids = self._ids
+            return np.array([ids[key] for key in keys], dtype=np.int64)
+
+    def _add(self, keys):
+        start = np.array([self._coordinates(a) for a, _ in keys], dtype=np.float64)
+        end = np.array([self._coordinates(b) for _, b in keys], dtype=np.float64)
+        origin = to_unit_vectors(start[:, 0], start[:, 1]).reshape(-1, 3)
+        destination = to_unit_vectors(end[:, 0], end[:, 1]).reshape(-1, 3)
+        cos_angle = np.clip(np.einsum("ij,ij->i", origin, destination), -1.0, 1.0)
+        # Component of the destination orthogonal to the origin gives the direction of travel
+        tangent = destination - origin * cos_angle[:, None]
+        norm = np.linalg.norm(tangent, axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            tangent = np.where(norm[:, None] > 1e-12, tangent / norm[:, None], 0.0)
+
+        first = len(self._angle)
+        self._origin = np.concatenate((self._origin, origin))
+        self._tangent = np.concatenate((self._tangent, tangent))
+        self._angle = np.concatenate((self._angle, np.arccos(cos_angle)))
+        self._ids.update((key, first + i) for i, key in enumerate(keys))
+        self._built += len(keys)
+
+    def slot_route_ids(self, columns, slots):
+        """Route id per fleet state slot, resolving each distinct port pair once."""
+        ports = columns.table("port_from")
+        size = len(ports)
+        pairs = columns.codes["port_from"][slots].astype(np.int64) * size + columns.codes["port_to"][slots]
+        unique, inverse = np.unique(pairs, return_inverse=True)
+        ids = self.route_ids([ports.values[pair // size] for pair in unique.tolist()],
+                             [ports.values[pair % size] for pair in unique.tolist()])
+        return ids[inverse]
+
+    def _along(self, route_ids, lats, lngs):
+        """Route geometry per ship and the angle (radians) covered along the route."""
+        origin, tangent, angle = self._origin[route_ids], self._tangent[route_ids], self._angle[route_ids]
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        position = to_unit_vectors(np.nan_to_num(lats), np.nan_to_num(lngs)).reshape(-1, 3)
+        along = np.arctan2(np.einsum("ij,ij->i", position, tangent), np.einsum("ij,ij->i", position, origin))
+        along = np.clip(along, 0.0, angle)
+        along[np.isnan(lats) | np.isnan(lngs)] = 0.0
+        return origin, tangent, angle, along
+
+    @staticmethod
+    def _ahead(origin, tangent, angle, along, hours_to_eta, hours, dtype=np.float64):
+        hours_to_eta = np.asarray(hours_to_eta, dtype=np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rate = np.where(hours_to_eta > 0, (angle - along) / hours_to_eta, np.nan)  # radians per hour
+        ahead = np.minimum(along[:, None] + rate[:, None] * hours, angle[:, None]).astype(dtype, copy=False)
+        origin, tangent = origin.astype(dtype, copy=False), tangent.astype(dtype, copy=False)
+        return origin[:, None, :] * np.cos(ahead)[..., None] + tangent[:, None, :] * np.sin(ahead)[..., None]
+
+    def voyages(self, route_ids, lats, lngs, hours_to_eta=None):
+        """
+        Progress of ships on their routes, as arrays: ``progress`` (0-1 of
+        the route covered), ``remaining_km`` along the route and, when
+        ``hours_to_eta`` is given, ``projected`` (n, len(projection_hours),
+        2) positions assuming the ship keeps the pace that reaches the
+        destination on time. Ships without a position count as being at
+        their origin; unknown routes give NaN.
+        """
+        origin, tangent, angle, along = self._along(route_ids, lats, lngs)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            progress = np.where(angle > 0, along / angle, 1.0)
+        progress[np.isnan(angle)] = np.nan
+        remaining = angle - along
+        result = {"progress": progress, "remaining_km": remaining * EARTH_RADIUS_KM}
+
+        if hours_to_eta is not None:
+            points = self._ahead(origin, tangent, angle, along, hours_to_eta, self.projection_hours[None, :])
+            lat, lng = to_lat_lng(points)
+            result["projected"] = np.stack((lat, lng), axis=-1)
+        return result
+
+    def positions(self, route_ids, lats, lngs, hours_to_eta, hours, dtype=np.float64):
+        """
+        Unit vectors (n, k, 3) of ships ``hours`` (k,) or (n, k) after their
+        position report, at the same pace as ``voyages``; NaN for unknown
+        routes and ships already due. float32 is plenty for proximity tests.
+        """
+        origin, tangent, angle, along = self._along(route_ids, lats, lngs)
+        return self._ahead(origin, tangent, angle, along, hours_to_eta, np.asarray(hours, dtype=np.float64), dtype)
+
+    def encode(self, voyages):
+        """One JSON object fragment per ship for the arrays returned by ``voyages``."""
+        progress = np.round(voyages["progress"], 4)
+        remaining = np.round(voyages["remaining_km"], 1)
+        projected = voyages.get("projected")
+        # repr over whole columns and one %-template per row keep this out of per-value Python code
+        columns = [list(map(repr, progress.tolist())), list(map(repr, remaining.tolist()))]
+        if projected is None:
+            template = '{"progress":%s,"remaining_km":%s,"projected":null}'
+            broken = np.isnan(progress) | np.isnan(remaining)
+        else:
+            points = np.round(projected, 5).reshape(len(progress), -1)
+            columns.extend(list(map(repr, points[:, k].tolist())) for k in range(points.shape[1]))
+            template = ('{"progress":%s,"remaining_km":%s,"projected":['
+                        + ",".join(["[%s,%s]"] * projected.shape[1]) + "]}")
+            broken = np.isnan(progress) | np.isnan(remaining) | np.isnan(points).any(axis=1)
+        fragments = [template % values for values in zip(*columns)]
+
+        # JSON has no NaN: unknown routes and ships past their ETA get nulls instead
+        for i in np.flatnonzero(broken).tolist():
+            track = "null"
+            if projected is not None and not np.isnan(projected[i]).any():
+                track = "[" + ",".join("[%s,%s]" % (_number(lat, 5), _number(lng, 5))
+                                       for lat, lng in projected[i].tolist()) + "]"
+            fragments[i] = ('{"progress":%s,"remaining_km":%s,"projected":%s}'
+                            % (_number(progress[i], 4), _number(remaining[i], 1), track))
+        return fragments
+
+    def path(self, origin, destination):
+        """
+        ``{"port_from", "port_to", "distance_km", "waypoints"}`` for a port
+        pair as JSON bytes, or None if either port is unknown.
+        """
+        route_id = int(self.route_ids([origin], [destination])[0])
+        body = self._paths.get(route_id)
+        if body is None:
+            angle = self._angle[route_id]
+            if np.isnan(angle):
+                return None
+            steps = np.linspace(0.0, angle, self.waypoints + 1)
+            points = (self._origin[route_id] * np.cos(steps)[:, None]
+                      + self._tangent[route_id] * np.sin(steps)[:, None])
+            lat, lng = to_lat_lng(points)
+            body = json.dumps({
+                "port_from": origin,
+                "port_to": destination,
+                "distance_km": round(float(angle) * EARTH_RADIUS_KM, 1),
+                "waypoints": np.round(np.stack((lat, lng), axis=1), 5).tolist(),
+            }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            self._paths[route_id] = body
+        return body
+
+    def stats(self):
+        return {
+            "routes": len(self._angle),
+            "routes_built": self._built,
+            "paths_cached": len(self._paths),
+            "waypoints": self.waypoints,
+            "projection_hours": self.projection_hours.tolist(),
+        }
+
+
+route_table = RouteTable()
@@ -0,0 +1,619 @@
+"""
+Weather and wave observations from the ML datasets (wave_clean1.csv,
+weather_rain_clean1.csv, weather_combined.csv, weather_data_asia.csv).
+
+``ingest`` streams a CSV in chunks of typed NumPy columns and writes them
+to a directory of ``.npy`` files under WEATHER_STORE, sorted by grid point
+and time. ``WeatherDataset`` opens those files memory-mapped, so opening a
+dataset reads only its small point table and a lookup touches just the
+pages it needs. ``WeatherIndex`` answers vectorized (lat, lng, time)
+lookups across every ingested dataset.
+
+    python -m services.weather ingest ../Machine_Learning/*.csv [--load-db]
+    python -m services.weather lookup 10.5 107.2 --time 2024-09-07T06:00
+"""
+import csv
+import json
+import logging
+import math
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from itertools import islice
+
+import numpy as np
+
+from services.hazard import EARTH_RADIUS_KM, to_unit_vectors
+
+logger = logging.getLogger(__name__)
+
+# Directory holding one sub-directory of .npy columns per ingested CSV
+WEATHER_STORE = os.getenv('WEATHER_STORE', 'weather_store')
+# Grid cell size of the point index, and how far / how old an observation may be to count
+WEATHER_CELL_DEG = float(os.getenv('WEATHER_CELL_DEG', '1.0'))
+WEATHER_MAX_DISTANCE_KM = float(os.getenv('WEATHER_MAX_DISTANCE_KM', '100'))
+WEATHER_MAX_AGE_HOURS = float(os.getenv('WEATHER_MAX_AGE_HOURS', '6'))
+# Seconds between checks of WEATHER_STORE for newly ingested datasets
+WEATHER_RELOAD_INTERVAL = float(os.getenv('WEATHER_RELOAD_INTERVAL', '60'))
+
+FIELDS = ("wind_kmh", "wave_height_m", "rain_mm", "temperature_c")
+
+# Accepted CSV headers (lower-cased, spaces and punctuation as "_") per field, in preference order
+COLUMN_ALIASES = {
+    "time": ("time", "timestamp", "datetime", "date_time", "valid_time", "observed_at", "date"),
+    "latitude": ("latitude", "lat"),
+    "longitude": ("longitude", "lon", "lng", "long"),
+    "wind_kmh": ("wind_kmh", "wind_speed_kmh", "windspeed_kmh", "wind_speed_10m", "wind_speed", "windspeed", "wind"),
+    "wave_height_m": ("wave_height_m", "wave_height", "significant_wave_height", "swh", "hs"),
+    "rain_mm": ("rain_mm", "rain", "precipitation_mm", "precipitation", "precip", "rainfall"),
+    "temperature_c": ("temperature_c", "temperature_2m", "temperature", "temp_c", "temp"),
+}
+# Headers in other units: header -> (field, factor)
+SCALED_COLUMNS = {
+    "wind_ms": ("wind_kmh", 3.6),
+    "wind_speed_ms": ("wind_kmh", 3.6),
+    "wind_speed_m_s": ("wind_kmh", 3.6),
+    "windspeed_ms": ("wind_kmh", 3.6),
+    "wind_knots": ("wind_kmh", 1.852),
+    "wind_speed_kn": ("wind_kmh", 1.852),
+}
+# Day-first formats tried when a timestamp is not ISO 8601
+TIME_FORMATS = ("%d/%m/%Y %H:%M:%S", "%d/%m/%Y %H:%M", "%d/%m/%Y", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M",
+                "%Y/%m/%d")
+
+# Observation points are de-duplicated at 1e-4 degrees (about 11 m)
+_POINT_SCALE = 10000
+_LNG_SPAN = 360 * _POINT_SCALE + 1
+# Row key: point id in the high bits, seconds since the dataset's first observation in the low 40
+_TIME_BITS = 40
+_TIME_MASK = (1 << _TIME_BITS) - 1
+_NAT = np.iinfo(np.int64).min
+
+INSERT_QUERY = """
+    INSERT INTO weather_observations
+        (source, observed_at, latitude, longitude, wind_kmh, wave_height_m, rain_mm, temperature_c)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def _normalize(header):
+    return "_".join("".join(c if c.isalnum() else " " for c in header.lower()).split())
+
+
+def resolve_columns(header, overrides=None):
+    """
+    Map CSV columns to fields: returns ``{field: (column index, factor)}``.
+    ``overrides`` maps a header to ``(field, factor)`` for files whose
+    headers are not in COLUMN_ALIASES.
+    """
+    keys = [_normalize(name) for name in header]
+    mapping = {}
+    for name, (field, factor) in (overrides or {}).items():
+        if _normalize(name) not in keys:
+            raise ValueError(f"Column {name!r} not found in {header}")
+        mapping[field] = (keys.index(_normalize(name)), factor)
+    for field, aliases in COLUMN_ALIASES.items():
+        if field in mapping:
+            continue
+        for alias in aliases:
+            if alias in keys:
+                mapping[field] = (keys.index(alias), 1.0)
+                break
+        else:
+            for alias, (target, factor) in SCALED_COLUMNS.items():
+                if target == field and alias in keys:
+                    mapping[field] = (keys.index(alias), factor)
+                    break
+
+    missing = [field for field in ("time", "latitude", "longitude") if field not in mapping]
+    if missing:
+        raise ValueError(f"No column for {', '.join(missing)} in {header}")
+    if not any(field in mapping for field in FIELDS):
+        raise ValueError(f"No weather column ({', '.join(FIELDS)}) in {header}")
+    return mapping
+
+
+def _parse_time(value):
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        for fmt in TIME_FORMATS:
+            try:
+                parsed = datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+        else:
+            try:
+                return datetime.utcfromtimestamp(float(value))
+            except (ValueError, OverflowError):
+                return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_times(values):
+    """Epoch seconds (int64) for a list of timestamp strings; _NAT where unparseable."""
+    try:
+        # Fast path: ISO 8601 without an offset, parsed by NumPy in one call
+        return np.array(values, dtype="datetime64[s]").astype(np.int64)
+    except ValueError:
+        parsed = (_parse_time(value) for value in values)
+        return np.array([_NAT if dt is None else int(np.datetime64(dt, "s").astype(np.int64)) for dt in parsed],
+                        dtype=np.int64)
+
+
+def parse_floats(values, factor=1.0):
+    """Float64 array for a list of numeric strings; NaN where blank or invalid."""
+    try:
+        array = np.array(values, dtype=np.float64)
+    except ValueError:
+        array = np.empty(len(values))
+        for i, value in enumerate(values):
+            try:
+                array[i] = float(value)
+            except ValueError:
+                array[i] = np.nan
+    return array * factor if factor != 1.0 else array
+
+
+def _column(rows, index):
+    try:
+        return [row[index] for row in rows]
+    except IndexError:
+        return [row[index] if index < len(row) else "" for row in rows]
+
+
+def _source_signature(path):
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def ingest(path, store=WEATHER_STORE, name=None, overrides=None, chunk_rows=200000, force=False):
+    """
+    Convert one CSV into a dataset directory under ``store`` and return its
+    metadata. Rows without a time or position are skipped. A file that has
+    not changed since its last ingest is not read again unless ``force``.
+    """
+    name = name or os.path.splitext(os.path.basename(path))[0]
+    target = os.path.join(store, name)
+    source = _source_signature(path)
+    meta_path = os.path.join(target, "meta.json")
+    if not force and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get("source") == source:
+            return {**meta, "skipped": True}
+
+    started = time.perf_counter()
+    building = target + ".tmp"
+    shutil.rmtree(building, ignore_errors=True)
+    os.makedirs(building)
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        mapping = resolve_columns(header, overrides)
+        fields = [field for field in FIELDS if field in mapping]
+        raw = {column: open(os.path.join(building, column + ".raw"), "wb")
+               for column in ("time", "latitude", "longitude", *fields)}
+        rows_read = rows_kept = 0
+        try:
+            while True:
+                chunk = list(islice(reader, chunk_rows))
+                if not chunk:
+                    break
+                rows_read += len(chunk)
+                times = parse_times(_column(chunk, mapping["time"][0]))
+                lats = parse_floats(_column(chunk, mapping["latitude"][0]))
+                lngs = parse_floats(_column(chunk, mapping["longitude"][0]))
+                keep = (times != _NAT) & ~np.isnan(lats) & ~np.isnan(lngs)
+                rows_kept += int(keep.sum())
+                raw["time"].write(times[keep].tobytes())
+                raw["latitude"].write(lats[keep].tobytes())
+                raw["longitude"].write(lngs[keep].tobytes())
+                for field in fields:
+                    index, factor = mapping[field]
+                    values = parse_floats(_column(chunk, index), factor)[keep]
+                    raw[field].write(values.astype(np.float32).tobytes())
+        finally:
+            for f in raw.values():
+                f.close()
+
+    if rows_kept == 0:
+        shutil.rmtree(building, ignore_errors=True)
+        raise ValueError(f"No usable rows in {path}")
+    meta = _build(building, fields)
+    meta.update({
+        "name": name,
+        "source": source,
+        "columns": {field: header[mapping[field][0]] for field in ("time", "latitude", "longitude", *fields)},
+        "rows_read": rows_read,
+        "rows_skipped": rows_read - rows_kept,
+        "ingest_s": round(time.perf_counter() - started, 3),
+    })
+    with open(os.path.join(building, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    # Swap the finished directory in, so readers never see a partial dataset
+    if os.path.exists(target):
+        old = target + ".old"
+        shutil.rmtree(old, ignore_errors=True)
+        os.replace(target, old)
+        os.replace(building, target)
+        shutil.rmtree(old, ignore_errors=True)
+    else:
+        os.replace(building, target)
+    logger.info("Ingested %s: %d rows, %d points in %.1f s", name, meta["rows"], meta["points"], meta["ingest_s"])
+    return meta
+
+
+def _build(directory, fields):
+    """Sort the raw columns by (point, time) and write them as .npy files."""
+    def raw(column, dtype):
+        return np.memmap(os.path.join(directory, column + ".raw"), dtype=dtype, mode="r")
+
+    times = raw("time", np.int64)
+    lat_keys = np.round(raw("latitude", np.float64) * _POINT_SCALE).astype(np.int64)
+    lng_keys = np.round((raw("longitude", np.float64) + 180.0) % 360.0 * _POINT_SCALE).astype(np.int64)
+    point_keys, points = np.unique((lat_keys + 90 * _POINT_SCALE) * _LNG_SPAN + lng_keys, return_inverse=True)
+    del lat_keys, lng_keys
+    points = points.reshape(-1)
+
+    first = int(times.min())
+    order = np.lexsort((times, points))
+    np.save(os.path.join(directory, "key.npy"),
+            (points[order].astype(np.int64) << _TIME_BITS) | (times[order] - first))
+    np.save(os.path.join(directory, "point_start.npy"),
+            np.concatenate([[0], np.cumsum(np.bincount(points, minlength=len(point_keys)))]).astype(np.int64))
+    np.save(os.path.join(directory, "point_lat.npy"), (point_keys // _LNG_SPAN - 90 * _POINT_SCALE) / _POINT_SCALE)
+    np.save(os.path.join(directory, "point_lng.npy"), (point_keys % _LNG_SPAN) / _POINT_SCALE - 180.0)
+    for field in fields:
+        np.save(os.path.join(directory, field + ".npy"), raw(field, np.float32)[order])
+
+    meta = {
+        "fields": list(fields),
+        "rows": len(order),
+        "points": len(point_keys),
+        "time_origin": first,
+        "time_min": str(np.datetime64(first, "s")),
+        "time_max": str(np.datetime64(int(times.max()), "s")),
+    }
+    del times, points, order
+    for name in os.listdir(directory):
+        if name.endswith(".raw"):
+            os.remove(os.path.join(directory, name))
+    return meta
+
+
+def to_epoch_seconds(times):
+    """Epoch seconds for a datetime, a datetime64 array or a sequence of datetimes."""
+    if isinstance(times, datetime):
+        times = [times]
+    return np.asarray(times, dtype="datetime64[s]").astype(np.int64)
+
+
+class WeatherDataset:
+    """One ingested CSV, opened memory-mapped."""
+
+    def __init__(self, directory, cell_deg=WEATHER_CELL_DEG):
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.name = self.meta["name"]
+        self.directory = directory
+        self.fields = tuple(self.meta["fields"])
+        self.origin = self.meta["time_origin"]
+        self.key = np.load(os.path.join(directory, "key.npy"), mmap_mode="r")
+        self.columns = {field: np.load(os.path.join(directory, field + ".npy"), mmap_mode="r")
+                        for field in self.fields}
+        # The point table is small and read on every lookup, so it is loaded outright
+        self.point_start = np.load(os.path.join(directory, "point_start.npy"))
+        self.point_lat = np.load(os.path.join(directory, "point_lat.npy"))
+        self.point_lng = np.load(os.path.join(directory, "point_lng.npy"))
+        self._vectors = to_unit_vectors(self.point_lat, self.point_lng).reshape(-1, 3)
+
+        self.cell_deg = cell_deg
+        cells = self._cells(self.point_lat, self.point_lng)
+        order = np.argsort(cells, kind="stable")
+        keys, starts = np.unique(cells[order], return_index=True)
+        self._grid = dict(zip(keys.tolist(), np.split(order, starts[1:])))
+
+    def _cells(self, lats, lngs):
+        rows = np.floor((np.asarray(lats) + 90.0) / self.cell_deg).astype(np.int64)
+        cols = np.floor((np.asarray(lngs) + 180.0) % 360.0 / self.cell_deg).astype(np.int64)
+        return rows * 100000 + cols
+
+    def nearest_points(self, lats, lngs, max_km=WEATHER_MAX_DISTANCE_KM):
+        """Index of the nearest point within ``max_km`` of each query, or -1."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        nearest = np.full(len(lats), -1, dtype=np.int64)
+        known = ~(np.isnan(lats) | np.isnan(lngs))
+        if not known.any():
+            return nearest
+
+        # Queries are grouped by cell so each group is one distance matrix
+        queries = np.flatnonzero(known)
+        vectors = np.zeros((len(lats), 3))
+        vectors[queries] = to_unit_vectors(lats[queries], lngs[queries]).reshape(-1, 3)
+        # Nearest point = largest dot product of unit vectors; compare against the chord for max_km
+        min_dot = np.cos(min(max_km / EARTH_RADIUS_KM, np.pi))
+        cells = self._cells(lats[queries], lngs[queries])
+        order = np.argsort(cells, kind="stable")
+        group_cells, starts = np.unique(cells[order], return_index=True)
+        columns = int(round(360.0 / self.cell_deg))
+        lat_ring = math.ceil(max_km / (111.2 * self.cell_deg))
+        for cell, members in zip(group_cells.tolist(), np.split(queries[order], starts[1:])):
+            row, col = divmod(cell, 100000)
+            # Degrees of longitude shrink towards the poles, so widen the search there
+            poleward = max(abs(row * self.cell_deg - 90.0), abs((row + 1) * self.cell_deg - 90.0))
+            poleward = min(poleward + lat_ring * self.cell_deg, 89.0)
+            lng_ring = math.ceil(max_km / (111.2 * self.cell_deg * max(math.cos(math.radians(poleward)), 0.02)))
+            lng_ring = min(lng_ring, columns // 2)
+            candidates = [self._grid.get((row + dr) * 100000 + (col + dc) % columns)
+                          for dr in range(-lat_ring, lat_ring + 1) for dc in range(-lng_ring, lng_ring + 1)]
+            candidates = [c for c in candidates if c is not None]
+            if not candidates:
+                continue
+            candidates = np.concatenate(candidates) if len(candidates) > 1 else candidates[0]
+            dots = vectors[members] @ self._vectors[candidates].T
+            best = np.argmax(dots, axis=1)
+            close = dots[np.arange(len(members)), best] >= min_dot
+            nearest[members[close]] = candidates[best[close]]
+        return nearest
+
+    def lookup(self, lats, lngs, times, max_km=WEATHER_MAX_DISTANCE_KM, max_age_s=WEATHER_MAX_AGE_HOURS * 3600):
+        """
+        Field arrays (float64, NaN where unknown) for parallel arrays of
+        latitudes, longitudes and epoch seconds, taken from the nearest point
+        within ``max_km`` and its observation closest in time within
+        ``max_age_s``.
+        """
+        n = len(lats)
+        result = {field: np.full(n, np.nan) for field in self.fields}
+        points = self.nearest_points(lats, lngs, max_km)
+        found = np.flatnonzero(points >= 0)
+        if len(found) == 0:
+            return result
+
+        points = points[found]
+        offsets = np.asarray(times, dtype=np.int64)[found] - self.origin
+        keys = (points << _TIME_BITS) | np.clip(offsets, 0, _TIME_MASK)
+        positions = np.searchsorted(self.key, keys)
+        low, high = self.point_start[points], self.point_start[points + 1] - 1
+        after = np.clip(positions, low, high)
+        before = np.clip(positions - 1, low, high)
+        gap_after = np.abs((self.key[after] & _TIME_MASK) - offsets)
+        gap_before = np.abs((self.key[before] & _TIME_MASK) - offsets)
+        rows = np.where(gap_after < gap_before, after, before)
+        recent = np.minimum(gap_after, gap_before) <= max_age_s
+        for field in self.fields:
+            result[field][found[recent]] = self.columns[field][rows[recent]]
+        return result
+
+    def iter_rows(self, source=None, batch=50000):
+        """Yield lists of weather_observations rows (as INSERT_QUERY parameters)."""
+        source = source or self.name
+        for start in range(0, len(self.key), batch):
+            keys = np.asarray(self.key[start:start + batch])
+            points = keys >> _TIME_BITS
+            observed = ((keys & _TIME_MASK) + self.origin).astype("datetime64[s]").tolist()
+            values = []
+            for field in FIELDS:
+                if field in self.columns:
+                    # Stored as float32; rounded so the database gets 43.2, not 43.20000076
+                    column = np.round(self.columns[field][start:start + batch].astype(np.float64), 4).tolist()
+                    values.append([None if v != v else v for v in column])
+                else:
+                    values.append([None] * len(keys))
+            yield list(zip([source] * len(keys), observed, self.point_lat[points].tolist(),
+                           self.point_lng[points].tolist(), *values))
+
+    def stats(self):
+        size = sum(os.path.getsize(os.path.join(self.directory, name)) for name in os.listdir(self.directory))
+        return {
+            "rows": self.meta["rows"],
+            "points": self.meta["points"],
+            "fields": list(self.fields),
+            "time_min": self.meta["time_min"],
+            "time_max": self.meta["time_max"],
+            "disk_bytes": size,
+        }
+
+
+class WeatherIndex:
+    """
+    Every dataset under ``path``, looked up together: each field is taken
+    from the first dataset (by name) that has a value for it. New or
+    re-ingested datasets are picked up within ``reload_interval`` seconds.
+    """
+
+    def __init__(self, path=WEATHER_STORE, max_distance_km=WEATHER_MAX_DISTANCE_KM,
+                 max_age_hours=WEATHER_MAX_AGE_HOURS, reload_interval=WEATHER_RELOAD_INTERVAL):
+        self.path = path
+        self.max_distance_km = max_distance_km
+        self.max_age_s = max_age_hours * 3600
+        self.reload_interval = reload_interval
+        self._datasets = []
+        self._signature = None
+        self._checked = None
+        self._open_time = None
+        self._lookups = 0
+        self._rows_looked_up = 0
+        self._filled = 0
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        if not os.path.isdir(self.path):
+            return {}
+        signature = {}
+        for name in sorted(os.listdir(self.path)):
+            meta = os.path.join(self.path, name, "meta.json")
+            if not name.endswith((".tmp", ".old")) and os.path.exists(meta):
+                signature[name] = os.path.getmtime(meta)
+        return signature
+
+    def open(self):
+        """(Re)open the datasets if the store changed since the last check."""
+        with self._lock:
+            self._checked = time.monotonic()
+            signature = self._scan()
+            if signature == self._signature:
+                return
+            started = time.perf_counter()
+            datasets = []
+            for name in signature:
+                try:
+                    datasets.append(WeatherDataset(os.path.join(self.path, name)))
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning("Skipping weather dataset %s: %s", name, e)
+            self._datasets = datasets
+            self._signature = signature
+            self._open_time = time.perf_counter() - started
+            if datasets:
+                logger.info("Opened %d weather datasets in %.1f ms", len(datasets), self._open_time * 1000)
+
+    @property
+    def available(self):
+        if self._checked is None or time.monotonic() - self._checked >= self.reload_interval:
+            self.open()
+        return bool(self._datasets)
+
+    def lookup(self, lats, lngs, times=None):
+        """
+        Weather at each (lat, lng, time): a dict of float64 arrays per field
+        in FIELDS, NaN where no dataset has a close enough observation.
+        ``times`` defaults to now.
+        """
+        n = len(lats)
+        if times is None:
+            times = np.full(n, int(time.time()), dtype=np.int64)
+        else:
+            times = to_epoch_seconds(times)
+        result = {field: np.full(n, np.nan) for field in FIELDS}
+        if not self.available:
+            return result
+        for dataset in self._datasets:
+            values = dataset.lookup(lats, lngs, times, self.max_distance_km, self.max_age_s)
+            for field, column in values.items():
+                missing = np.isnan(result[field])
+                result[field][missing] = column[missing]
+        self._lookups += 1
+        self._rows_looked_up += n
+        return result
+
+    def fill(self, features):
+        """Fill NaN wind_kmh / wave_height_m in a build_features dict from the datasets."""
+        wanted = np.isnan(features["wind_kmh"]) | np.isnan(features["wave_height_m"])
+        if not wanted.any() or not self.available:
+            return
+        rows = np.flatnonzero(wanted)
+        values = self.lookup(features["latitude"][rows], features["longitude"][rows])
+        for field in ("wind_kmh", "wave_height_m"):
+            column = features[field]
+            missing = np.isnan(column[rows])
+            column[rows[missing]] = values[field][missing]
+            self._filled += int((~np.isnan(values[field][missing])).sum())
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "datasets": {dataset.name: dataset.stats() for dataset in self._datasets},
+            "open_time_ms": round(self._open_time * 1000, 1) if self._open_time is not None else None,
+            "lookups": self._lookups,
+            "rows_looked_up": self._rows_looked_up,
+            "values_filled": self._filled,
+        }
+
+
+weather_index = WeatherIndex()
+
+
+async def load_into_db(repo, dataset, chunk_size=5000):
+    """Replace the dataset's rows in weather_observations; returns the rows written."""
+    await repo.execute("DELETE FROM weather_observations WHERE source = %s", (dataset.name,))
+    written = 0
+    for rows in dataset.iter_rows(batch=chunk_size * 10):
+        written += await repo.execute_many(INSERT_QUERY, rows, chunk_size)
+    return written
+
+
+def _override(value):
+    header, _, target = value.partition("=")
+    field, _, factor = target.partition("*")
+    if field not in ("time", "latitude", "longitude", *FIELDS):
+        raise ValueError(f"Unknown field {field!r}")
+    return header, (field, float(factor) if factor else 1.0)
+
+
+def main():
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Ingest and query the weather/wave CSV datasets.")
+    parser.add_argument("--store", default=WEATHER_STORE, help="dataset directory (default: WEATHER_STORE)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_cmd = commands.add_parser("ingest", help="convert CSV files into memory-mappable columns")
+    ingest_cmd.add_argument("files", nargs="+")
+    ingest_cmd.add_argument("--column", action="append", default=[], type=_override, metavar="HEADER=FIELD[*FACTOR]",
+                            help="map a CSV header to a field, e.g. 'gio_m_s=wind_kmh*3.6'")
+    ingest_cmd.add_argument("--chunk-rows", type=int, default=200000, help="CSV rows parsed per chunk")
+    ingest_cmd.add_argument("--force", action="store_true", help="re-ingest files that have not changed")
+    ingest_cmd.add_argument("--load-db", action="store_true", help="also bulk-load weather_observations")
+    ingest_cmd.add_argument("--db-chunk-size", type=int, default=5000, help="rows per insert transaction")
+
+    lookup_cmd = commands.add_parser("lookup", help="weather at a position and time")
+    lookup_cmd.add_argument("latitude", type=float)
+    lookup_cmd.add_argument("longitude", type=float)
+    lookup_cmd.add_argument("--time", type=datetime.fromisoformat, default=None, help="ISO time (default: now)")
+
+    commands.add_parser("info", help="list the ingested datasets")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "ingest":
+        overrides = dict(args.column)
+        results = {}
+        for path in args.files:
+            meta = ingest(path, args.store, overrides=overrides, chunk_rows=args.chunk_rows, force=args.force)
+            results[meta["name"]] = meta
+        if args.load_db:
+            from db.database import close_pool, init_pool
+            from db.repository import close_repository, init_repository
+
+            async def run():
+                init_pool()
+                try:
+                    repo = init_repository()
+                    return {name: await load_into_db(repo, WeatherDataset(os.path.join(args.store, name)),
+                                                     args.db_chunk_size)
+                            for name in results}
+                finally:
+                    close_repository()
+                    close_pool()
+
+            for name, written in asyncio.run(run()).items():
+                results[name]["db_rows"] = written
+        print(json.dumps(results, indent=2))
+        return
+
+    index = WeatherIndex(args.store)
+    if args.command == "lookup":
+        times = None if args.time is None else [args.time]
+        values = index.lookup(np.array([args.latitude]), np.array([args.longitude]), times)
+        print(json.dumps({field: None if np.isnan(column[0]) else round(float(column[0]), 3)
+                          for field, column in values.items()}, indent=2))
+    else:
+        index.open()
+        print(json.dumps(index.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import { fetchJSONConditional } from './http.js';
+
 // Hàm để format thời gian
 function formatDateTime(dateString) {
     if (!dateString) return 'N/A';
@@ -34,23 +36,8 @@ function getStatusStyle(status, delay) {
 // Hàm để lấy thông tin ETA từ API
 export async function fetchETAInfo(autoRefresh = false) {
     try {
-        // Thêm timestamp và no-cache headers
-        const timestamp = new Date().getTime();
-        const response = await fetch(`http://localhost:8000/api/eta?_t=${timestamp}`, {
-            method: 'GET',
-            headers: {
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            },
-            cache: 'no-store'
-        });
-
-        if (!response.ok) {
-            throw new Error('Network response was not ok');
-        }
-
-        const data = await response.json();
+        // Gửi If-None-Match: nếu dữ liệu không đổi, server trả 304 và ta dùng lại bản cũ
+        const data = await fetchJSONConditional('http://localhost:8000/api/eta');
         console.log("ETA Data from API:", data);
 
         // Normalize response shape in case backend returns an object wrapper
@@ -83,6 +70,88 @@ export async function fetchETAInfo(autoRefresh = false) {
     }
 }
 
+// Khóa định danh tàu trong stream: IMO, hoặc tên tàu nếu không có IMO
+function etaKey(eta) {
+    return eta.imo != null ? String(eta.imo) : eta.ship_name;
+}
+
+/**
+ * Nhận cập nhật ETA qua Server-Sent Events (/api/stream): snapshot khi kết nối,
+ * sau đó chỉ các dòng thay đổi. Nếu stream lỗi/không hỗ trợ thì quay về polling.
+ * @param {Function} onUpdate - gọi với (toàn bộ danh sách ETA, các dòng vừa thay đổi, các dòng đã bị xóa)
+ * @param {number} pollInterval - chu kỳ polling dự phòng (ms)
+ */
+export function subscribeETA(onUpdate, pollInterval = 5000) {
+    const rows = new Map();
+    let pollTimer = null;
+
+    const emit = (changed, removed = []) => {
+        const list = Array.from(rows.values())
+            .sort((a, b) => String(a.ship_name).localeCompare(String(b.ship_name)));
+        onUpdate(list, changed, removed);
+    };
+
+    // Replace every row; ships missing from the new list are reported as removed
+    const replaceAll = (data) => {
+        const previous = new Map(rows);
+        rows.clear();
+        data.forEach(eta => {
+            rows.set(etaKey(eta), eta);
+            previous.delete(etaKey(eta));
+        });
+        emit(data, Array.from(previous.values()));
+    };
+
+    const poll = async () => {
+        replaceAll(await fetchETAInfo());
+    };
+
+    const startPolling = () => {
+        if (pollTimer) return;
+        poll();
+        pollTimer = setInterval(poll, pollInterval);
+    };
+
+    const stopPolling = () => {
+        if (!pollTimer) return;
+        clearInterval(pollTimer);
+        pollTimer = null;
+    };
+
+    if (typeof EventSource === 'undefined') {
+        startPolling();
+        return () => stopPolling();
+    }
+
+    const source = new EventSource('http://localhost:8000/api/stream?channels=eta');
+
+    source.addEventListener('snapshot', (event) => {
+        stopPolling();
+        replaceAll(JSON.parse(event.data).eta || []);
+    });
+
+    source.addEventListener('eta', (event) => {
+        const delta = JSON.parse(event.data);
+        const removed = [];
+        delta.removed.forEach(key => {
+            if (rows.has(key)) {
+                removed.push(rows.get(key));
+                rows.delete(key);
+            }
+        });
+        delta.upserted.forEach(eta => rows.set(etaKey(eta), eta));
+        emit(delta.upserted, removed);
+    });
+
+    // EventSource tự kết nối lại; trong lúc mất kết nối thì polling thay thế
+    source.onerror = () => startPolling();
+
+    return () => {
+        source.close();
+        stopPolling();
+    };
+}
+
 // Hàm để render thông tin ETA
 export function renderETAInfo(container, etaData) {
     // Clear any existing content
@@ -266,4 +335,22 @@ export async function fetchShipETA(shipName) {
         console.error('Error fetching ship ETA:', error);
         return null;
     }
-}
\ No newline at end of file
+}
+// Lấy ETA của nhiều tàu trong một request (thay cho gọi fetchShipETA từng tàu)
+// Trả về { ships: {ten_tau: row}, imos: {imo: row}, not_found: {...} }
+export async function fetchShipETAs({ shipNames = [], imos = [] } = {}) {
+    try {
+        const response = await fetch('http://localhost:8000/api/eta/batch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ ship_names: shipNames, imos })
+        });
+        if (!response.ok) {
+            throw new Error('Network response was not ok');
+        }
+        return await response.json();
+    } catch (error) {
+        console.error('Error fetching ship ETAs:', error);
+        return null;
+    }
+}
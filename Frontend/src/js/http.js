@@ -0,0 +1,37 @@
+// =============================
+// GET CÓ ĐIỀU KIỆN (ETag / If-None-Match)
+// =============================
+
+// Lưu ETag và dữ liệu đã parse của lần tải trước theo URL
+const conditionalCache = new Map();
+
+/**
+ * Gọi GET và trả về JSON. Nếu đã có ETag từ lần trước, gửi If-None-Match;
+ * khi server trả 304 thì dùng lại dữ liệu cũ thay vì tải lại toàn bộ.
+ * @param {string} url
+ * @returns {Promise<any>} dữ liệu JSON
+ */
+export async function fetchJSONConditional(url) {
+    const cached = conditionalCache.get(url);
+    const headers = {};
+    if (cached) headers['If-None-Match'] = cached.etag;
+
+    // no-store: để trình duyệt không tự xử lý 304, ta tự quản lý bản cache
+    const response = await fetch(url, { method: 'GET', headers, cache: 'no-store' });
+
+    if (response.status === 304 && cached) {
+        return cached.data;
+    }
+    if (!response.ok) {
+        throw new Error(`Network response was not ok: ${response.status}`);
+    }
+
+    const data = await response.json();
+    const etag = response.headers.get('ETag');
+    if (etag) {
+        conditionalCache.set(url, { etag, data });
+    } else {
+        conditionalCache.delete(url);
+    }
+    return data;
+}
@@ -1,8 +1,8 @@
-import { fetchStormAlerts } from './storm.js';
+import { subscribeStormAlerts } from './storm.js';
 import { initializeMap } from './map.js';
 import { TableManager, AlertManager, initializeSearch } from './ui-managers.js';
 import { fetchAllPorts, renderPortInfo } from './port-info.js';
-import { fetchETAInfo, renderETAInfo } from './eta.js';
+import { fetchETAInfo, renderETAInfo, subscribeETA } from './eta.js';
 
 document.addEventListener('DOMContentLoaded', async () => {
     // Initialize map
@@ -20,19 +20,12 @@ document.addEventListener('DOMContentLoaded', async () => {
         const alertsContainer = document.getElementById('alerts');
         const alertManager = new AlertManager(alertsContainer);
         
-        // Fetch and render initial alerts
-        const loadAlerts = async () => {
-            const alerts = await fetchStormAlerts();
+        // Render alerts whenever the storm stream (or the 5-minute polling fallback) changes
+        subscribeStormAlerts((alerts) => {
             console.log('Received storm alerts:', alerts);
             alertsContainer.innerHTML = ''; // Clear existing alerts
             alerts.forEach(alert => alertManager.renderAlert(alert));
-        };
-        
-        // Load initial alerts
-        loadAlerts();
-        
-        // Update alerts every 5 minutes
-        setInterval(loadAlerts, 5 * 60 * 1000);
+        });
     } catch (e) {
         console.error('Error initializing alerts:', e);
     }
@@ -131,6 +124,25 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
     }, 5 * 60 * 1000);  // 5 minutes
 
-    // Start auto-refresh for ETA data
-    fetchETAInfo(true);  // true enables auto-refresh every 5 seconds
+    // Live ETA updates: server pushes only changed rows, falls back to 5-second polling
+    subscribeETA((etaData, changed, removed) => {
+        const etaContainer = document.getElementById('eta-info');
+        if (etaContainer) {
+            renderETAInfo(etaContainer, etaData);
+        }
+        if (mapManager) {
+            // Markers are keyed by ship name; keep one another row with that name still uses
+            const names = new Set(etaData.map(eta => eta.ship_name));
+            removed.forEach((eta) => {
+                if (!names.has(eta.ship_name)) {
+                    mapManager.removeShipMarker(eta.ship_name);
+                }
+            });
+            changed.forEach((eta) => {
+                if (eta.latitude != null && eta.longitude != null) {
+                    mapManager.addShipMarker(eta);
+                }
+            });
+        }
+    });
 });
\ No newline at end of file
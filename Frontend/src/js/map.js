@@ -312,6 +312,17 @@ MapManager.prototype.addShipMarker = function(ship) {
     marker.on('click', () => this.focusShip(ship.ship_name));
 };
 
+// --------------------------
+//  Xóa marker của tàu không còn trong danh sách
+// --------------------------
+MapManager.prototype.removeShipMarker = function(shipName) {
+    const marker = this.shipMarkers[shipName];
+    if (marker?.ship) {
+        marker.ship.remove();
+    }
+    delete this.shipMarkers[shipName];
+};
+
 // --------------------------
 //  Hàm tạo nội dung popup tàu (fallback)
 // --------------------------
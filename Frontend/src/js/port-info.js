@@ -1,14 +1,10 @@
+import { fetchJSONConditional } from './http.js';
+
 // API functions for ports
 export async function fetchAllPorts() {
     try {
         console.log('Fetching ports...'); // Debug log
-        const response = await fetch('http://localhost:8000/api/ports');
-        
-        if (!response.ok) {
-            throw new Error(`Network response was not ok: ${response.status}`);
-        }
-        
-        const data = await response.json();
+        const data = await fetchJSONConditional('http://localhost:8000/api/ports');
         console.log('Raw API response:', data); // Debug log
         
         // Normalize status values
@@ -1,13 +1,10 @@
+import { fetchJSONConditional } from './http.js';
+
 // Hàm để lấy thông tin cảng từ API
 export async function fetchPortsData() {
     try {
         console.log('Fetching ports data...');
-        const response = await fetch('http://192.168.1.176:8000/api/ports');
-        console.log('Response status:', response.status);
-        if (!response.ok) {
-            throw new Error('Network response was not ok');
-        }
-        const data = await response.json();
+        const data = await fetchJSONConditional('http://192.168.1.176:8000/api/ports');
         console.log('Raw API response:', data);
         return data.ports; // API trả về object với key "ports"
     } catch (error) {
@@ -1,3 +1,5 @@
+import { fetchJSONConditional } from './http.js';
+
 // =============================
 // FETCH & HIỂN THỊ BÃO TRÊN BẢN ĐỒ
 // =============================
@@ -57,9 +59,20 @@ function drawStormsOnMap(alerts, map) {
                         alert.status === 'Bão mạnh' ? 'text-orange-600' :
                         alert.status === 'Bão' ? 'text-yellow-600' : 'text-blue-600'
                     }">${alert.status}</p>
+                    <p class="text-sm mt-1 ships-at-risk"></p>
                 </div>
             `);
 
+        // Số tàu trong vùng cảnh báo – lấy từ server khi mở popup
+        marker.on('popupopen', async (event) => {
+            const risk = await fetchShipsAtRisk(alert.id);
+            const el = event.popup.getElement()?.querySelector('.ships-at-risk');
+            if (risk && el) {
+                const inCore = risk.ships.filter(ship => ship.zone === 'core').length;
+                el.textContent = `Tàu trong vùng ảnh hưởng: ${inCore} – vùng cảnh báo: ${risk.count}`;
+            }
+        });
+
         // Vòng tròn ảnh hưởng
         const stormCircle = L.circle([alert.lat, alert.lng], {
             color: alert.status === 'Siêu bão' ? '#ff0000' :
@@ -89,30 +102,34 @@ function drawStormsOnMap(alerts, map) {
     });
 }
 
+/**
+ * Chuyển dòng storm-alert từ API sang dạng UI dùng
+ */
+function toUIAlert(alert) {
+    return {
+        id: alert.alert_id,
+        m: alert.message,
+        s: alert.severity,
+        status: alert.status,
+        lat: alert.latitude,
+        lng: alert.longitude,
+        radius: alert.radius_km,
+        warningRadius: alert.warning_radius_km,
+        windSpeed: alert.wind_kmh,
+        t: `${alert.latitude.toFixed(4)}°N, ${alert.longitude.toFixed(4)}°E`
+    };
+}
+
 /**
  * Gọi API & xử lý dữ liệu bão
  */
 export async function fetchStormAlerts(map) {
     try {
-        const response = await fetch('http://localhost:8000/api/storm-alerts');
-
-        if (!response.ok) throw new Error('API storm-alerts trả về lỗi');
-
-        const data = await response.json();
+        const data = await fetchJSONConditional('http://localhost:8000/api/storm-alerts');
         console.log('🌩️ Raw API Response:', data);
 
         // Convert DB fields → UI-friendly fields
-        const alerts = data.map(alert => ({
-            m: alert.message,
-            s: alert.severity,
-            status: alert.status,
-            lat: alert.latitude,
-            lng: alert.longitude,
-            radius: alert.radius_km,
-            warningRadius: alert.warning_radius_km,
-            windSpeed: alert.wind_kmh,
-            t: `${alert.latitude.toFixed(4)}°N, ${alert.longitude.toFixed(4)}°E`
-        }));
+        const alerts = data.map(toUIAlert);
 
         drawStormsOnMap(alerts, map);
 
@@ -124,6 +141,23 @@ export async function fetchStormAlerts(map) {
     }
 }
 
+/**
+ * Danh sách tàu nằm trong bán kính cảnh báo của một cơn bão (gần nhất trước)
+ * @param {number} stormId - id trong storm_info
+ * @param {number} [radiusKm] - bán kính tìm kiếm, mặc định là bán kính cảnh báo
+ */
+export async function fetchShipsAtRisk(stormId, radiusKm) {
+    const params = new URLSearchParams();
+    if (radiusKm) params.set('radius_km', radiusKm);
+    const query = params.toString() ? `?${params}` : '';
+    try {
+        return await fetchJSONConditional(`http://localhost:8000/api/storms/${stormId}/ships-at-risk${query}`);
+    } catch (error) {
+        console.error('❌ Error fetching ships at risk:', error);
+        return null;
+    }
+}
+
 /**
  * Format thời gian kiểu "x ago"
  */
@@ -142,3 +176,64 @@ function formatTimeAgo(date) {
 
     return `${Math.floor(diffHours / 24)}d ago`;
 }
+
+/**
+ * Nhận cập nhật bão qua Server-Sent Events (/api/stream), vẽ lại khi có thay đổi.
+ * Nếu stream lỗi/không hỗ trợ thì quay về polling fetchStormAlerts.
+ * @param {Function} onAlerts - gọi với danh sách alert đã qua xử lý
+ * @param {Object} map - instance Leaflet map
+ * @param {number} pollInterval - chu kỳ polling dự phòng (ms)
+ */
+export function subscribeStormAlerts(onAlerts, map, pollInterval = 5 * 60 * 1000) {
+    const rows = new Map();
+    let pollTimer = null;
+
+    const emit = () => {
+        const alerts = Array.from(rows.values()).map(toUIAlert);
+        drawStormsOnMap(alerts, map);
+        onAlerts(alerts);
+    };
+
+    const poll = async () => onAlerts(await fetchStormAlerts(map));
+
+    const startPolling = () => {
+        if (pollTimer) return;
+        poll();
+        pollTimer = setInterval(poll, pollInterval);
+    };
+
+    const stopPolling = () => {
+        if (!pollTimer) return;
+        clearInterval(pollTimer);
+        pollTimer = null;
+    };
+
+    if (typeof EventSource === 'undefined') {
+        startPolling();
+        return () => stopPolling();
+    }
+
+    const source = new EventSource('http://localhost:8000/api/stream?channels=storms');
+
+    source.addEventListener('snapshot', (event) => {
+        stopPolling();
+        rows.clear();
+        (JSON.parse(event.data).storms || []).forEach(alert => rows.set(String(alert.alert_id), alert));
+        emit();
+    });
+
+    source.addEventListener('storms', (event) => {
+        const delta = JSON.parse(event.data);
+        delta.removed.forEach(key => rows.delete(key));
+        delta.upserted.forEach(alert => rows.set(String(alert.alert_id), alert));
+        emit();
+    });
+
+    // EventSource tự kết nối lại; trong lúc mất kết nối thì polling thay thế
+    source.onerror = () => startPolling();
+
+    return () => {
+        source.close();
+        stopPolling();
+    };
+}